@@ -0,0 +1,335 @@
+""" A local stand-in for the Auth0 endpoints this package calls:
+``/oauth/token``, ``/tokeninfo``, ``/oauth/authorize`` and
+``/.well-known/jwks.json``.
+
+The stub serves plain HTTP on localhost. :func:`install_stub_adapter` routes
+the package's ``https://<AUTH0_DOMAIN>/`` requests to it. Latency, server
+errors and rate limiting (429) can be configured, to see how the package
+behaves when Auth0 is slow or struggling.
+
+"""
+import base64
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+import jwt
+from django.utils.six.moves import BaseHTTPServer, socketserver
+from django.utils.six.moves.urllib.parse import (
+    parse_qs,
+    urlencode,
+    urlparse,
+)
+from requests.adapters import HTTPAdapter
+
+from django_auth0_toolkit.ratelimit import TokenBucket
+from django_auth0_toolkit.tokens import prepare_secret
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.asymmetric import rsa
+except ImportError:  # pragma: no cover
+    rsa = None
+
+
+STUB_KEY_ID = 'stub-key'
+
+
+def int_to_base64url(value):
+    """ Encodes an unsigned integer as for the ``n`` and ``e`` of an RSA
+    JWK.
+
+    """
+    data = base64.b16decode('{0:x}'.format(value).upper().zfill(
+        (value.bit_length() + 7) // 8 * 2
+    ))
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class StubConfig(object):
+    """ Behaviour of a :class:`StubAuth0Server`.
+
+    :param secret: Client secret, as in ``AUTH0_CLIENT_SECRET``
+    :param client_id: Client ID, as in ``AUTH0_CLIENT_ID``
+    :param latency: Seconds added to every response.
+    :param sso_authenticated: Whether ``/oauth/authorize`` treats the
+        visitor as already logged in.
+    :param error_rate: Fraction of requests answered with a 503.
+    :param rate_limit: Requests per second served before answering 429,
+        or ``None`` for no limit.
+    :param algorithm: ``'HS256'``, or ``'RS256'`` to sign ID tokens with an
+        RSA key published at ``/.well-known/jwks.json``.
+    """
+
+    def __init__(
+        self, secret, client_id, domain='auth0.stub', latency=0.0,
+        sso_authenticated=False, error_rate=0.0, rate_limit=None,
+        algorithm='HS256',
+    ):
+        self.secret = secret
+        self.client_id = client_id
+        self.domain = domain
+        self.latency = latency
+        self.sso_authenticated = sso_authenticated
+        self.error_rate = error_rate
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.algorithm = algorithm
+
+        self.private_key = None
+        if algorithm == 'RS256':
+            if rsa is None:
+                raise RuntimeError('RS256 needs the cryptography package.')
+            self.private_key = rsa.generate_private_key(
+                public_exponent=65537, key_size=2048,
+                backend=default_backend(),
+            )
+
+    def make_id_token(self, sub, **claims):
+        payload = {
+            'iss': 'https://{domain}/'.format(domain=self.domain),
+            'sub': sub,
+            'aud': self.client_id,
+            'iat': int(time.time()),
+            'exp': int(time.time()) + 3600,
+        }
+        payload.update(claims)
+
+        if self.private_key is not None:
+            return jwt.encode(
+                payload, self.private_key, algorithm='RS256',
+                headers={'kid': STUB_KEY_ID},
+            ).decode('ascii')
+        return jwt.encode(payload, prepare_secret(self.secret)).decode('ascii')
+
+    def verification_key(self):
+        if self.private_key is not None:
+            return self.private_key.public_key()
+        return prepare_secret(self.secret)
+
+    def jwks(self):
+        if self.private_key is None:
+            return {'keys': []}
+
+        numbers = self.private_key.public_key().public_numbers()
+        return {'keys': [{
+            'kty': 'RSA',
+            'use': 'sig',
+            'alg': 'RS256',
+            'kid': STUB_KEY_ID,
+            'n': int_to_base64url(numbers.n),
+            'e': int_to_base64url(numbers.e),
+        }]}
+
+
+class StubAuth0Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't let Nagle's algorithm
+    # hold the body back.
+    disable_nagle_algorithm = True
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_response(self, code, message=None):
+        self.server.record(urlparse(self.path).path, code)
+        BaseHTTPServer.BaseHTTPRequestHandler.send_response(
+            self, code, message
+        )
+
+    def send_json(self, status, body, headers=()):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def delay(self):
+        if self.config.latency:
+            time.sleep(self.config.latency)
+
+    def failed(self):
+        """ Sends a 429 or a 503 if this request is to fail, as configured.
+
+        :return: Whether it failed
+        """
+        limiter = self.config.rate_limiter
+        if limiter is not None and not limiter.consume():
+            self.send_json(
+                429, {'error': 'too_many_requests'},
+                headers=[('Retry-After', '1')],
+            )
+            return True
+
+        if self.config.error_rate and (
+            random.random() < self.config.error_rate
+        ):
+            self.send_json(503, {'error': 'temporarily_unavailable'})
+            return True
+
+        return False
+
+    def do_GET(self):
+        self.delay()
+        if self.failed():
+            return
+
+        url = urlparse(self.path)
+        query = dict(
+            (key, values[0]) for key, values in parse_qs(url.query).items()
+        )
+
+        if url.path == '/tokeninfo':
+            self.tokeninfo(query)
+        elif url.path == '/oauth/authorize':
+            self.authorize(query)
+        elif url.path == '/.well-known/jwks.json':
+            self.send_json(200, self.config.jwks())
+        else:
+            self.send_json(404, {'error': 'not_found'})
+
+    def do_POST(self):
+        self.delay()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.failed():
+            return
+
+        if urlparse(self.path).path == '/oauth/token':
+            self.token(json.loads(body.decode('utf-8')))
+        else:
+            self.send_json(404, {'error': 'not_found'})
+
+    def tokeninfo(self, query):
+        try:
+            claims = jwt.decode(
+                query.get('id_token', ''),
+                self.config.verification_key(),
+                audience=self.config.client_id,
+            )
+        except jwt.InvalidTokenError:
+            self.send_json(401, {'error': 'invalid_token'})
+            return
+
+        self.send_json(200, {
+            'user_id': claims['sub'],
+            'email': claims.get('email', 'user@example.com'),
+            'given_name': 'Stub',
+            'family_name': 'User',
+        })
+
+    def token(self, payload):
+        if payload.get('client_secret') != self.config.secret:
+            self.send_json(401, {'error': 'access_denied'})
+            return
+
+        self.send_json(200, {
+            'id_token': self.config.make_id_token(
+                'auth0|{code}'.format(code=payload.get('code')),
+                email='user@example.com',
+            ),
+            'token_type': 'Bearer',
+        })
+
+    def authorize(self, query):
+        if self.config.sso_authenticated:
+            self.send_redirect('{redirect_uri}?{query}'.format(
+                redirect_uri=query['redirect_uri'],
+                query=urlencode({'code': 'stub', 'state': query['state']}),
+            ))
+        else:
+            self.send_redirect('https://{domain}/login'.format(
+                domain=self.config.domain,
+            ))
+
+
+class StubAuth0Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config, port=0):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', port), StubAuth0Handler
+        )
+        self.config = config
+        self.thread = None
+        self.stopping = False
+        self.responses = Counter()
+        self._responses_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return 'http://{0}:{1}'.format(*self.server_address)
+
+    def record(self, path, status):
+        with self._responses_lock:
+            self.responses[(path, status)] += 1
+
+    def response_counts(self):
+        """ Responses sent, by ``(path, status)``.
+
+        :rtype: dict[(str, int), int]
+        """
+        with self._responses_lock:
+            return dict(self.responses)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping = True
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Kept-alive connections are cut when stopping; that's expected.
+        if not self.stopping:
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address
+            )
+
+
+class StubRedirectAdapter(HTTPAdapter):
+    """ Sends requests for ``https://<domain>/`` to the stub server instead.
+
+    """
+
+    def __init__(self, domain, base_url, **kwargs):
+        self.prefix = 'https://{domain}'.format(domain=domain)
+        self.base_url = base_url
+        super(StubRedirectAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = self.base_url + request.url[len(self.prefix):]
+        return super(StubRedirectAdapter, self).send(request, **kwargs)
+
+
+def install_stub_adapter(server, pool_size=10):
+    """ Routes the shared HTTP client's Auth0 calls to ``server``. """
+    from django_auth0_toolkit.http_client import get_http_client
+
+    get_http_client().session.mount(
+        'https://{domain}/'.format(domain=server.config.domain),
+        StubRedirectAdapter(
+            server.config.domain,
+            server.base_url,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        ),
+    )
@@ -0,0 +1,334 @@
+""" Concurrent load test of the middleware, the callback view and the SSO
+decorator, against the local Auth0 stub.
+
+Each scenario is run at a target rate of requests per second, for every
+thread count given, and latency percentiles and throughput are reported.
+Latency is measured from when each request was due, so a backlog shows up
+in the percentiles. Run from the repository root::
+
+    $ python -m benchmarks.load --threads 1,4,16 --rps 200 --duration 10
+    $ python -m benchmarks.load -s middleware --error-rate 0.05
+
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from timeit import default_timer
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+SCENARIOS = []
+
+
+def scenario(name):
+    """ Registers a load scenario. The decorated function does any setup and
+    returns the callable to run, which is passed the request number.
+
+    """
+    def decorator(func):
+        SCENARIOS.append((name, func))
+        return func
+    return decorator
+
+
+class LoadContext(object):
+    """ Shared fixtures: the stub server and ID tokens for ``users`` users.
+
+    """
+
+    def __init__(self, server, users):
+        from django.test import RequestFactory
+
+        self.server = server
+        self.config = server.config
+        self.users = users
+        self.factory = RequestFactory()
+        self.id_tokens = [
+            self.config.make_id_token(
+                'auth0|load-{0}'.format(number),
+                email='load-{0}@example.com'.format(number),
+                name='Load User',
+            )
+            for number in range(users)
+        ]
+
+    def with_session(self, request):
+        from django.contrib.sessions.middleware import SessionMiddleware
+
+        SessionMiddleware().process_request(request)
+        return request
+
+
+@scenario('middleware')
+def load_middleware(ctx):
+    from django_auth0_toolkit.middleware import Auth0AuthenticationMiddleware
+
+    middleware = Auth0AuthenticationMiddleware()
+
+    def run(number):
+        request = ctx.with_session(ctx.factory.get(
+            '/api/resource/',
+            HTTP_AUTHORIZATION='Bearer ' + ctx.id_tokens[number % ctx.users],
+        ))
+        middleware.process_request(request)
+        if not request.user.is_authenticated():
+            raise AssertionError('Bearer token did not authenticate')
+    return run
+
+
+@scenario('callback')
+def load_callback(ctx):
+    from django_auth0_toolkit.views import generic_auth0_callback
+
+    def run(number):
+        request = ctx.with_session(ctx.factory.get(
+            '/handle-auth0-callback',
+            {'code': 'load-{0}'.format(number % ctx.users), 'state': '/'},
+        ))
+        generic_auth0_callback(request)
+    return run
+
+
+@scenario('sso')
+def load_sso(ctx):
+    from django.contrib.auth.models import AnonymousUser
+    from django.http import HttpResponse
+
+    from django_auth0_toolkit.sso import login_required_with_sso
+
+    view = login_required_with_sso(lambda request: HttpResponse())
+
+    def run(number):
+        request = ctx.factory.get('/restricted-page/')
+        request.user = AnonymousUser()
+        if view(request).status_code != 302:
+            raise AssertionError('SSO probe did not redirect')
+    return run
+
+
+def percentile(ordered, percent):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not ordered:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+def run_load(func, threads, rps, duration):
+    """ Calls ``func`` from ``threads`` threads, ``rps`` times a second (or
+    as fast as possible if ``rps`` is ``None``) for ``duration`` seconds.
+
+    :return: Latency percentiles in milliseconds, throughput and errors
+    :rtype: dict[str, object]
+    """
+    from django.db import connection
+
+    total = int(rps * duration) if rps else None
+    deadline = default_timer() + duration
+    numbers = itertools.count()
+    numbers_lock = threading.Lock()
+    latencies = []
+    errors = []
+    start = default_timer()
+
+    def worker():
+        timings = []
+        failures = 0
+        try:
+            while True:
+                with numbers_lock:
+                    number = next(numbers)
+                if total is not None:
+                    if number >= total:
+                        break
+                    due = start + number / float(rps)
+                    wait = due - default_timer()
+                    if wait > 0:
+                        time.sleep(wait)
+                else:
+                    due = default_timer()
+                    if due >= deadline:
+                        break
+
+                try:
+                    func(number)
+                except Exception:
+                    failures += 1
+                timings.append(default_timer() - due)
+        finally:
+            connection.close()
+            latencies.extend(timings)
+            errors.append(failures)
+
+    workers = [
+        threading.Thread(target=worker, name='load-{0}'.format(number))
+        for number in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = default_timer() - start
+
+    latencies.sort()
+    return {
+        'threads': threads,
+        'target_rps': rps,
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+def print_result(name, result):
+    print(
+        '{name:<12} {threads:>7} {requests:>9} {errors:>7} '
+        '{throughput_rps:>9.1f} {p50_ms:>9.2f} {p95_ms:>9.2f} '
+        '{p99_ms:>9.2f}'.format(name=name, **result)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '-s', '--scenario', dest='scenarios', action='append',
+        choices=[name for name, _ in SCENARIOS],
+        help='Scenario to run; repeat for several. Defaults to all.',
+    )
+    parser.add_argument(
+        '--threads', default='1,2,4,8',
+        help='Comma-separated thread counts to run each scenario with.',
+    )
+    parser.add_argument(
+        '--rps', type=float,
+        help='Target requests per second. Defaults to as fast as possible.',
+    )
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument(
+        '--users', type=int, default=100,
+        help='Distinct Auth0 users the requests are spread over.',
+    )
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds the stub Auth0 adds to every response.',
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help='Fraction of stub Auth0 responses that are 503s.',
+    )
+    parser.add_argument(
+        '--rate-limit', type=float,
+        help='Requests per second the stub serves before answering 429.',
+    )
+    parser.add_argument(
+        '--algorithm', choices=['HS256', 'RS256'], default='HS256',
+        help='How the stub signs ID tokens.',
+    )
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help="Show the package's logging, e.g. each failed Auth0 call.",
+    )
+    parser.add_argument('--output', help='Write results as JSON here.')
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Failures are counted; a traceback for each would bury the results.
+        logging.getLogger('django_auth0_toolkit').setLevel(logging.CRITICAL)
+
+    thread_counts = [int(count) for count in args.threads.split(',')]
+
+    # Threads need a database they can share.
+    database = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+    database.close()
+    os.environ['BENCHMARK_DATABASE_NAME'] = database.name
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import override_settings
+
+    from benchmarks.auth0_stub import (
+        StubAuth0Server,
+        StubConfig,
+        install_stub_adapter,
+    )
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    server = StubAuth0Server(StubConfig(
+        settings.AUTH0_CLIENT_SECRET,
+        settings.AUTH0_CLIENT_ID,
+        domain=settings.AUTH0_DOMAIN,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        algorithm=args.algorithm,
+    )).start()
+    install_stub_adapter(server, pool_size=max(thread_counts))
+
+    results = []
+    print('{0:<12} {1:>7} {2:>9} {3:>7} {4:>9} {5:>9} {6:>9} {7:>9}'.format(
+        'scenario', 'threads', 'requests', 'errors', 'req/s',
+        'p50 ms', 'p95 ms', 'p99 ms',
+    ))
+    try:
+        with override_settings(AUTH0_JWT_ALGORITHMS=[args.algorithm]):
+            ctx = LoadContext(server, args.users)
+            for name, func in SCENARIOS:
+                if args.scenarios and name not in args.scenarios:
+                    continue
+                run = func(ctx)
+                for threads in thread_counts:
+                    result = run_load(run, threads, args.rps, args.duration)
+                    result['scenario'] = name
+                    results.append(result)
+                    print_result(name, result)
+    finally:
+        server.stop()
+        os.unlink(database.name)
+
+    if args.output:
+        output = {
+            'meta': {
+                'timestamp': time.time(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'duration': args.duration,
+                'stub_latency': args.latency,
+                'stub_error_rate': args.error_rate,
+                'stub_rate_limit': args.rate_limit,
+                'algorithm': args.algorithm,
+            },
+            'results': results,
+            'auth0_responses': [
+                {'path': path, 'status': status, 'count': count}
+                for (path, status), count in sorted(
+                    server.response_counts().items()
+                )
+            ],
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
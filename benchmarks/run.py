@@ -0,0 +1,350 @@
+""" Microbenchmarks for the code that runs on every authenticated request.
+
+Auth0 is replaced by a local stub server, so results only depend on this
+package and the network stack. Run from the repository root::
+
+    $ python -m benchmarks.run --output results.json
+    $ python -m benchmarks.run --compare results.json --max-regression 20
+
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+BENCHMARKS = []
+
+
+def benchmark(name, **settings_overrides):
+    """ Registers a benchmark. The decorated function does any setup and
+    returns the callable to time.
+
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func, settings_overrides))
+        return func
+    return decorator
+
+
+def measure(func, iterations, warmup):
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(iterations):
+        start = default_timer()
+        func()
+        timings.append(default_timer() - start)
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    return {
+        'iterations': iterations,
+        'mean_us': mean * 1e6,
+        'median_us': timings[len(timings) // 2] * 1e6,
+        'p95_us': timings[int(len(timings) * 0.95) - 1] * 1e6,
+        'min_us': timings[0] * 1e6,
+        'ops_per_sec': 1.0 / mean if mean else None,
+    }
+
+
+class Context(object):
+    """ Shared fixtures: the stub server and helpers to build requests. """
+
+    def __init__(self, server):
+        from django.test import RequestFactory
+
+        self.server = server
+        self.config = server.config
+        self.factory = RequestFactory()
+        self.id_token = self.config.make_id_token(
+            'auth0|benchmark', email='bench@example.com', name='Bench Mark',
+        )
+
+    def make_request(self, id_token=None, session=None):
+        from django.contrib.sessions.middleware import SessionMiddleware
+
+        request = self.factory.get(
+            '/api/resource/',
+            HTTP_AUTHORIZATION='Bearer ' + (id_token or self.id_token),
+        )
+        if session is None:
+            SessionMiddleware().process_request(request)
+        else:
+            request.session = session
+        return request
+
+
+@benchmark('tokens.prepare_secret')
+def bench_prepare_secret(ctx):
+    from django.conf import settings
+    from django_auth0_toolkit.tokens import prepare_secret
+
+    return lambda: prepare_secret(settings.AUTH0_CLIENT_SECRET)
+
+
+@benchmark('tokens.get_decoded_token')
+def bench_get_decoded_token(ctx):
+    from django.conf import settings
+    from django_auth0_toolkit.tokens import get_decoded_token
+
+    return lambda: get_decoded_token(
+        ctx.id_token, settings.AUTH0_CLIENT_SECRET, settings.AUTH0_CLIENT_ID,
+    )
+
+
+@benchmark('tokens.TokenVerifier.verify')
+def bench_token_verifier(ctx):
+    from django_auth0_toolkit.tokens import get_token_verifier
+
+    verifier = get_token_verifier()
+    return lambda: verifier.verify(ctx.id_token)
+
+
+@benchmark('middleware.get_verified_claims[cached]')
+def bench_get_verified_claims(ctx):
+    from django_auth0_toolkit.middleware import get_verified_claims
+
+    return lambda: get_verified_claims(ctx.id_token)
+
+
+@benchmark(
+    'middleware.get_verified_claims[shared_memory]',
+    AUTH0_TOKEN_SHARED_MEMORY_PATH=os.path.join(
+        tempfile.gettempdir(), 'django_auth0_toolkit_benchmark_tokens'
+    ),
+)
+def bench_get_verified_claims_shared(ctx):
+    from django_auth0_toolkit.cache import get_token_cache
+    from django_auth0_toolkit.middleware import get_verified_claims
+
+    def run():
+        # As a worker that hasn't seen the token yet would.
+        get_token_cache().clear()
+        get_verified_claims(ctx.id_token)
+    return run
+
+
+@benchmark(
+    'middleware.get_user_from_request[cold]',
+    AUTH0_PROFILE_REFRESH_INTERVAL=0,
+)
+def bench_middleware_cold(ctx):
+    from django_auth0_toolkit.cache import get_token_cache
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    def run():
+        get_token_cache().clear()
+        get_user_from_request(ctx.make_request())
+    return run
+
+
+@benchmark('middleware.get_user_from_request[session]')
+def bench_middleware_session(ctx):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    first = ctx.make_request()
+    get_user_from_request(first)
+
+    return lambda: get_user_from_request(
+        ctx.make_request(session=first.session)
+    )
+
+
+@benchmark(
+    'middleware.get_user_from_request[stateless,claims]',
+    AUTH0_STATELESS_URL_PREFIXES=['/api/'],
+    AUTH0_USER_INFO_FROM_CLAIMS=True,
+)
+def bench_middleware_stateless(ctx):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    return lambda: get_user_from_request(ctx.make_request())
+
+
+@benchmark(
+    'middleware.get_user_from_request[stateless,claims_user]',
+    AUTH0_STATELESS_URL_PREFIXES=['/api/'],
+    AUTH0_CLAIMS_USER=True,
+)
+def bench_middleware_claims_user(ctx):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    def run():
+        user = get_user_from_request(ctx.make_request())
+        return user.is_authenticated and user.sub
+    return run
+
+
+@benchmark('auth_backends.Auth0Backend.authenticate[new]')
+def bench_authenticate_new(ctx):
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    backend = Auth0Backend()
+    counter = itertools.count()
+
+    return lambda: backend.authenticate(user_info={
+        'user_id': 'auth0|new-{0}'.format(next(counter)),
+        'email': 'new@example.com',
+        'name': 'New User',
+    })
+
+
+@benchmark('auth_backends.Auth0Backend.authenticate[existing]')
+def bench_authenticate_existing(ctx):
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    backend = Auth0Backend()
+    user_info = {
+        'user_id': 'auth0|existing',
+        'email': 'existing@example.com',
+        'name': 'Existing User',
+    }
+    backend.authenticate(user_info=user_info)
+
+    return lambda: backend.authenticate(user_info=user_info)
+
+
+@benchmark('sso.sso_fallback[redirect]')
+def bench_sso_redirect(ctx):
+    from django_auth0_toolkit.sso import sso_fallback
+
+    request = ctx.factory.get('/restricted-page/')
+    return lambda: sso_fallback(request, intercept_auth0_redirect=False)
+
+
+@benchmark('sso.sso_fallback[probe]')
+def bench_sso_probe(ctx):
+    from django_auth0_toolkit.sso import sso_fallback
+
+    request = ctx.factory.get('/restricted-page/')
+    return lambda: sso_fallback(request, intercept_auth0_redirect=True)
+
+
+def run_benchmarks(ctx, iterations, warmup, selected=None):
+    from django.test import override_settings
+
+    results = {}
+    for name, func, settings_overrides in BENCHMARKS:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+
+        with override_settings(**settings_overrides):
+            results[name] = measure(func(ctx), iterations, warmup)
+
+        print('{0:<55} {1:>12.1f} us'.format(name, results[name]['mean_us']))
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """ Prints the change against a baseline and returns the names of
+    benchmarks that regressed by more than ``max_regression`` percent.
+
+    """
+    regressions = []
+    print()
+    print('{0:<55} {1:>12} {2:>12} {3:>8}'.format(
+        'benchmark', 'baseline us', 'current us', 'change'
+    ))
+    for name, result in sorted(results.items()):
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+
+        change = (result['mean_us'] / before['mean_us'] - 1) * 100
+        print('{0:<55} {1:>12.1f} {2:>12.1f} {3:>+7.1f}%'.format(
+            name, before['mean_us'], result['mean_us'], change,
+        ))
+        if max_regression is not None and change > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds the stub Auth0 adds to every response.',
+    )
+    parser.add_argument(
+        '-k', dest='selected', action='append',
+        help='Only run benchmarks whose name contains this.',
+    )
+    parser.add_argument('--output', help='Write results as JSON here.')
+    parser.add_argument('--compare', help='Baseline JSON results file.')
+    parser.add_argument(
+        '--max-regression', type=float,
+        help='Exit non-zero if a benchmark is this many percent slower.',
+    )
+    args = parser.parse_args(argv)
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from benchmarks.auth0_stub import (
+        StubAuth0Server,
+        StubConfig,
+        install_stub_adapter,
+    )
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    server = StubAuth0Server(StubConfig(
+        settings.AUTH0_CLIENT_SECRET,
+        settings.AUTH0_CLIENT_ID,
+        domain=settings.AUTH0_DOMAIN,
+        latency=args.latency,
+    )).start()
+    install_stub_adapter(server)
+
+    try:
+        results = run_benchmarks(
+            Context(server), args.iterations, args.warmup, args.selected,
+        )
+    finally:
+        server.stop()
+
+    output = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'stub_latency': args.latency,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(
+                results, json.load(baseline_file), args.max_regression,
+            )
+        if regressions:
+            print('Regressed: ' + ', '.join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+""" Django settings for the benchmarks. Auth0 calls go to the local stub. """
+import os
+
+DEBUG = False
+
+SECRET_KEY = 'benchmarks'
+
+ROOT_URLCONF = 'benchmarks.urls'
+
+AUTH0_DOMAIN = 'auth0.stub'
+
+AUTH0_CLIENT_ID = 'benchmark-client-id'
+
+AUTH0_CLIENT_SECRET = 'YmVuY2htYXJrLXNlY3JldA=='
+
+AUTH0_LOGIN_CALLBACK_URL = '/handle-auth0-callback'
+
+ALLOWED_HOSTS = ['testserver']
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django_auth0_toolkit',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # The load driver needs a file, shared by its threads.
+        'NAME': os.environ.get('BENCHMARK_DATABASE_NAME', ':memory:'),
+    },
+}
+
+AUTHENTICATION_BACKENDS = [
+    'django_auth0_toolkit.auth_backends.Auth0Backend',
+]
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
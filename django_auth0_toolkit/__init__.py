@@ -3,3 +3,5 @@
 __author__ = """Shaun Stanworth"""
 __email__ = 'shaun.stanworth@googlemail.com'
 __version__ = '0.2.3'
+
+default_app_config = 'django_auth0_toolkit.apps.DjangoAuth0ToolkitConfig'
@@ -0,0 +1,372 @@
+""" Asyncio counterparts of the Auth0 API functions, for asyncio code such
+as aiohttp handlers or background jobs.
+
+Requires Python 3.5+ and :mod:`aiohttp`. Cache access still runs
+synchronously, in a worker thread.
+
+The Django versions this package supports don't run async middleware or
+coroutine views, so there is no asyncio counterpart of the middleware or
+the SSO decorator.
+
+"""
+import asyncio
+import functools
+import json
+import logging
+import weakref
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from django_auth0_toolkit.auth_api import get_user_info_from_claims
+from django_auth0_toolkit.cache import (
+    get_cached_user_info,
+    set_cached_user_info,
+)
+from django_auth0_toolkit.exceptions import (
+    Auth0UnavailableException,
+    InvalidTokenException,
+)
+from django_auth0_toolkit.http_client import Auth0HttpClient
+from django_auth0_toolkit.tenants import (
+    get_tenant_for_claims,
+    get_tenant_registry,
+    get_user_id,
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover
+    sync_to_async = None
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_sync(func, *args, **kwargs):
+    """ Runs blocking ``func`` in a worker thread. """
+    if sync_to_async is not None:
+        return await sync_to_async(func)(*args, **kwargs)
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(func, *args, **kwargs)
+    )
+
+
+class AsyncResponse(object):
+    """ The parts of an :mod:`aiohttp` response we use, read up front so the
+    connection can go straight back to the pool.
+
+    """
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(
+                '{status} Error for url: {url}'.format(
+                    status=self.status_code, url=self.url,
+                ),
+                response=self,
+            )
+
+
+class AsyncAuth0HttpClient(object):
+    """ Pooled, keep-alive asyncio HTTP client with retries and timeouts,
+    mirroring :class:`~django_auth0_toolkit.http_client.Auth0HttpClient`.
+
+    Only GET requests are retried, on connection errors, timeouts and on
+    gateway-style 5xx responses. Every call made counts as a success or
+    failure for the circuit ``breaker``, whatever it raises.
+
+    """
+
+    def __init__(
+        self, pool_size=10, max_retries=2, backoff_factor=0.1,
+        timeout=(3.05, 10), breaker=None,
+    ):
+        if aiohttp is None:
+            raise ImproperlyConfigured(
+                'The asyncio Auth0 client requires the aiohttp package.'
+            )
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker
+
+        connect_timeout, read_timeout = timeout
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=pool_size),
+            timeout=aiohttp.ClientTimeout(
+                connect=connect_timeout, sock_read=read_timeout,
+            ),
+        )
+
+    async def request(self, method, url, **kwargs):
+        if self.breaker is not None and not self.breaker.allow_request():
+            raise Auth0UnavailableException('Auth0 circuit breaker is open')
+
+        # A call left unrecorded, even a cancelled one, would hold a
+        # half-open breaker's trial slot for good.
+        success = False
+        try:
+            res, content = await self.send(method, url, **kwargs)
+            if res.status >= 500:
+                raise Auth0UnavailableException(
+                    'Auth0 responded {status}'.format(status=res.status)
+                )
+            success = True
+        finally:
+            self.record_outcome(success)
+
+        return AsyncResponse(str(res.url), res.status, res.headers, content)
+
+    async def send(self, method, url, **kwargs):
+        """ Makes the request, with retries.
+
+        :return: The last response, and its body
+        :raises Auth0UnavailableException: The request failed.
+        """
+        retries = self.max_retries if method == 'GET' else 0
+
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+
+            try:
+                async with self.session.request(method, url, **kwargs) as res:
+                    content = await res.read()
+            except (
+                aiohttp.ClientConnectionError, asyncio.TimeoutError
+            ) as exc:
+                if attempt == retries:
+                    raise Auth0UnavailableException(exc)
+                continue
+            except aiohttp.ClientError as exc:
+                raise Auth0UnavailableException(exc)
+
+            if (
+                attempt == retries or
+                res.status not in Auth0HttpClient.RETRY_STATUSES
+            ):
+                return res, content
+
+    def record_outcome(self, success):
+        if self.breaker is None:
+            return
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    async def get(self, url, params=None, allow_redirects=True, **kwargs):
+        return await self.request(
+            'GET', url, params=params, allow_redirects=allow_redirects,
+            **kwargs
+        )
+
+    async def post(self, url, data=None, **kwargs):
+        return await self.request('POST', url, data=data, **kwargs)
+
+    async def close(self):
+        await self.session.close()
+
+
+_async_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client(tenant=None):
+    """ Returns the :class:`AsyncAuth0HttpClient` of the running event loop
+    for ``tenant``, configured by the ``AUTH0_HTTP_*`` settings. It shares
+    the circuit breaker of the tenant's synchronous client.
+
+    :param tenant: Defaults to the default tenant.
+    :type tenant: django_auth0_toolkit.tenants.Auth0Tenant
+    :rtype: AsyncAuth0HttpClient
+    """
+    tenant = tenant or get_tenant_registry().default
+    loop = asyncio.get_event_loop()
+    clients = _async_http_clients.setdefault(loop, {})
+    client = clients.get(tenant.name)
+    if client is None:
+        client = AsyncAuth0HttpClient(
+            pool_size=getattr(settings, 'AUTH0_HTTP_POOL_SIZE', 10),
+            max_retries=getattr(settings, 'AUTH0_HTTP_MAX_RETRIES', 2),
+            backoff_factor=getattr(
+                settings, 'AUTH0_HTTP_BACKOFF_FACTOR', 0.1
+            ),
+            timeout=getattr(settings, 'AUTH0_HTTP_TIMEOUT', (3.05, 10)),
+            breaker=tenant.http_client.breaker,
+        )
+        clients[tenant.name] = client
+    return client
+
+
+class AsyncSingleFlight(object):
+    """ Asyncio counterpart of
+    :class:`~django_auth0_toolkit.singleflight.SingleFlight`: concurrent
+    coroutines calling with the same key await one shared task.
+
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        """ Awaits ``func(*args, **kwargs)``, unless a call for ``key`` is
+        already in flight on this event loop, in which case its outcome is
+        shared.
+
+        """
+        task_key = (asyncio.get_event_loop(), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[task_key] = task
+            task.add_done_callback(
+                lambda _: self._tasks.pop(task_key, None)
+            )
+
+        # One caller being cancelled mustn't cancel the others' call.
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        """ Number of calls currently in flight. """
+        return len(self._tasks)
+
+
+# Concurrent identical calls to Auth0 share a single request.
+flights = AsyncSingleFlight()
+
+
+async def get_token_info_from_authorization_code(
+    authorization_code, redirect_url, tenant=None,
+):
+    """ Asyncio version of
+    :func:`django_auth0_toolkit.auth_api.get_token_info_from_authorization_code`.
+
+    """
+    tenant = tenant or get_tenant_registry().default
+    return await flights.do(
+        ('oauth/token', tenant.name, authorization_code, redirect_url),
+        request_token_info,
+        authorization_code,
+        redirect_url,
+        tenant,
+    )
+
+
+async def request_token_info(authorization_code, redirect_url, tenant=None):
+    """ Asyncio version of
+    :func:`django_auth0_toolkit.auth_api.request_token_info`.
+
+    """
+    tenant = tenant or get_tenant_registry().default
+    json_header = {'content-type': 'application/json'}
+
+    token_url = "https://{domain}/oauth/token".format(
+        domain=tenant.domain
+    )
+
+    token_payload = {
+        'client_id': tenant.client_id,
+        'client_secret': tenant.client_secret,
+        'redirect_uri': redirect_url,
+        'code': authorization_code,
+        'grant_type': 'authorization_code'
+    }
+
+    res = await get_async_http_client(tenant).post(
+        token_url, data=json.dumps(token_payload), headers=json_header
+    )
+
+    try:
+        res.raise_for_status()
+    except requests.HTTPError:
+        logger.exception('Authorization Code-Token exchange failed')
+        raise InvalidTokenException(authorization_code)
+
+    token_info = res.json()
+    return token_info
+
+
+async def get_user_info_with_id_token(id_token, claims=None, tenant=None):
+    """ Asyncio version of
+    :func:`django_auth0_toolkit.auth_api.get_user_info_with_id_token`.
+
+    """
+    if claims is not None:
+        user_id = get_user_id(claims)
+        user_info = await run_sync(get_cached_user_info, user_id)
+        if user_info is not None:
+            return user_info
+        tenant = tenant or get_tenant_for_claims(claims)
+
+    user_info = await flights.do(
+        ('tokeninfo', id_token), request_user_info, id_token, tenant
+    )
+
+    if claims is not None:
+        await run_sync(
+            set_cached_user_info, user_id, user_info, claims.get('exp'),
+        )
+
+    return user_info
+
+
+async def request_user_info(id_token, tenant=None):
+    """ Asyncio version of
+    :func:`django_auth0_toolkit.auth_api.request_user_info`.
+
+    """
+    tenant = tenant or get_tenant_registry().default
+    user_from_token_url = 'https://{domain}/tokeninfo'.format(
+        domain=tenant.domain,
+    )
+
+    res = await get_async_http_client(tenant).get(
+        user_from_token_url, {'id_token': id_token}
+    )
+
+    try:
+        res.raise_for_status()
+    except requests.HTTPError:
+        logger.exception('ID token-profile exchange failed')
+        raise InvalidTokenException(id_token)
+
+    user_info = res.json()
+    if 'user_id' in user_info:
+        user_info['user_id'] = tenant.get_user_id(user_info['user_id'])
+    return user_info
+
+
+async def get_user_info(id_token, claims=None, tenant=None):
+    """ Asyncio version of
+    :func:`django_auth0_toolkit.auth_api.get_user_info`.
+
+    """
+    if claims is not None and getattr(
+        settings, 'AUTH0_USER_INFO_FROM_CLAIMS', False
+    ):
+        user_info = get_user_info_from_claims(claims)
+        if user_info is not None:
+            return user_info
+        logger.debug('ID token lacks profile claims, fetching profile')
+
+    return await get_user_info_with_id_token(
+        id_token, claims=claims, tenant=tenant,
+    )
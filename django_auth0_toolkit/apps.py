@@ -0,0 +1,26 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+
+class DjangoAuth0ToolkitConfig(AppConfig):
+    name = 'django_auth0_toolkit'
+    verbose_name = 'Django Auth0 Toolkit'
+
+    def ready(self):
+        from django_auth0_toolkit.cache import (
+            invalidate_cached_user_on_change,
+        )
+
+        # Keep the user cache in step with changes to users, of whichever
+        # user model is installed.
+        post_save.connect(
+            invalidate_cached_user_on_change,
+            sender=settings.AUTH_USER_MODEL,
+            dispatch_uid='django_auth0_toolkit.user_cache.post_save',
+        )
+        post_delete.connect(
+            invalidate_cached_user_on_change,
+            sender=settings.AUTH_USER_MODEL,
+            dispatch_uid='django_auth0_toolkit.user_cache.post_delete',
+        )
@@ -10,39 +10,74 @@ import logging
 import requests
 from django.conf import settings
 
+from django_auth0_toolkit.cache import (
+    get_cached_user_info,
+    set_cached_user_info,
+)
 from django_auth0_toolkit.exceptions import InvalidTokenException
+from django_auth0_toolkit.singleflight import SingleFlight
+from django_auth0_toolkit.tenants import (
+    get_tenant_for_claims,
+    get_tenant_registry,
+    get_user_id,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# Concurrent identical calls to Auth0 share a single request.
+flights = SingleFlight()
 
-def get_token_info_from_authorization_code(authorization_code, redirect_url):
+
+def get_token_info_from_authorization_code(
+    authorization_code, redirect_url, tenant=None,
+):
     """ Exchanges an authorization code passed to your callback URL for tokens
     for the authenticated user.
 
+    Concurrent exchanges of the same code share one request to Auth0.
+
     :param authorization_code: Authorization code provided to your callback URL
     :type authorization_code: str
     :param redirect_url: URL of your callback
     :type redirect_url: str
+    :param tenant: Tenant that issued the code. Defaults to the default one.
+    :type tenant: django_auth0_toolkit.tenants.Auth0Tenant
     :return: Tokens for further API access, including ``id_token``.
     :rtype: dict[str, str]
     :raises InvalidTokenException: The exchange failed.
     """
+    tenant = tenant or get_tenant_registry().default
+    return flights.do(
+        ('oauth/token', tenant.name, authorization_code, redirect_url),
+        request_token_info,
+        authorization_code,
+        redirect_url,
+        tenant,
+    )
+
+
+def request_token_info(authorization_code, redirect_url, tenant=None):
+    """ Requests the exchange made by
+    :func:`get_token_info_from_authorization_code` from Auth0.
+
+    """
+    tenant = tenant or get_tenant_registry().default
     json_header = {'content-type': 'application/json'}
 
     token_url = "https://{domain}/oauth/token".format(
-        domain=settings.AUTH0_DOMAIN
+        domain=tenant.domain
     )
 
     token_payload = {
-        'client_id': settings.AUTH0_CLIENT_ID,
-        'client_secret': settings.AUTH0_CLIENT_SECRET,
+        'client_id': tenant.client_id,
+        'client_secret': tenant.client_secret,
         'redirect_uri': redirect_url,
         'code': authorization_code,
         'grant_type': 'authorization_code'
     }
 
-    res = requests.post(
+    res = tenant.http_client.post(
         token_url, data=json.dumps(token_payload), headers=json_header
     )
 
@@ -56,20 +91,74 @@ def get_token_info_from_authorization_code(authorization_code, redirect_url):
     return token_info
 
 
-def get_user_info_with_id_token(id_token):
+def get_user_info_with_id_token(id_token, claims=None, tenant=None):
     """ Fetches a user's profile from Auth0, based on an ID token for them.
 
+    If the token's verified ``claims`` are given, the profile is looked up in
+    (and stored to) the profile cache under the user's ID. Concurrent
+    fetches for the same token share one request to Auth0.
+
+    :param id_token: ID token belonging to the user who's profile we want
+    :type id_token: str
+    :param claims: Claims of ``id_token``, already verified by the caller
+    :type claims: dict[str, object]
+    :param tenant: Tenant that issued the token. Defaults to the one the
+        claims name, or else the default tenant.
+    :type tenant: django_auth0_toolkit.tenants.Auth0Tenant
+    :return: User profile dictionary from Auth0
+    :rtype: dict[str, object]
+    :raises InvalidTokenException: id_token is reported as invalid by Auth0
+    """
+    if claims is not None:
+        user_id = get_user_id(claims)
+        user_info = get_cached_user_info(user_id)
+        if user_info is not None:
+            return user_info
+        tenant = tenant or get_tenant_for_claims(claims)
+
+    user_info = flights.do(
+        ('tokeninfo', id_token), request_user_info, id_token, tenant
+    )
+
+    if claims is not None:
+        set_cached_user_info(user_id, user_info, claims.get('exp'))
+
+    return user_info
+
+
+def refresh_user_info(id_token, claims):
+    """ Fetches a user's profile from Auth0, skipping the profile cache, and
+    stores it to the cache.
+
     :param id_token: ID token belonging to the user who's profile we want
     :type id_token: str
+    :param claims: Verified claims of ``id_token``
+    :type claims: dict[str, object]
     :return: User profile dictionary from Auth0
     :rtype: dict[str, object]
     :raises InvalidTokenException: id_token is reported as invalid by Auth0
     """
+    user_info = flights.do(
+        ('tokeninfo', id_token),
+        request_user_info,
+        id_token,
+        get_tenant_for_claims(claims),
+    )
+    set_cached_user_info(get_user_id(claims), user_info, claims.get('exp'))
+    return user_info
+
+
+def request_user_info(id_token, tenant=None):
+    """ Requests the profile for :func:`get_user_info_with_id_token` from
+    Auth0.
+
+    """
+    tenant = tenant or get_tenant_registry().default
     user_from_token_url = 'https://{domain}/tokeninfo'.format(
-        domain=settings.AUTH0_DOMAIN,
+        domain=tenant.domain,
     )
 
-    res = requests.get(
+    res = tenant.http_client.get(
         user_from_token_url, {'id_token': id_token}
     )
 
@@ -80,4 +169,54 @@ def get_user_info_with_id_token(id_token):
         raise InvalidTokenException(id_token)
 
     user_info = res.json()
+    if 'user_id' in user_info:
+        user_info['user_id'] = tenant.get_user_id(user_info['user_id'])
     return user_info
+
+
+def get_user_info_from_claims(claims):
+    """ Builds a user profile from the claims of a verified ID token, provided
+    it has all of ``AUTH0_REQUIRED_PROFILE_CLAIMS``.
+
+    :param claims: Verified ID token claims
+    :type claims: dict[str, object]
+    :return: User profile dictionary, or ``None`` if claims are missing
+    :rtype: dict[str, object] | None
+    """
+    required_claims = getattr(
+        settings, 'AUTH0_REQUIRED_PROFILE_CLAIMS', ('email', 'name')
+    )
+    if not all(claims.get(claim) for claim in required_claims):
+        return None
+
+    user_info = dict(claims)
+    user_info['user_id'] = get_tenant_for_claims(claims).get_user_id(
+        claims.get('user_id', claims['sub'])
+    )
+    return user_info
+
+
+def get_user_info(id_token, claims=None, tenant=None):
+    """ Returns a user's profile, from the ID token's claims when
+    ``AUTH0_USER_INFO_FROM_CLAIMS`` is enabled and they are rich enough, or
+    else from Auth0.
+
+    :param id_token: ID token belonging to the user who's profile we want
+    :type id_token: str
+    :param claims: Claims of ``id_token``, already verified by the caller
+    :type claims: dict[str, object]
+    :param tenant: Tenant that issued the token, if known
+    :type tenant: django_auth0_toolkit.tenants.Auth0Tenant
+    :return: User profile dictionary
+    :rtype: dict[str, object]
+    :raises InvalidTokenException: id_token is reported as invalid by Auth0
+    """
+    if claims is not None and getattr(
+        settings, 'AUTH0_USER_INFO_FROM_CLAIMS', False
+    ):
+        user_info = get_user_info_from_claims(claims)
+        if user_info is not None:
+            return user_info
+        logger.debug('ID token lacks profile claims, fetching profile')
+
+    return get_user_info_with_id_token(id_token, claims=claims, tenant=tenant)
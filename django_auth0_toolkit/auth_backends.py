@@ -1,47 +1,193 @@
-# TODO support 'get user model' approach
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from django_auth0_toolkit.cache import (
+    evict_user_info,
+    get_cached_user,
+    set_cached_user,
+)
+from django_auth0_toolkit.models import Auth0Identity
+
+
+# Usernames used to be the last 30 characters of the Auth0 user ID.
+LEGACY_USERNAME_LENGTH = 30
 
 
 class Auth0Backend(object):
     """ Handle auth0 backed authentication, by serialising auth0 data into a
     standard Django user.
 
+    Users are found through their :class:`Auth0Identity`. Users created
+    before identities existed are found by username, and linked, unless
+    ``AUTH0_LEGACY_USERNAME_LOOKUP`` is disabled.
+
     """
 
     def authenticate(self, user_info=None):
-        # TODO in newer Django, username has flexible length
-        username = user_info['user_id'][-30:]
+        UserModel = get_user_model()
 
-        is_new = False
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
-            user = User(username=username, password='auth0')
-            is_new = True
+        user = self.get_user_by_auth0_id(user_info['user_id'])
+
+        is_new = user is None
+        if is_new:
+            user = UserModel(password='auth0', **{
+                UserModel.USERNAME_FIELD: self.get_username(user_info),
+            })
 
         user.is_new = is_new
 
-        if user_info.get('email') and not user.email:
-            user.email = user_info['email'][:254]
+        changed_fields = self.update_user(user, user_info)
+
+        # TODO extension hooks for profile and e.g. is_staff/superuser
+
+        if is_new:
+            with transaction.atomic():
+                user.save()
+                Auth0Identity.objects.create(
+                    sub=user_info['user_id'], user=user,
+                )
+        elif changed_fields:
+            user.save(update_fields=changed_fields)
+            # Other processes may still hold the old profile.
+            evict_user_info(user_info['user_id'])
+
+        user.was_saved = is_new or bool(changed_fields)
+
+        return user
+
+    def get_user_by_auth0_id(self, user_id):
+        """ Returns the user linked to an Auth0 user ID, if there is one.
+
+        :param user_id: Auth0 user ID, see
+            :func:`~django_auth0_toolkit.tenants.get_user_id`
+        :type user_id: str
+        :rtype: django.contrib.auth.models.User | None
+        """
+        try:
+            return Auth0Identity.objects.select_related('user').get(
+                pk=user_id
+            ).user
+        except Auth0Identity.DoesNotExist:
+            pass
+
+        return self.get_users_by_legacy_username([user_id]).get(user_id)
+
+    def get_users_by_auth0_ids(self, user_ids):
+        """ Returns the users linked to each of several Auth0 user IDs.
+
+        :type user_ids: list[str]
+        :return: Users by Auth0 user ID, for the IDs that have one
+        :rtype: dict[str, django.contrib.auth.models.User]
+        """
+        users = dict(
+            (identity.sub, identity.user)
+            for identity in Auth0Identity.objects.select_related(
+                'user'
+            ).filter(pk__in=user_ids)
+        )
+
+        unlinked = [user_id for user_id in user_ids if user_id not in users]
+        if unlinked:
+            users.update(self.get_users_by_legacy_username(unlinked))
+
+        return users
+
+    def get_users_by_legacy_username(self, user_ids):
+        """ Finds, and links, users created before identities existed, whose
+        username is the truncated Auth0 user ID.
+
+        Users already linked to another identity aren't matched, as that
+        would be a collision between truncated IDs.
+
+        :type user_ids: list[str]
+        :rtype: dict[str, django.contrib.auth.models.User]
+        """
+        if not getattr(settings, 'AUTH0_LEGACY_USERNAME_LOOKUP', True):
+            return {}
+
+        UserModel = get_user_model()
+
+        legacy_usernames = {}
+        for user_id in user_ids:
+            legacy_usernames.setdefault(
+                user_id[-LEGACY_USERNAME_LENGTH:], user_id
+            )
+
+        users = dict(
+            (legacy_usernames[user.get_username()], user)
+            for user in UserModel._default_manager.filter(
+                auth0_identities__isnull=True,
+                **{
+                    UserModel.USERNAME_FIELD + '__in': list(legacy_usernames)
+                }
+            )
+        )
+
+        Auth0Identity.objects.bulk_create([
+            Auth0Identity(sub=user_id, user=user)
+            for user_id, user in users.items()
+        ])
+        return users
+
+    def get_username(self, user_info):
+        """ Username of the Django user for an Auth0 profile: the Auth0 user
+        ID, truncated to fit the username field.
+
+        :type user_info: dict[str, object]
+        :rtype: str
+        """
+        UserModel = get_user_model()
+        max_length = UserModel._meta.get_field(
+            UserModel.USERNAME_FIELD
+        ).max_length
+        return user_info['user_id'][-max_length:]
+
+    def update_user(self, user, user_info):
+        """ Copies an Auth0 profile onto a user, without saving it.
+
+        Only fields the user doesn't have yet are filled in, and fields the
+        user model lacks are skipped.
+
+        :param user: User to update
+        :type user: django.contrib.auth.models.User
+        :param user_info: Auth0 profile
+        :type user_info: dict[str, object]
+        :return: Names of the fields that changed
+        :rtype: list[str]
+        """
+        changed_fields = []
+
+        def set_field(field_name, value):
+            if not hasattr(user, field_name):
+                return
+            if not getattr(user, field_name) and value:
+                setattr(user, field_name, value)
+                changed_fields.append(field_name)
+
+        if user_info.get('email'):
+            set_field('email', user_info['email'][:254])
 
         if user_info.get('family_name') or user_info.get('given_name'):
-            if user_info.get('family_name') and not user.last_name:
-                user.last_name = user_info['family_name'][:30]
-            if user_info.get('given_name') and not user.first_name:
-                user.first_name = user_info['given_name'][:30]
+            if user_info.get('family_name'):
+                set_field('last_name', user_info['family_name'][:30])
+            if user_info.get('given_name'):
+                set_field('first_name', user_info['given_name'][:30])
 
         elif user_info.get('name') and ' ' in user_info.get('name'):
             names = user_info.get('name').split(' ', 1)
-            if not user.first_name:
-                user.first_name = names[0][:30]
-            if not user.last_name:
-                user.last_name = names[1][:30]
+            set_field('first_name', names[0][:30])
+            set_field('last_name', names[1][:30])
 
-        # TODO extension hooks for profile and e.g. is_staff/superuser
+        return changed_fields
 
-        user.save()
+    def get_user(self, user_id):
+        """ Loads a user by primary key, through the user cache if
+        ``AUTH0_USER_CACHE_ALIAS`` is set.
 
+        """
+        user = get_cached_user(user_id)
+        if user is None:
+            user = get_user_model()._default_manager.get(pk=user_id)
+            set_cached_user(user)
         return user
-
-    def get_user(self, user_id):
-        return User.objects.get(pk=user_id)
@@ -0,0 +1,578 @@
+""" Caches used on the authentication hot path.
+
+Verified claims and Auth0 profiles can be kept in two tiers: a small
+per-process L1 in front of a Django cache (L2) shared by every process.
+
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache(object):
+    """ A bounded, thread-safe LRU mapping where every entry carries its own
+    expiry time.
+
+    :param maxsize: Maximum number of entries kept. ``0`` disables the cache.
+    :type maxsize: int
+    :param timer: Clock returning the current time in seconds.
+    :type timer: callable
+
+    """
+
+    def __init__(self, maxsize=1024, timer=time.time):
+        self.maxsize = maxsize
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """ Returns the live value stored under ``key``, or ``default``.
+
+        """
+        with self._lock:
+            try:
+                value, expires_at = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires_at <= self.timer():
+                self.misses += 1
+                return default
+
+            # Re-insert to mark as most recently used.
+            self._data[key] = (value, expires_at)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at):
+        """ Stores ``value`` under ``key`` until the timestamp ``expires_at``.
+
+        """
+        if self.maxsize <= 0 or expires_at <= self.timer():
+            return
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires_at)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """ Hit/miss counters and current occupancy, e.g. for metrics.
+
+        :rtype: dict[str, int]
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+
+class InvalidationLog(object):
+    """ A sequence of invalidated cache keys, kept in a Django cache, which
+    tells processes what to evict from their L1 caches.
+
+    Each message is kept for ``timeout`` seconds, the longest an L1 entry
+    lives, as missed messages about older entries no longer matter.
+
+    Messages are numbered with ``incr``, which must be atomic for every
+    message to be delivered, as on memcached or redis. Elsewhere, e.g. on the
+    file backend, two processes publishing at once may draw the same number;
+    the one whose message is lost then makes every process clear its L1.
+
+    :param alias: Django cache alias to keep the log in
+    :type alias: str
+    :param timeout: Seconds each message is kept.
+    :type timeout: int
+    :param max_backlog: Most messages read at once. A process further
+        behind clears its L1 instead.
+    :type max_backlog: int
+    """
+
+    SEQUENCE_KEY = 'django_auth0_toolkit:invalidations'
+
+    def __init__(self, alias, timeout=60, max_backlog=100):
+        self.alias = alias
+        self.timeout = timeout
+        self.max_backlog = max_backlog
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_message_key(self, number):
+        return '{0}:{1}'.format(self.SEQUENCE_KEY, number)
+
+    def current(self):
+        """ Number of the latest message.
+
+        :rtype: int
+        """
+        return self.cache.get(self.SEQUENCE_KEY, 0)
+
+    def publish(self, keys):
+        """ Tells every process to evict ``keys`` from its L1.
+
+        :type keys: list[str]
+        """
+        cache = self.cache
+        cache.add(self.SEQUENCE_KEY, 0, None)
+        try:
+            number = cache.incr(self.SEQUENCE_KEY)
+        except ValueError:
+            # Evicted since being added.
+            cache.add(self.SEQUENCE_KEY, 0, None)
+            number = cache.incr(self.SEQUENCE_KEY)
+
+        if not cache.add(
+            self.get_message_key(number), list(keys), self.timeout
+        ):
+            # Another process drew the same number, with a non-atomic incr.
+            # Skipping more than a backlog of messages clears every L1, as
+            # does the sequence having been evicted.
+            logger.warning('Invalidation %d published twice', number)
+            try:
+                cache.incr(self.SEQUENCE_KEY, self.max_backlog + 1)
+            except ValueError:
+                pass
+
+    def read(self, after, upto):
+        """ Keys invalidated by messages ``after`` (exclusive) to ``upto``.
+
+        :return: The keys, or ``None`` if some messages are missing, so the
+            L1 must be cleared instead.
+        :rtype: list[str] | None
+        """
+        if not 0 <= upto - after <= self.max_backlog:
+            return None
+
+        message_keys = [
+            self.get_message_key(number)
+            for number in range(after + 1, upto + 1)
+        ]
+        messages = self.cache.get_many(message_keys)
+        if len(messages) < len(message_keys):
+            return None
+        return [key for message_key in message_keys
+                for key in messages[message_key]]
+
+
+class TieredCache(object):
+    """ A per-process :class:`LRUCache` (L1) in front of a Django cache (L2),
+    with the :class:`LRUCache` interface.
+
+    Writes go to both tiers. Reads try L1, then L2, copying L2 hits into L1
+    for at most ``l1_timeout`` seconds. At most every ``sync_interval``
+    seconds, keys published to ``invalidations`` by any process are evicted
+    from L1.
+
+    :param alias: Django cache alias of L2, or ``None`` for L1 only.
+    :type alias: str
+    :param l1_maxsize: Entries kept in L1. ``0`` disables it.
+    :type l1_maxsize: int
+    :param l1_timeout: Longest time, in seconds, an L2 entry is kept in L1.
+    :type l1_timeout: float
+    :param sync_interval: Seconds between reads of ``invalidations``.
+    :type sync_interval: float
+    :param invalidations: Where evictions are published, if anywhere.
+    :type invalidations: InvalidationLog
+    """
+
+    def __init__(
+        self, alias, l1_maxsize=1000, l1_timeout=60, sync_interval=1,
+        invalidations=None, timer=time.time,
+    ):
+        self.alias = alias
+        self.l1 = LRUCache(maxsize=l1_maxsize, timer=timer)
+        self.l1_timeout = l1_timeout
+        self.sync_interval = sync_interval
+        self.invalidations = invalidations
+        self.timer = timer
+        self._synced = None
+        self._next_sync = 0
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.l1)
+
+    @property
+    def l2(self):
+        if self.alias is None:
+            return None
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        """ Returns the live value stored under ``key``, or ``default``.
+
+        """
+        self.sync()
+
+        value = self.l1.get(key)
+        if value is not None or self.alias is None:
+            return default if value is None else value
+
+        entry = self.l2.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        self.l1.set(
+            key, value, min(expires_at, self.timer() + self.l1_timeout)
+        )
+        return value
+
+    def set(self, key, value, expires_at):
+        """ Stores ``value`` under ``key`` until the timestamp ``expires_at``.
+
+        """
+        now = self.timer()
+        if expires_at <= now:
+            return
+
+        if self.alias is not None:
+            self.l2.set(
+                key, (value, expires_at), int(math.ceil(expires_at - now))
+            )
+            expires_at = min(expires_at, now + self.l1_timeout)
+        self.l1.set(key, value, expires_at)
+
+    def delete(self, key):
+        """ Deletes ``key`` from both tiers, and has other processes evict
+        it from their L1.
+
+        """
+        if self.alias is not None:
+            self.l2.delete(key)
+        self.evict([key])
+
+    def evict(self, keys):
+        """ Has every process, this one included, evict ``keys`` from its L1.
+
+        :type keys: list[str]
+        """
+        for key in keys:
+            self.l1.delete(key)
+        if self.invalidations is not None:
+            self.invalidations.publish(keys)
+
+    def clear(self):
+        """ Empties this process's L1. L2 is shared, so it is kept. """
+        self.l1.clear()
+
+    def stats(self):
+        """ L1 hit/miss counters and occupancy, e.g. for metrics.
+
+        :rtype: dict[str, int]
+        """
+        return self.l1.stats()
+
+    def sync(self):
+        """ Evicts keys published to ``invalidations`` since the last sync,
+        if ``sync_interval`` has passed.
+
+        """
+        if self.invalidations is None:
+            return
+
+        now = self.timer()
+        if now < self._next_sync or not self._sync_lock.acquire(False):
+            return
+        try:
+            self._next_sync = now + self.sync_interval
+            current = self.invalidations.current()
+            if current == self._synced:
+                return
+
+            keys = None
+            if self._synced is not None:
+                keys = self.invalidations.read(self._synced, current)
+            if keys is None:
+                self.l1.clear()
+            else:
+                for key in keys:
+                    self.l1.delete(key)
+            self._synced = current
+        finally:
+            self._sync_lock.release()
+
+
+def get_token_hash(token):
+    """ Digest of a raw token, so caches never hold bearer credentials.
+
+    :type token: str
+    :rtype: str
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """ Returns the cache of verified token claims: a per-process L1 sized
+    by ``AUTH0_TOKEN_CACHE_SIZE``, in front of the Django cache named by
+    ``AUTH0_TOKEN_CACHE_ALIAS``, if set.
+
+    :rtype: TieredCache
+    """
+    global _token_cache
+    alias = getattr(settings, 'AUTH0_TOKEN_CACHE_ALIAS', None)
+    if _token_cache is None or _token_cache.alias != alias:
+        with _token_cache_lock:
+            if _token_cache is None or _token_cache.alias != alias:
+                _token_cache = TieredCache(
+                    alias,
+                    l1_maxsize=getattr(
+                        settings, 'AUTH0_TOKEN_CACHE_SIZE', 1000
+                    ),
+                    l1_timeout=getattr(
+                        settings, 'AUTH0_L1_CACHE_TIMEOUT', 60
+                    ),
+                )
+    return _token_cache
+
+
+_rejected_token_cache = None
+_rejected_token_cache_lock = threading.Lock()
+
+
+def get_rejected_token_cache():
+    """ Returns the per-process cache of recently rejected token hashes,
+    sized by ``AUTH0_REJECTED_TOKEN_CACHE_SIZE``.
+
+    :rtype: LRUCache
+    """
+    global _rejected_token_cache
+    if _rejected_token_cache is None:
+        with _rejected_token_cache_lock:
+            if _rejected_token_cache is None:
+                _rejected_token_cache = LRUCache(
+                    maxsize=getattr(
+                        settings, 'AUTH0_REJECTED_TOKEN_CACHE_SIZE', 1000
+                    )
+                )
+    return _rejected_token_cache
+
+
+def get_profile_cache():
+    """ Returns the Django cache named by ``AUTH0_PROFILE_CACHE_ALIAS``, or
+    ``None`` if profile caching is disabled.
+
+    """
+    alias = getattr(settings, 'AUTH0_PROFILE_CACHE_ALIAS', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+_user_info_cache = None
+_user_info_cache_lock = threading.Lock()
+
+
+def get_user_info_cache():
+    """ Returns the two-tier profile cache: a per-process L1 sized by
+    ``AUTH0_L1_CACHE_SIZE``, in front of the Django cache named by
+    ``AUTH0_PROFILE_CACHE_ALIAS``. ``None`` if profile caching is disabled.
+
+    :rtype: TieredCache | None
+    """
+    global _user_info_cache
+    alias = getattr(settings, 'AUTH0_PROFILE_CACHE_ALIAS', None)
+    if alias is None:
+        return None
+
+    if _user_info_cache is None or _user_info_cache.alias != alias:
+        with _user_info_cache_lock:
+            if _user_info_cache is None or _user_info_cache.alias != alias:
+                l1_timeout = getattr(settings, 'AUTH0_L1_CACHE_TIMEOUT', 60)
+                _user_info_cache = TieredCache(
+                    alias,
+                    l1_maxsize=getattr(settings, 'AUTH0_L1_CACHE_SIZE', 1000),
+                    l1_timeout=l1_timeout,
+                    sync_interval=getattr(
+                        settings, 'AUTH0_L1_SYNC_INTERVAL', 1
+                    ),
+                    invalidations=InvalidationLog(alias, timeout=l1_timeout),
+                )
+    return _user_info_cache
+
+
+def get_profile_cache_key(sub, prefix='profile'):
+    """ Cache key for the Auth0 profile of the user identified by ``sub``.
+
+    :type sub: str
+    :rtype: str
+    """
+    return 'django_auth0_toolkit:{prefix}:{digest}'.format(
+        prefix=prefix,
+        digest=hashlib.sha256(sub.encode('utf-8')).hexdigest(),
+    )
+
+
+def get_cached_user_info(sub):
+    """ Returns the cached Auth0 profile for ``sub``, if there is one.
+
+    :rtype: dict[str, object] | None
+    """
+    cache = get_user_info_cache()
+    if cache is None:
+        return None
+    return cache.get(get_profile_cache_key(sub))
+
+
+def get_stale_user_info(sub):
+    """ Returns the last Auth0 profile fetched for ``sub``, kept for up to
+    ``AUTH0_STALE_PROFILE_TIMEOUT`` seconds, for when Auth0 is unavailable.
+
+    :rtype: dict[str, object] | None
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return None
+    return cache.get(get_profile_cache_key(sub, prefix='stale-profile'))
+
+
+def set_cached_user_info(sub, user_info, expires_at=None):
+    """ Caches an Auth0 profile for ``sub``, for at most
+    ``AUTH0_PROFILE_CACHE_TIMEOUT`` seconds and never past ``expires_at``.
+
+    A stale copy is kept for ``AUTH0_STALE_PROFILE_TIMEOUT`` seconds, for
+    :func:`get_stale_user_info`.
+
+    """
+    cache = get_profile_cache()
+    if cache is None:
+        return
+
+    stale_timeout = getattr(settings, 'AUTH0_STALE_PROFILE_TIMEOUT', 604800)
+    if stale_timeout:
+        cache.set(
+            get_profile_cache_key(sub, prefix='stale-profile'),
+            user_info,
+            stale_timeout,
+        )
+
+    timeout = getattr(settings, 'AUTH0_PROFILE_CACHE_TIMEOUT', 600)
+    now = time.time()
+    if expires_at is not None:
+        timeout = min(timeout, int(expires_at - now))
+    if timeout <= 0:
+        return
+
+    get_user_info_cache().set(
+        get_profile_cache_key(sub), user_info, now + timeout
+    )
+
+
+def invalidate_user_info(sub):
+    """ Drops the cached Auth0 profile for ``sub`` from every process, e.g.
+    after the profile was changed in Auth0.
+
+    The stale copy is kept, as it is only used while Auth0 is unavailable.
+
+    :type sub: str
+    """
+    cache = get_user_info_cache()
+    if cache is not None:
+        cache.delete(get_profile_cache_key(sub))
+
+
+def evict_user_info(sub):
+    """ Has every process drop its L1 copy of the Auth0 profile for ``sub``,
+    keeping the shared copy, e.g. after a newly fetched profile changed the
+    user.
+
+    :type sub: str
+    """
+    cache = get_user_info_cache()
+    if cache is not None:
+        cache.evict([get_profile_cache_key(sub)])
+
+
+def get_user_cache():
+    """ Returns the Django cache named by ``AUTH0_USER_CACHE_ALIAS``, or
+    ``None`` if user caching is disabled.
+
+    """
+    alias = getattr(settings, 'AUTH0_USER_CACHE_ALIAS', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_user_cache_key(pk):
+    """ Cache key for the user with primary key ``pk``.
+
+    :rtype: str
+    """
+    return 'django_auth0_toolkit:user:{pk}'.format(pk=pk)
+
+
+def get_cached_user(pk):
+    """ Returns the cached user with primary key ``pk``, if there is one.
+
+    :rtype: django.contrib.auth.models.User | None
+    """
+    cache = get_user_cache()
+    if cache is None:
+        return None
+    return cache.get(get_user_cache_key(pk))
+
+
+def set_cached_user(user):
+    """ Caches a user for ``AUTH0_USER_CACHE_TIMEOUT`` seconds.
+
+    """
+    cache = get_user_cache()
+    if cache is not None:
+        cache.set(
+            get_user_cache_key(user.pk),
+            user,
+            getattr(settings, 'AUTH0_USER_CACHE_TIMEOUT', 300),
+        )
+
+
+def invalidate_cached_users(pks):
+    """ Drops the cached users with primary keys ``pks``, after they were
+    changed or deleted.
+
+    :type pks: list
+    """
+    cache = get_user_cache()
+    if cache is not None and pks:
+        cache.delete_many([get_user_cache_key(pk) for pk in pks])
+
+
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    """ ``post_save`` and ``post_delete`` receiver for the user model. """
+    invalidate_cached_users([instance.pk])
@@ -0,0 +1,207 @@
+""" Circuit breaker for calls to Auth0.
+
+When too many recent calls fail, the circuit opens and calls fail fast with
+:class:`~django_auth0_toolkit.exceptions.Auth0UnavailableException` rather
+than tying up workers waiting on Auth0. After ``reset_timeout`` seconds the
+circuit is half-open: a trial call is let through, and closes the circuit if
+it succeeds or re-opens it if it fails.
+
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.dispatch import Signal
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+circuit_state_changed = Signal(
+    providing_args=['breaker', 'old_state', 'new_state']
+)
+
+
+class CircuitBreaker(object):
+    """ Thread-safe circuit breaker, tripped by the failure rate of the last
+    ``window_size`` calls.
+
+    :param failure_rate_threshold: Failure rate, from 0 to 1, that opens
+        the circuit.
+    :type failure_rate_threshold: float
+    :param minimum_calls: Calls needed in the window before the failure
+        rate is acted on.
+    :type minimum_calls: int
+    :param window_size: Number of most recent calls considered.
+    :type window_size: int
+    :param reset_timeout: Seconds the circuit stays open before a trial call.
+    :type reset_timeout: float
+    :param half_open_max_calls: Concurrent trial calls when half-open.
+    :type half_open_max_calls: int
+    """
+
+    def __init__(
+        self, failure_rate_threshold=0.5, minimum_calls=10, window_size=20,
+        reset_timeout=30, half_open_max_calls=1, timer=time.time,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.timer = timer
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self._outcomes = deque(maxlen=window_size)
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """ Whether a call may be made now. Each call allowed must be
+        followed by :meth:`record_success` or :meth:`record_failure`.
+
+        :rtype: bool
+        """
+        change = None
+        with self._lock:
+            if self.state == OPEN:
+                if self.timer() - self.opened_at < self.reset_timeout:
+                    return False
+                change = self._set_state(HALF_OPEN)
+                self._trial_calls = 0
+
+            allowed = True
+            if self.state == HALF_OPEN:
+                allowed = self._trial_calls < self.half_open_max_calls
+                if allowed:
+                    self._trial_calls += 1
+
+        self._notify(change)
+        return allowed
+
+    def record_success(self):
+        change = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._outcomes.clear()
+                change = self._set_state(CLOSED)
+            elif self.state == CLOSED:
+                self._outcomes.append(True)
+        self._notify(change)
+
+    def record_failure(self):
+        change = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                change = self._open()
+            elif self.state == CLOSED:
+                self._outcomes.append(False)
+                if (
+                    len(self._outcomes) >= self.minimum_calls and
+                    self._failure_rate() >= self.failure_rate_threshold
+                ):
+                    change = self._open()
+        self._notify(change)
+
+    def stats(self):
+        """ Current state and failure rate, e.g. for metrics.
+
+        :rtype: dict[str, object]
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_rate': self._failure_rate(),
+                'calls': len(self._outcomes),
+                'times_opened': self.times_opened,
+                'opened_at': self.opened_at,
+            }
+
+    def _failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        failures = len(self._outcomes) - sum(self._outcomes)
+        return float(failures) / len(self._outcomes)
+
+    def _open(self):
+        self.opened_at = self.timer()
+        self.times_opened += 1
+        self._outcomes.clear()
+        return self._set_state(OPEN)
+
+    def _set_state(self, state):
+        old_state, self.state = self.state, state
+        return old_state, state
+
+    def _notify(self, change):
+        # Called without the lock held, so receivers may inspect the breaker.
+        if change is None:
+            return
+
+        old_state, new_state = change
+        if new_state == OPEN:
+            logger.warning('Auth0 circuit breaker opened')
+        else:
+            logger.info('Auth0 circuit breaker %s', new_state)
+
+        circuit_state_changed.send(
+            sender=CircuitBreaker,
+            breaker=self,
+            old_state=old_state,
+            new_state=new_state,
+        )
+
+
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def build_circuit_breaker():
+    """ Builds a circuit breaker configured by the
+    ``AUTH0_CIRCUIT_BREAKER_*`` settings, or returns ``None`` if
+    ``AUTH0_CIRCUIT_BREAKER_FAILURE_RATE`` is ``None``.
+
+    :rtype: CircuitBreaker | None
+    """
+    failure_rate = getattr(
+        settings, 'AUTH0_CIRCUIT_BREAKER_FAILURE_RATE', 0.5
+    )
+    if failure_rate is None:
+        return None
+
+    return CircuitBreaker(
+        failure_rate_threshold=failure_rate,
+        minimum_calls=getattr(
+            settings, 'AUTH0_CIRCUIT_BREAKER_MINIMUM_CALLS', 10
+        ),
+        window_size=getattr(settings, 'AUTH0_CIRCUIT_BREAKER_WINDOW', 20),
+        reset_timeout=getattr(
+            settings, 'AUTH0_CIRCUIT_BREAKER_RESET_TIMEOUT', 30
+        ),
+    )
+
+
+def get_circuit_breaker():
+    """ Returns the per-process circuit breaker for calls to Auth0, built by
+    :func:`build_circuit_breaker`, or ``None`` if it is disabled.
+
+    :rtype: CircuitBreaker | None
+    """
+    global _circuit_breaker
+    failure_rate = getattr(
+        settings, 'AUTH0_CIRCUIT_BREAKER_FAILURE_RATE', 0.5
+    )
+    if failure_rate is None:
+        return None
+
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = build_circuit_breaker()
+    return _circuit_breaker
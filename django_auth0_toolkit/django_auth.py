@@ -1,12 +1,90 @@
 # -*- coding: utf-8 -*-
+import time
 
-from django.contrib.auth import authenticate, login
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user, login
+
+from django_auth0_toolkit.cache import get_stale_user_info
+from django_auth0_toolkit.timing import time_stage
+
+
+PROFILE_REFRESHED_SESSION_KEY = '_auth0_profile_refreshed'
 
 
 def register_and_login_auth0_user(request, user_info, do_login=True):
     # NB: Expects an authentication backend that can handle these kwargs.
-    user = authenticate(user_info=user_info)
+    with time_stage(request, 'authenticate'):
+        user = authenticate(user_info=user_info)
     if do_login and user.is_active:
-        login(request, user)
+        with time_stage(request, 'login'):
+            login(request, user)
+        request.session[PROFILE_REFRESHED_SESSION_KEY] = {
+            'user_id': user_info['user_id'],
+            'refreshed_at': time.time(),
+        }
 
     return user
+
+
+def get_logged_in_auth0_user(request, user_id, refresh_interval=None):
+    """ Returns the session's user if they were logged in as the Auth0 user
+    ``user_id``, and their profile was refreshed less than
+    ``refresh_interval`` seconds ago.
+
+    :param user_id: Auth0 user ID, see
+        :func:`~django_auth0_toolkit.tenants.get_user_id`
+    :type user_id: str
+    :param refresh_interval: Defaults to ``AUTH0_PROFILE_REFRESH_INTERVAL``.
+    :type refresh_interval: float
+    :rtype: django.contrib.auth.models.User | None
+    """
+    interval = refresh_interval
+    if interval is None:
+        interval = getattr(settings, 'AUTH0_PROFILE_REFRESH_INTERVAL', 300)
+    refreshed = request.session.get(PROFILE_REFRESHED_SESSION_KEY)
+    if (
+        not refreshed or
+        refreshed['user_id'] != user_id or
+        time.time() - refreshed['refreshed_at'] >= interval
+    ):
+        return None
+
+    user = get_user(request)
+    if not user.is_authenticated():
+        return None
+
+    return user
+
+
+def get_known_auth0_user(request, user_id, use_session=True):
+    """ Returns the user for the Auth0 user ``user_id`` without asking Auth0,
+    for while it is unavailable: the session's user if logged in as them,
+    however long ago, or else a user authenticated from their stale profile,
+    or else the user linked to them, as last saved.
+
+    The session isn't changed, so the profile is refreshed once Auth0 is
+    back.
+
+    :param user_id: Auth0 user ID of a verified ID token, see
+        :func:`~django_auth0_toolkit.tenants.get_user_id`
+    :type user_id: str
+    :param use_session: Whether to consider the session's user.
+    :type use_session: bool
+    :rtype: django.contrib.auth.models.User | None
+    """
+    if use_session:
+        user = get_logged_in_auth0_user(
+            request, user_id, refresh_interval=float('inf')
+        )
+        if user is not None:
+            return user
+
+    user_info = get_stale_user_info(user_id)
+    if user_info is None:
+        # Imported here, as it loads models, so the middleware can be
+        # imported before apps are ready.
+        from django_auth0_toolkit.auth_backends import Auth0Backend
+        return Auth0Backend().get_user_by_auth0_id(user_id)
+
+    with time_stage(request, 'authenticate'):
+        return authenticate(user_info=user_info)
@@ -5,3 +5,10 @@ class Auth0Exception(Exception):
 class InvalidTokenException(Auth0Exception):
     def __init__(self, token):
         self.token = token
+
+
+class Auth0UnavailableException(Auth0Exception):
+    """ Auth0 couldn't be reached or answered with a server error, or the
+    circuit breaker is open after too many such failures.
+
+    """
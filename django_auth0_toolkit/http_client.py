@@ -0,0 +1,149 @@
+""" Shared HTTP client for calls to Auth0.
+
+Re-using one :class:`requests.Session` per process keeps connections to
+``AUTH0_DOMAIN`` alive between calls, saving a TCP and TLS handshake each time.
+
+"""
+import os
+import threading
+
+import requests
+from django.conf import settings
+from django.utils.six.moves.http_cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from django_auth0_toolkit.circuitbreaker import get_circuit_breaker
+from django_auth0_toolkit.exceptions import Auth0UnavailableException
+
+
+class Auth0HttpClient(object):
+    """ Pooled, keep-alive HTTP client with retries and timeouts.
+
+    Only idempotent requests are retried, on connection errors and on
+    gateway-style 5xx responses. Failed requests and 5xx responses left
+    after retries raise
+    :class:`~django_auth0_toolkit.exceptions.Auth0UnavailableException`.
+    Every call made counts as a success or failure for the circuit
+    ``breaker``, whatever it raises.
+
+    :param pool_size: Connections kept open per host.
+    :type pool_size: int
+    :param max_retries: Retries for idempotent requests.
+    :type max_retries: int
+    :param backoff_factor: Back-off between retries, as per :class:`Retry`.
+    :type backoff_factor: float
+    :param timeout: ``(connect, read)`` timeouts in seconds.
+    :type timeout: (float, float)
+    :param breaker: Circuit breaker guarding the calls, if any.
+    :type breaker: django_auth0_toolkit.circuitbreaker.CircuitBreaker
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    def __init__(
+        self, pool_size=10, max_retries=2, backoff_factor=0.1,
+        timeout=(3.05, 10), breaker=None,
+    ):
+        self.timeout = timeout
+        self.breaker = breaker
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # The session serves every user of the process, so cookies Auth0
+        # sets for one mustn't be sent on behalf of the next.
+        self.session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[])
+        )
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+
+        if self.breaker is not None and not self.breaker.allow_request():
+            raise Auth0UnavailableException('Auth0 circuit breaker is open')
+
+        # A call left unrecorded would hold a half-open breaker's trial
+        # slot for good.
+        success = False
+        try:
+            res = self.session.request(method, url, **kwargs)
+            if res.status_code >= 500:
+                raise Auth0UnavailableException(
+                    'Auth0 responded {status}'.format(status=res.status_code)
+                )
+            success = True
+        except requests.RequestException as exc:
+            raise Auth0UnavailableException(exc)
+        finally:
+            self.record_outcome(success)
+
+        return res
+
+    def record_outcome(self, success):
+        if self.breaker is None:
+            return
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def get(self, url, params=None, **kwargs):
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data=data, **kwargs)
+
+
+def build_http_client(breaker=None):
+    """ Builds an :class:`Auth0HttpClient` configured by the
+    ``AUTH0_HTTP_*`` settings.
+
+    :param breaker: Circuit breaker guarding the client's calls, if any.
+    :type breaker: django_auth0_toolkit.circuitbreaker.CircuitBreaker
+    :rtype: Auth0HttpClient
+    """
+    return Auth0HttpClient(
+        pool_size=getattr(settings, 'AUTH0_HTTP_POOL_SIZE', 10),
+        max_retries=getattr(settings, 'AUTH0_HTTP_MAX_RETRIES', 2),
+        backoff_factor=getattr(settings, 'AUTH0_HTTP_BACKOFF_FACTOR', 0.1),
+        timeout=getattr(settings, 'AUTH0_HTTP_TIMEOUT', (3.05, 10)),
+        breaker=breaker,
+    )
+
+
+_http_client = None
+_http_client_pid = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """ Returns this process's shared :class:`Auth0HttpClient`, configured by
+    the ``AUTH0_HTTP_*`` settings.
+
+    A new client is built after a fork, so workers never share sockets.
+
+    :rtype: Auth0HttpClient
+    """
+    global _http_client, _http_client_pid
+    pid = os.getpid()
+    if _http_client is None or _http_client_pid != pid:
+        with _http_client_lock:
+            if _http_client is None or _http_client_pid != pid:
+                _http_client = build_http_client(
+                    breaker=get_circuit_breaker(),
+                )
+                _http_client_pid = pid
+    return _http_client
@@ -0,0 +1,175 @@
+""" Public keys for verifying RS256-signed JWTs, from an Auth0 JWKS endpoint.
+
+https://auth0.com/docs/jwks
+
+"""
+import base64
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from django_auth0_toolkit.exceptions import Auth0Exception
+from django_auth0_toolkit.http_client import get_http_client
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.asymmetric.rsa import (
+        RSAPublicNumbers,
+    )
+except ImportError:  # pragma: no cover
+    default_backend = None
+    RSAPublicNumbers = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def base64url_to_int(value):
+    """ Decodes a base64url-encoded, big-endian unsigned integer, as used for
+    the ``n`` and ``e`` members of an RSA JWK.
+
+    :type value: str
+    :rtype: int
+    """
+    value = value.encode('ascii') if not isinstance(value, bytes) else value
+    data = base64.urlsafe_b64decode(value + b'=' * (-len(value) % 4))
+    return int(base64.b16encode(data), 16)
+
+
+def load_rsa_public_key(jwk):
+    """ Parses an RSA JWK into a :mod:`cryptography` public key object, which
+    :mod:`PyJWT` accepts as an RS256 key.
+
+    :param jwk: A single key from a JWKS document
+    :type jwk: dict[str, str]
+    """
+    if RSAPublicNumbers is None:
+        raise ImproperlyConfigured(
+            'RS256 verification requires the cryptography package.'
+        )
+    numbers = RSAPublicNumbers(
+        base64url_to_int(jwk['e']),
+        base64url_to_int(jwk['n']),
+    )
+    return numbers.public_key(default_backend())
+
+
+class JSONWebKeySet(object):
+    """ In-process cache of the signing keys published at a JWKS URL.
+
+    Keys are parsed once and looked up by ``kid``. The key set is only fetched
+    again when a token names an unknown ``kid``, and then at most once every
+    ``min_refresh_interval`` seconds, or every ``retry_interval`` seconds
+    while failed fetches leave no keys cached.
+
+    :param url: JWKS URL
+    :type url: str
+    :param min_refresh_interval: Minimum seconds between fetches.
+    :type min_refresh_interval: float
+    :param retry_interval: Minimum seconds between fetches while no keys are
+        cached.
+    :type retry_interval: float
+    :param get_client: Returns the HTTP client to fetch with. Defaults to
+        :func:`~django_auth0_toolkit.http_client.get_http_client`.
+    """
+
+    def __init__(
+        self, url, min_refresh_interval=300, retry_interval=10,
+        timer=time.time, get_client=None,
+    ):
+        self.url = url
+        self.min_refresh_interval = min_refresh_interval
+        self.retry_interval = retry_interval
+        self.get_client = get_client or get_http_client
+        self.timer = timer
+        self._keys = {}
+        self._next_fetch = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid):
+        """ Returns the public key with the given ``kid``.
+
+        :raises ValueError: No such key is published.
+        """
+        key = self._keys.get(kid)
+        if key is None:
+            with self._lock:
+                key = self._keys.get(kid)
+                if key is None and self._may_refresh():
+                    self.refresh()
+                    key = self._keys.get(kid)
+
+        if key is None:
+            raise ValueError('Unknown signing key')
+        return key
+
+    def _may_refresh(self):
+        return self._next_fetch is None or self.timer() >= self._next_fetch
+
+    def refresh(self):
+        """ Fetches and parses the published key set, replacing the cached
+        one. On failure, including while Auth0 is unavailable, the cached
+        keys are kept. Malformed keys are skipped.
+
+        """
+        now = self.timer()
+        self._next_fetch = now + self.min_refresh_interval
+
+        try:
+            res = self.get_client().get(self.url)
+            res.raise_for_status()
+            jwks = res.json()
+        except (requests.RequestException, Auth0Exception, ValueError):
+            logger.exception('JWKS fetch failed')
+            if not self._keys:
+                self._next_fetch = now + min(
+                    self.retry_interval, self.min_refresh_interval
+                )
+            return
+
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            if jwk.get('kty') != 'RSA' or jwk.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[jwk.get('kid')] = load_rsa_public_key(jwk)
+            except (AttributeError, KeyError, TypeError, ValueError) as exc:
+                logger.warning(
+                    'Skipping malformed signing key %s from %s: %r',
+                    jwk.get('kid'), self.url, exc,
+                )
+
+        logger.debug('Loaded %d signing keys from %s', len(keys), self.url)
+        self._keys = keys
+
+
+_key_set = None
+_key_set_lock = threading.Lock()
+
+
+def get_key_set():
+    """ Returns the shared :class:`JSONWebKeySet` for ``AUTH0_DOMAIN``, or
+    ``AUTH0_JWKS_URL`` if set.
+
+    :rtype: JSONWebKeySet
+    """
+    global _key_set
+    if _key_set is None:
+        with _key_set_lock:
+            if _key_set is None:
+                url = getattr(settings, 'AUTH0_JWKS_URL', None) or (
+                    'https://{domain}/.well-known/jwks.json'.format(
+                        domain=settings.AUTH0_DOMAIN,
+                    )
+                )
+                _key_set = JSONWebKeySet(
+                    url,
+                    min_refresh_interval=getattr(
+                        settings, 'AUTH0_JWKS_MIN_REFRESH_INTERVAL', 300
+                    ),
+                )
+    return _key_set
@@ -0,0 +1,214 @@
+""" Creates or updates Django users from an Auth0 user export.
+
+https://auth0.com/docs/users/guides/bulk-user-exports
+
+"""
+import csv
+import io
+import json
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import six
+
+from django_auth0_toolkit.auth_backends import Auth0Backend
+from django_auth0_toolkit.cache import invalidate_cached_users
+from django_auth0_toolkit.models import Auth0Identity
+
+
+def read_ndjson(path):
+    with io.open(path, encoding='utf-8') as export_file:
+        for line in export_file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path):
+    if six.PY2:
+        with open(path, 'rb') as export_file:
+            for row in csv.DictReader(export_file):
+                yield dict(
+                    (key.decode('utf-8'), value.decode('utf-8'))
+                    for key, value in row.items()
+                )
+    else:
+        with io.open(path, encoding='utf-8', newline='') as export_file:
+            for row in csv.DictReader(export_file):
+                yield row
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'json': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def iter_batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates or updates users from an Auth0 user export, using the same '
+        'field mapping as Auth0Backend.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV export file')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Export format. Defaults to the file extension.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users read and written per batch.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        export_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if export_format not in READERS:
+            raise CommandError(
+                'Unknown export format {0!r}, use --format'.format(
+                    export_format
+                )
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        backend = Auth0Backend()
+        totals = {'processed': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+
+        rows = READERS[export_format](path)
+        for batch in iter_batches(rows, options['batch_size']):
+            created, updated, skipped = self.import_batch(backend, batch)
+
+            totals['processed'] += len(batch)
+            totals['created'] += created
+            totals['updated'] += updated
+            totals['skipped'] += skipped
+            self.stdout.write(
+                'Processed {processed} users ({created} created, '
+                '{updated} updated, {skipped} skipped)'.format(**totals)
+            )
+
+        self.stdout.write(self.style.SUCCESS('Import finished'))
+
+    def import_batch(self, backend, batch):
+        """ Creates and updates the users of one batch of export rows.
+
+        New users whose username, the truncated Auth0 user ID, is already
+        used, by another user or earlier in the batch, are skipped and
+        reported.
+
+        :return: Numbers of users created, updated and skipped
+        :rtype: (int, int, int)
+        """
+        UserModel = get_user_model()
+
+        user_infos = OrderedDict()
+        for user_info in batch:
+            if user_info.get('user_id'):
+                user_infos.setdefault(user_info['user_id'], []).append(
+                    user_info
+                )
+
+        existing = backend.get_users_by_auth0_ids(list(user_infos))
+
+        new_usernames = dict(
+            (user_id, backend.get_username(infos[0]))
+            for user_id, infos in user_infos.items()
+            if user_id not in existing
+        )
+        taken = set(UserModel._default_manager.filter(**{
+            UserModel.USERNAME_FIELD + '__in': set(new_usernames.values()),
+        }).values_list(UserModel.USERNAME_FIELD, flat=True))
+
+        to_create = OrderedDict()
+        to_update = {}
+        update_fields = set()
+        skipped = 0
+        for user_id, infos in user_infos.items():
+            user = existing.get(user_id)
+            is_new = user is None
+            if is_new:
+                username = new_usernames[user_id]
+                if username in taken or username in to_create:
+                    self.stderr.write(
+                        'Skipped {0}: username {1} is already used'.format(
+                            user_id, username,
+                        )
+                    )
+                    skipped += 1
+                    continue
+                user = UserModel(password='auth0', **{
+                    UserModel.USERNAME_FIELD: username,
+                })
+
+            changed_fields = set()
+            for user_info in infos:
+                changed_fields.update(backend.update_user(user, user_info))
+
+            if is_new:
+                to_create[user.get_username()] = (user_id, user)
+            elif changed_fields:
+                to_update[user.pk] = user
+                update_fields.update(changed_fields)
+
+        with transaction.atomic():
+            self.create_users(to_create)
+            self.bulk_update(list(to_update.values()), sorted(update_fields))
+
+        # Bulk writes don't send post_save.
+        invalidate_cached_users(list(to_update))
+
+        return len(to_create), len(to_update), skipped
+
+    def create_users(self, to_create):
+        """ Bulk creates users and their identities.
+
+        :param to_create: Auth0 user ID and unsaved user, by username
+        :type to_create: dict[str, (str, django.contrib.auth.models.User)]
+        """
+        if not to_create:
+            return
+
+        UserModel = get_user_model()
+        UserModel._default_manager.bulk_create(
+            [user for _, user in to_create.values()]
+        )
+
+        # Not every database returns primary keys from bulk_create.
+        created = UserModel._default_manager.filter(**{
+            UserModel.USERNAME_FIELD + '__in': list(to_create),
+        })
+        Auth0Identity.objects.bulk_create([
+            Auth0Identity(sub=to_create[user.get_username()][0], user=user)
+            for user in created
+        ])
+
+    def bulk_update(self, users, fields):
+        if not users:
+            return
+
+        manager = get_user_model()._default_manager
+        if hasattr(manager, 'bulk_update'):
+            manager.bulk_update(users, fields)
+        else:
+            # Older Django has no bulk_update; still one transaction.
+            for user in users:
+                user.save(update_fields=fields)
@@ -1,25 +1,130 @@
 from __future__ import unicode_literals
 
+import functools
 import logging
+import time
 
 from django.conf import settings
 from django.contrib import auth as django_auth
 from django.utils.functional import SimpleLazyObject
 from django.utils.six import text_type
 
-from django_auth0_toolkit.auth_api import get_user_info_with_id_token
-from django_auth0_toolkit.django_auth import register_and_login_auth0_user
-from django_auth0_toolkit.tokens import get_decoded_token
+from django_auth0_toolkit.auth_api import get_user_info
+from django_auth0_toolkit.cache import (
+    get_rejected_token_cache,
+    get_token_cache,
+    get_token_hash,
+)
+from django_auth0_toolkit.django_auth import (
+    get_known_auth0_user,
+    get_logged_in_auth0_user,
+    register_and_login_auth0_user,
+)
+from django_auth0_toolkit.exceptions import Auth0UnavailableException
+from django_auth0_toolkit.refresh import (
+    get_profile_refresher,
+    get_recently_refreshed_user,
+    is_background_refresh_enabled,
+)
+from django_auth0_toolkit.sharedmemory import get_shared_token_table
+from django_auth0_toolkit.tenants import get_tenant_for_token, get_user_id
+from django_auth0_toolkit.timing import add_server_timing_header, time_stage
+from django_auth0_toolkit.users import ClaimsUser
 
 
 logger = logging.getLogger(__name__)
 
 
+def get_verified_claims(id_token):
+    """ Verifies an ID token, re-using the claims of an identical token
+    verified earlier in this process, or, with
+    ``AUTH0_TOKEN_SHARED_MEMORY_PATH`` set, by another process on this host.
+
+    The token is verified by the tenant its ``iss`` and ``aud`` claims name.
+    Claims are kept until the token's ``exp``, and at most
+    ``AUTH0_TOKEN_CACHE_TIMEOUT`` seconds. Rejected tokens are rejected again
+    without verifying them for ``AUTH0_REJECTED_TOKEN_CACHE_TIMEOUT``
+    seconds.
+
+    :param id_token: ID token received from the client
+    :type id_token: str
+    :return: Decoded JWT claims
+    :rtype: dict[str, object]
+    :raises ValueError: The token was invalid, or has no ``sub`` claim.
+    """
+    cache = get_token_cache()
+    key = get_token_hash(id_token)
+
+    claims = cache.get(key)
+    if claims is None:
+        rejected_cache = get_rejected_token_cache()
+        if rejected_cache.get(key):
+            raise ValueError('Invalid Token')
+
+        shared_table = get_shared_token_table()
+        shared = False
+        try:
+            if shared_table is not None:
+                claims = shared_table.get_claims(id_token, key)
+                shared = claims is not None
+            if claims is None:
+                claims = get_tenant_for_token(id_token).verifier.verify(
+                    id_token
+                )
+            # Users are identified by ``sub``, which Auth0 always sets.
+            if not claims.get('sub'):
+                raise ValueError('Invalid Token')
+        except ValueError:
+            expires_at = time.time() + getattr(
+                settings, 'AUTH0_REJECTED_TOKEN_CACHE_TIMEOUT', 60
+            )
+            rejected_cache.set(key, True, expires_at)
+            if shared_table is not None:
+                shared_table.set_rejected(key, expires_at)
+            raise
+
+        expires_at = time.time() + getattr(
+            settings, 'AUTH0_TOKEN_CACHE_TIMEOUT', 600
+        )
+        if 'exp' in claims:
+            expires_at = min(expires_at, claims['exp'])
+        cache.set(key, claims, expires_at)
+        if shared_table is not None and not shared:
+            shared_table.set_claims(key, claims, expires_at)
+
+    return dict(claims)
+
+
+def auth0_stateless(view_func):
+    """ Marks a view as stateless: bearer tokens sent to it authenticate the
+    request without logging the user in to the session.
+
+    """
+    view_func.auth0_stateless = True
+    return view_func
+
+
+def is_stateless_request(request):
+    """ Whether the request is for a stateless view, or a path under one of
+    ``AUTH0_STATELESS_URL_PREFIXES``.
+
+    """
+    if getattr(request, 'auth0_stateless', False):
+        return True
+
+    prefixes = getattr(settings, 'AUTH0_STATELESS_URL_PREFIXES', ())
+    return bool(prefixes) and request.path_info.startswith(tuple(prefixes))
+
+
 def get_user_from_request(request):
     """
     Returns the user model instance associated with the given request session.
     If no user is retrieved an instance of `AnonymousUser` is returned.
 
+    With ``AUTH0_CLAIMS_USER`` enabled, stateless requests get a
+    :class:`~django_auth0_toolkit.users.ClaimsUser` instead, which only loads
+    the user model instance when it is needed.
+
     """
     user = None
 
@@ -42,31 +147,77 @@ def get_user_from_request(request):
         else:
             # Confirm its not a phoney token
             try:
-                get_decoded_token(
-                    id_token,
-                    settings.AUTH0_CLIENT_SECRET,
-                    settings.AUTH0_CLIENT_ID,
-                )
+                with time_stage(request, 'verify'):
+                    claims = get_verified_claims(id_token)
             except ValueError:
                 logger.debug('Auth failed due to bad ID token')
                 pass
             else:
-                # TODO if there is already a logged in user, and it's this
-                # user, don't re-fetch their details.
-
-                # TODO avoid a fetch if the token already includes a rich
-                # profile
+                stateless = is_stateless_request(request)
 
-                user_info = get_user_info_with_id_token(
-                    id_token
-                )
+                if stateless and getattr(settings, 'AUTH0_CLAIMS_USER', False):
+                    return ClaimsUser(claims, functools.partial(
+                        get_auth0_user, request, id_token, claims, stateless,
+                    ))
 
-                user = register_and_login_auth0_user(request, user_info)
+                user = get_auth0_user(request, id_token, claims, stateless)
 
     # if no user, we fall back to Django's normal AuthenticationMiddleware
     return user or django_auth.get_user(request)
 
 
+def get_auth0_user(request, id_token, claims, stateless):
+    """ Returns the user for a verified ID token, from the session if they are
+    logged in already, or else from their Auth0 profile.
+
+    :param id_token: Verified ID token
+    :type id_token: str
+    :param claims: Claims of ``id_token``
+    :type claims: dict[str, object]
+    :param stateless: If true, the session is neither used nor changed.
+    :type stateless: bool
+    :rtype: django.contrib.auth.models.User | None
+    """
+    user_id = get_user_id(claims)
+
+    # If this user is already logged in, and their details are fresh
+    # enough, don't re-fetch them.
+    if not stateless:
+        with time_stage(request, 'session'):
+            user = get_logged_in_auth0_user(request, user_id)
+        if user is not None:
+            return user
+
+    background_refresh = is_background_refresh_enabled()
+    if background_refresh:
+        user, stale = get_recently_refreshed_user(request, claims, stateless)
+        if user is not None:
+            if stale:
+                get_profile_refresher().submit(user_id, id_token, claims)
+            return user
+
+    try:
+        with time_stage(request, 'profile'):
+            user_info = get_user_info(id_token, claims=claims)
+    except Auth0UnavailableException:
+        # Serve users we already know, from the token alone.
+        user = get_known_auth0_user(
+            request, user_id, use_session=not stateless
+        )
+        if user is None:
+            logger.warning(
+                'Auth0 unavailable, and user %s is not known', user_id,
+            )
+        return user
+
+    user = register_and_login_auth0_user(
+        request, user_info, do_login=not stateless
+    )
+    if background_refresh:
+        get_profile_refresher().mark_refreshed(user_id)
+    return user
+
+
 def get_user(request):
     if not hasattr(request, '_cached_user'):
         request._cached_user = get_user_from_request(request)
@@ -82,3 +233,12 @@ class Auth0AuthenticationMiddleware(object):
             "'django.contrib.auth.middleware.AuthenticationMiddleware'."
         )
         request.user = SimpleLazyObject(lambda: get_user(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # request.user is resolved lazily, normally within the view, so this
+        # still applies to it.
+        if getattr(view_func, 'auth0_stateless', False):
+            request.auth0_stateless = True
+
+    def process_response(self, request, response):
+        return add_server_timing_header(request, response)
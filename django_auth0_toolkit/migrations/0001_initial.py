@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Auth0Identity',
+            fields=[
+                ('sub', models.CharField(
+                    max_length=255,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='Auth0 user ID',
+                )),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='auth0_identities',
+                    to=settings.AUTH_USER_MODEL,
+                )),
+            ],
+            options={
+                'verbose_name': 'Auth0 identity',
+                'verbose_name_plural': 'Auth0 identities',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import migrations
+
+# Usernames were the last 30 characters of the Auth0 user ID.
+LEGACY_USERNAME_LENGTH = 30
+
+
+def link_existing_users(apps, schema_editor):
+    """ Links users whose username is a whole Auth0 user ID. Usernames that
+    may have been truncated are linked by ``Auth0Backend`` on next log-in.
+
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Auth0Identity = apps.get_model('django_auth0_toolkit', 'Auth0Identity')
+    username_field = get_user_model().USERNAME_FIELD
+
+    users = User._default_manager.filter(
+        **{username_field + '__contains': '|'}
+    ).values_list('pk', username_field)
+
+    identities = [
+        Auth0Identity(sub=username, user_id=pk)
+        for pk, username in users.iterator()
+        if len(username) < LEGACY_USERNAME_LENGTH
+    ]
+    Auth0Identity.objects.bulk_create(identities, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_auth0_toolkit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+
+
+@python_2_unicode_compatible
+class Auth0Identity(models.Model):
+    """ Links an Auth0 user ID, i.e. an ID token's ``sub``, to a Django user.
+    Users of tenants other than the default are prefixed with the tenant's
+    name, see :func:`~django_auth0_toolkit.tenants.get_user_id`.
+
+    A user can have several identities, e.g. one per linked social
+    connection.
+
+    """
+    sub = models.CharField(
+        'Auth0 user ID', max_length=255, primary_key=True,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth0_identities',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Auth0 identity'
+        verbose_name_plural = 'Auth0 identities'
+
+    def __str__(self):
+        return self.sub
@@ -0,0 +1,43 @@
+""" Per-process rate limiting.
+
+"""
+import threading
+import time
+
+
+class TokenBucket(object):
+    """ Thread-safe token bucket, allowing ``rate`` events per second on
+    average, and bursts of up to ``capacity`` events.
+
+    :param rate: Tokens added per second.
+    :type rate: float
+    :param capacity: Maximum tokens held. Defaults to ``rate``, and at
+        least 1.
+    :type capacity: float
+    """
+
+    def __init__(self, rate, capacity=None, timer=time.time):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.timer = timer
+        self.tokens = self.capacity
+        self.updated = timer()
+        self._lock = threading.Lock()
+
+    def consume(self, tokens=1):
+        """ Takes ``tokens`` from the bucket, if there are enough.
+
+        :return: Whether the event is allowed
+        :rtype: bool
+        """
+        with self._lock:
+            now = self.timer()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
@@ -0,0 +1,213 @@
+""" Stale-while-revalidate refresh of Auth0 profiles.
+
+With ``AUTH0_PROFILE_BACKGROUND_REFRESH`` enabled, a user whose profile was
+refreshed less than ``AUTH0_PROFILE_HARD_TTL`` seconds ago is served
+straight away. If it was refreshed more than
+``AUTH0_PROFILE_REFRESH_INTERVAL`` seconds ago, their profile is re-fetched
+in the background and applied through the authentication backend.
+
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import close_old_connections
+from django.utils.six.moves import queue
+
+from django_auth0_toolkit.auth_api import refresh_user_info
+from django_auth0_toolkit.cache import LRUCache
+from django_auth0_toolkit.django_auth import (
+    PROFILE_REFRESHED_SESSION_KEY,
+    get_logged_in_auth0_user,
+)
+from django_auth0_toolkit.tenants import get_user_id
+
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_profile(id_token, claims):
+    """ Re-fetches a user's profile from Auth0, and applies it to their user.
+
+    """
+    user_info = refresh_user_info(id_token, claims)
+    authenticate(user_info=user_info)
+
+
+def call_outside_request(func, *args, **kwargs):
+    """ Calls ``func`` from a thread that doesn't serve requests, closing
+    database connections that broke or outlived ``CONN_MAX_AGE`` before and
+    after, as Django does around each request.
+
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+class ProfileRefresher(object):
+    """ Refreshes profiles on a bounded pool of background threads.
+
+    At most one refresh per user is queued or running at a time, and when
+    ``max_queue`` refreshes are waiting, more are dropped. The time each
+    user's profile was last refreshed is kept for up to ``maxsize`` users.
+
+    :param func: Refreshes one profile, given the submitted arguments.
+    :type func: callable
+    :param max_workers: Number of worker threads.
+    :type max_workers: int
+    :param max_queue: Maximum refreshes waiting for a worker.
+    :type max_queue: int
+    :param maxsize: Number of users whose refresh time is kept.
+    :type maxsize: int
+    """
+
+    def __init__(
+        self, func, max_workers=2, max_queue=100, maxsize=10000,
+        timer=time.time,
+    ):
+        self.func = func
+        self.max_workers = max_workers
+        self.timer = timer
+        self._queue = queue.Queue(max_queue)
+        self._pending = set()
+        self._refreshed = LRUCache(maxsize=maxsize, timer=timer)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def last_refreshed(self, sub):
+        """ When the profile of ``sub`` was last refreshed by this process.
+
+        :rtype: float | None
+        """
+        return self._refreshed.get(sub)
+
+    def mark_refreshed(self, sub):
+        self._refreshed.set(sub, self.timer(), float('inf'))
+
+    def submit(self, sub, *args):
+        """ Queues a refresh of the profile of ``sub``, unless one is queued
+        or running already, or the queue is full.
+
+        :return: Whether the refresh was queued
+        :rtype: bool
+        """
+        with self._lock:
+            if sub in self._pending:
+                return False
+            try:
+                self._queue.put_nowait((sub, args))
+            except queue.Full:
+                logger.debug('Profile refresh queue full, dropping %s', sub)
+                return False
+            self._pending.add(sub)
+
+            while len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work, name='auth0-profile-refresh',
+                )
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        return True
+
+    def pending(self):
+        """ Number of refreshes queued or running. """
+        with self._lock:
+            return len(self._pending)
+
+    def join(self):
+        """ Blocks until every queued refresh is done. """
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            sub, args = self._queue.get()
+            try:
+                call_outside_request(self.func, *args)
+            except Exception as exc:
+                logger.warning('Background refresh of %s failed: %r', sub, exc)
+            else:
+                self.mark_refreshed(sub)
+            finally:
+                with self._lock:
+                    self._pending.discard(sub)
+                self._queue.task_done()
+
+
+_profile_refresher = None
+_profile_refresher_pid = None
+_profile_refresher_lock = threading.Lock()
+
+
+def get_profile_refresher():
+    """ Returns this process's :class:`ProfileRefresher`, configured by
+    ``AUTH0_PROFILE_REFRESH_WORKERS`` and ``AUTH0_PROFILE_REFRESH_QUEUE_SIZE``.
+
+    Threads don't survive a fork, so each worker process builds its own.
+
+    :rtype: ProfileRefresher
+    """
+    global _profile_refresher, _profile_refresher_pid
+    pid = os.getpid()
+    if _profile_refresher is None or _profile_refresher_pid != pid:
+        with _profile_refresher_lock:
+            if _profile_refresher is None or _profile_refresher_pid != pid:
+                _profile_refresher = ProfileRefresher(
+                    refresh_profile,
+                    max_workers=getattr(
+                        settings, 'AUTH0_PROFILE_REFRESH_WORKERS', 2
+                    ),
+                    max_queue=getattr(
+                        settings, 'AUTH0_PROFILE_REFRESH_QUEUE_SIZE', 100
+                    ),
+                )
+                _profile_refresher_pid = pid
+    return _profile_refresher
+
+
+def is_background_refresh_enabled():
+    return getattr(settings, 'AUTH0_PROFILE_BACKGROUND_REFRESH', False)
+
+
+def get_recently_refreshed_user(request, claims, stateless):
+    """ Returns the user for verified ``claims`` without fetching their
+    profile, if it was refreshed less than ``AUTH0_PROFILE_HARD_TTL`` seconds
+    ago, by this process or in this session.
+
+    :param stateless: If true, the session isn't used.
+    :type stateless: bool
+    :return: The user, or ``None`` if their profile must be fetched now, and
+        whether it is older than ``AUTH0_PROFILE_REFRESH_INTERVAL``.
+    :rtype: (django.contrib.auth.models.User | None, bool)
+    """
+    user_id = get_user_id(claims)
+
+    refreshed_at = get_profile_refresher().last_refreshed(user_id) or 0
+    if not stateless:
+        refreshed = request.session.get(PROFILE_REFRESHED_SESSION_KEY)
+        if refreshed and refreshed['user_id'] == user_id:
+            refreshed_at = max(refreshed_at, refreshed['refreshed_at'])
+
+    age = time.time() - refreshed_at
+    if age >= getattr(settings, 'AUTH0_PROFILE_HARD_TTL', 3600):
+        return None, False
+
+    user = None
+    if not stateless:
+        user = get_logged_in_auth0_user(
+            request, user_id, refresh_interval=float('inf')
+        )
+    if user is None:
+        # Imported here, as it loads models, so the middleware can be
+        # imported before apps are ready.
+        from django_auth0_toolkit.auth_backends import Auth0Backend
+        user = Auth0Backend().get_user_by_auth0_id(user_id)
+
+    stale = age >= getattr(settings, 'AUTH0_PROFILE_REFRESH_INTERVAL', 300)
+    return user, stale
@@ -0,0 +1,310 @@
+""" Token verification results shared by the worker processes of one host.
+
+A fixed-size, open-addressing hash table in a memory-mapped file maps a
+token's SHA-256 digest to its ``sub``, expiry, and whether it was verified or
+rejected. A token verified by one worker is then accepted by the others
+without checking its signature again: its claims are read back from the token
+itself, which the digest shows is the very token verified.
+
+Anyone able to write the file can have tokens accepted, so it is created
+readable and writable by its owner only.
+
+"""
+import binascii
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from django_auth0_toolkit.tokens import get_unverified_claims
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class SharedTokenTable(object):
+    """ Token digest to ``(flag, sub, expires_at)`` table, shared through the
+    file at ``path``.
+
+    The file holds a header and ``slots`` slots of :attr:`SLOT` bytes each.
+    A digest may be stored in any of ``max_probes`` consecutive slots; when
+    all are live, the one expiring first is replaced. Access is serialised
+    by a lock on the file, and within the process.
+
+    :param path: File backing the table. Created if missing. An existing
+        table keeps its own number of slots.
+    :type path: str
+    :param slots: Number of entries the table holds.
+    :type slots: int
+    :param max_probes: Slots searched per digest.
+    :type max_probes: int
+    """
+
+    MAGIC = b'A0TOKENS'
+    VERSION = 1
+    HEADER = struct.Struct('<8sII')
+
+    EMPTY = 0
+    VERIFIED = 1
+    REJECTED = 2
+
+    SUB_SIZE = 128
+    # digest, expires_at, flag, length of sub, sub
+    SLOT = struct.Struct('<32sdBB{0}s'.format(SUB_SIZE))
+
+    def __init__(self, path, slots=16384, max_probes=8, timer=time.time):
+        if fcntl is None:
+            raise ImproperlyConfigured(
+                'A shared token table needs fcntl, i.e. a POSIX system.'
+            )
+
+        self.path = path
+        self.max_probes = max_probes
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                self.slots = self._open_table(slots)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.size = self.HEADER.size + self.slots * self.SLOT.size
+            self._map = mmap.mmap(self.fd, self.size)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def _open_table(self, slots):
+        """ Reads the header of an existing table, or initialises one.
+
+        :return: Number of slots in the table
+        """
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        header = os.read(self.fd, self.HEADER.size)
+        if len(header) == self.HEADER.size:
+            magic, version, existing_slots = self.HEADER.unpack(header)
+            size = self.HEADER.size + existing_slots * self.SLOT.size
+            if (magic, version) == (self.MAGIC, self.VERSION) and (
+                os.fstat(self.fd).st_size == size
+            ):
+                if existing_slots != slots:
+                    # Other processes have it mapped; resizing would crash
+                    # them.
+                    logger.warning(
+                        'Shared token table %s has %d slots, not %d',
+                        self.path, existing_slots, slots,
+                    )
+                return existing_slots
+
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, self.HEADER.size + slots * self.SLOT.size)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(
+            self.fd, self.HEADER.pack(self.MAGIC, self.VERSION, slots)
+        )
+        return slots
+
+    @contextmanager
+    def _locked(self, operation):
+        """ Holds the process's lock, then the file lock, shared or
+        exclusive.
+
+        """
+        with self._lock:
+            fcntl.flock(self.fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _probe(self, digest):
+        start = struct.unpack_from('<Q', digest)[0] % self.slots
+        for probe in range(min(self.max_probes, self.slots)):
+            yield self.HEADER.size + (
+                (start + probe) % self.slots
+            ) * self.SLOT.size
+
+    def get(self, key):
+        """ Returns the live entry for a token hash, if there is one.
+
+        :param key: Hex token hash, from
+            :func:`~django_auth0_toolkit.cache.get_token_hash`
+        :type key: str
+        :return: ``(flag, sub, expires_at)``, or ``None``
+        :rtype: (int, str, float) | None
+        """
+        digest = binascii.unhexlify(key)
+        now = self.timer()
+        with self._locked(fcntl.LOCK_SH):
+            for offset in self._probe(digest):
+                (
+                    slot_digest, expires_at, flag, sub_length, sub,
+                ) = self.SLOT.unpack_from(self._map, offset)
+                if slot_digest == digest and flag != self.EMPTY:
+                    if expires_at <= now:
+                        break
+                    self.hits += 1
+                    return (
+                        flag, sub[:sub_length].decode('utf-8'), expires_at,
+                    )
+            self.misses += 1
+            return None
+
+    def set(self, key, flag, sub, expires_at):
+        """ Stores an entry for a token hash until ``expires_at``.
+
+        Entries whose ``sub`` doesn't fit in :attr:`SUB_SIZE` bytes aren't
+        stored.
+
+        """
+        digest = binascii.unhexlify(key)
+        sub = sub.encode('utf-8')
+        now = self.timer()
+        if len(sub) > self.SUB_SIZE or expires_at <= now:
+            return
+
+        with self._locked(fcntl.LOCK_EX):
+            # The digest's own slot, else a free one, else the one expiring
+            # first. A digest is never in two slots.
+            free = oldest = None
+            oldest_expires_at = None
+            for offset in self._probe(digest):
+                slot_digest, slot_expires_at, slot_flag = (
+                    self.SLOT.unpack_from(self._map, offset)[:3]
+                )
+                if slot_digest == digest:
+                    target = offset
+                    break
+                if free is None and (
+                    slot_flag == self.EMPTY or slot_expires_at <= now
+                ):
+                    free = offset
+                if oldest is None or slot_expires_at < oldest_expires_at:
+                    oldest, oldest_expires_at = offset, slot_expires_at
+            else:
+                target = oldest if free is None else free
+
+            self.SLOT.pack_into(
+                self._map, target, digest, expires_at, flag, len(sub), sub,
+            )
+
+    def get_claims(self, id_token, key):
+        """ Returns the claims of a token another process verified, read
+        from the token itself.
+
+        :param id_token: The token hashed to ``key``
+        :type id_token: str
+        :type key: str
+        :return: Claims, or ``None`` if the token isn't in the table
+        :rtype: dict[str, object] | None
+        :raises ValueError: Another process rejected the token.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+
+        flag, sub, _ = entry
+        if flag == self.REJECTED:
+            raise ValueError('Invalid Token')
+
+        claims = get_unverified_claims(id_token)
+        if claims.get('sub', '') != sub:
+            return None
+        return claims
+
+    def set_claims(self, key, claims, expires_at):
+        """ Records that the token hashed to ``key`` was verified. """
+        self.set(key, self.VERIFIED, claims.get('sub', ''), expires_at)
+
+    def set_rejected(self, key, expires_at):
+        """ Records that the token hashed to ``key`` was rejected. """
+        self.set(key, self.REJECTED, '', expires_at)
+
+    def clear(self):
+        with self._locked(fcntl.LOCK_EX):
+            self._map[self.HEADER.size:] = (
+                b'\0' * (self.size - self.HEADER.size)
+            )
+
+    def stats(self):
+        """ Lookups by this process, and live entries from all processes,
+        e.g. for metrics. Counting entries reads the whole table.
+
+        :rtype: dict[str, int]
+        """
+        now = self.timer()
+        counts = {self.VERIFIED: 0, self.REJECTED: 0}
+        with self._locked(fcntl.LOCK_SH):
+            for slot in range(self.slots):
+                expires_at, flag = self.SLOT.unpack_from(
+                    self._map, self.HEADER.size + slot * self.SLOT.size,
+                )[1:3]
+                if flag in counts and expires_at > now:
+                    counts[flag] += 1
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'verified': counts[self.VERIFIED],
+            'rejected': counts[self.REJECTED],
+            'slots': self.slots,
+        }
+
+    def close(self):
+        self._map.close()
+        os.close(self.fd)
+
+
+_shared_token_table = None
+_shared_token_table_pid = None
+_shared_token_table_lock = threading.Lock()
+
+
+def get_shared_token_table():
+    """ Returns this process's view of the table at
+    ``AUTH0_TOKEN_SHARED_MEMORY_PATH``, with
+    ``AUTH0_TOKEN_SHARED_MEMORY_SLOTS`` slots, or ``None`` if unset.
+
+    The file is opened again after a fork, as file locks are shared with
+    the parent otherwise.
+
+    :rtype: SharedTokenTable | None
+    """
+    global _shared_token_table, _shared_token_table_pid
+    path = getattr(settings, 'AUTH0_TOKEN_SHARED_MEMORY_PATH', None)
+    if path is None:
+        return None
+
+    pid = os.getpid()
+    table = _shared_token_table
+    if table is None or table.path != path or _shared_token_table_pid != pid:
+        with _shared_token_table_lock:
+            table = _shared_token_table
+            if table is None or table.path != path or (
+                _shared_token_table_pid != pid
+            ):
+                if table is not None:
+                    table.close()
+                table = SharedTokenTable(
+                    path,
+                    slots=getattr(
+                        settings, 'AUTH0_TOKEN_SHARED_MEMORY_SLOTS', 16384
+                    ),
+                )
+                _shared_token_table = table
+                _shared_token_table_pid = pid
+    return table
@@ -0,0 +1,59 @@
+""" Coalescing of concurrent, identical calls.
+
+While a call for a key is in flight, other threads calling with the same key
+wait for it and share its result or exception, instead of repeating it.
+
+"""
+import threading
+
+
+class InFlightCall(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """ Thread-based single-flight group.
+
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """ Calls ``func(*args, **kwargs)``, unless a call for ``key`` is
+        already in flight, in which case its outcome is shared.
+
+        :param key: Hashable identity of the call
+        :return: The result of the call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = InFlightCall()
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as exc:
+            call.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self):
+        """ Number of calls currently in flight. """
+        return len(self._calls)
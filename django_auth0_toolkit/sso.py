@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 import logging
+import threading
 from functools import wraps
 
 import requests
@@ -12,6 +13,11 @@ from django.shortcuts import resolve_url
 from django.utils.decorators import available_attrs
 from django.utils.six.moves.urllib.parse import urlparse
 
+from django_auth0_toolkit.exceptions import Auth0UnavailableException
+from django_auth0_toolkit.ratelimit import TokenBucket
+from django_auth0_toolkit.tenants import get_tenant_for_request
+from django_auth0_toolkit.timing import time_stage
+
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +26,72 @@ class Auth0(object):
     AUTH_RESPONSE_TYPE_CODE = 'code'
 
 
+SSO_ANONYMOUS_COOKIE_SALT = 'django_auth0_toolkit.sso'
+
+_probe_limiter = None
+_probe_limiter_lock = threading.Lock()
+
+
+def get_sso_probe_limiter():
+    """ Returns the per-process limiter of SSO probes, allowing
+    ``AUTH0_SSO_PROBE_RATE_LIMIT`` probes per second, or ``None`` if probes
+    aren't limited.
+
+    :rtype: django_auth0_toolkit.ratelimit.TokenBucket | None
+    """
+    global _probe_limiter
+    rate = getattr(settings, 'AUTH0_SSO_PROBE_RATE_LIMIT', None)
+    if not rate:
+        return None
+
+    if _probe_limiter is None or _probe_limiter.rate != rate:
+        with _probe_limiter_lock:
+            if _probe_limiter is None or _probe_limiter.rate != rate:
+                _probe_limiter = TokenBucket(rate)
+    return _probe_limiter
+
+
+def should_probe_sso(request):
+    """ Whether to ask auth0 if the user is SSO-ed. Not if auth0 said they
+    weren't less than ``AUTH0_SSO_NEGATIVE_CACHE_TTL`` seconds ago, nor when
+    over the probe rate limit.
+
+    :rtype: bool
+    """
+    ttl = getattr(settings, 'AUTH0_SSO_NEGATIVE_CACHE_TTL', 30)
+    if ttl and request.get_signed_cookie(
+        getattr(settings, 'AUTH0_SSO_ANONYMOUS_COOKIE', 'auth0_sso_anon'),
+        default=None,
+        salt=SSO_ANONYMOUS_COOKIE_SALT,
+        max_age=ttl,
+    ):
+        logger.debug('Skipping SSO probe as user recently not authenticated')
+        return False
+
+    limiter = get_sso_probe_limiter()
+    if limiter is not None and not limiter.consume():
+        logger.debug('Skipping SSO probe as over the probe rate limit')
+        return False
+
+    return True
+
+
+def remember_not_sso_authenticated(response):
+    """ Marks the client as not SSO-ed for ``AUTH0_SSO_NEGATIVE_CACHE_TTL``
+    seconds, with a signed cookie, so it isn't probed again meanwhile.
+
+    """
+    ttl = getattr(settings, 'AUTH0_SSO_NEGATIVE_CACHE_TTL', 30)
+    if ttl:
+        response.set_signed_cookie(
+            getattr(settings, 'AUTH0_SSO_ANONYMOUS_COOKIE', 'auth0_sso_anon'),
+            '1',
+            salt=SSO_ANONYMOUS_COOKIE_SALT,
+            max_age=ttl,
+            httponly=True,
+        )
+
+
 def sso_fallback(
     request,
     auth0_login_callback_view_name=None,
@@ -28,12 +100,14 @@ def sso_fallback(
     redirect_field_name=REDIRECT_FIELD_NAME,
     intercept_auth0_redirect=True,
 ):
+    tenant = get_tenant_for_request(request)
+
     # URL at auth0 to check if authed
     auth_url = auth0_authorization_url
     if auth_url is None:
         auth_url = (
             "https://{domain}/oauth/authorize".format(
-                domain=settings.AUTH0_DOMAIN
+                domain=tenant.domain
             )
         )
 
@@ -45,12 +119,12 @@ def sso_fallback(
     # View that handles auth0's callback
     login_callback_url = request.build_absolute_uri(resolve_url(
         auth0_login_callback_view_name or
-        settings.AUTH0_LOGIN_CALLBACK_URL
+        tenant.login_callback_url
     ))
 
     authorize_params = {
         'response_type': Auth0.AUTH_RESPONSE_TYPE_CODE,
-        'client_id': settings.AUTH0_CLIENT_ID,
+        'client_id': tenant.client_id,
         'redirect_uri': login_callback_url,
         'state': target_page,
     }
@@ -66,10 +140,26 @@ def sso_fallback(
         logger.debug('Sending user straight to %s', prepared_request.url)
         return HttpResponseRedirect(prepared_request.url)
 
+    if not should_probe_sso(request):
+        return redirect_login_required_to_login(
+            request, login_url, redirect_field_name
+        )
+
     # hit auth0's authorize endpoint -- we'll get a redirect either
     # to the login_callback_url, meaning the user is already SSO-ed,
     # or to auth0's hosted login page.
-    res = requests.get(auth_url, authorize_params, allow_redirects=False)
+    try:
+        with time_stage(request, 'sso_probe'):
+            res = tenant.http_client.get(
+                auth_url, authorize_params, allow_redirects=False
+            )
+    except Auth0UnavailableException:
+        # auth0 can't say whether the user is SSO-ed. They aren't
+        # remembered as not SSO-ed, so are probed again once it is back.
+        logger.warning('Redirecting to built-in login as Auth0 unavailable')
+        return redirect_login_required_to_login(
+            request, login_url, redirect_field_name
+        )
 
     # now presumably res has status 302
     if res.status_code != 302:
@@ -95,9 +185,11 @@ def sso_fallback(
         # go to our own hosted login page -- as the normal
         # login_required decorator would.
         logger.debug('Redirecting to built-in login as user not authenticated')
-        return redirect_login_required_to_login(
+        response = redirect_login_required_to_login(
             request, login_url, redirect_field_name
         )
+        remember_not_sso_authenticated(response)
+        return response
 
 
 def user_passes_test_with_sso(
@@ -0,0 +1,320 @@
+""" Several Auth0 tenants and clients, served from one deployment.
+
+The default tenant is configured by ``AUTH0_DOMAIN``, ``AUTH0_CLIENT_ID`` and
+``AUTH0_CLIENT_SECRET``. ``AUTH0_TENANTS`` adds more, by name::
+
+    AUTH0_TENANTS = {
+        'brand-b': {
+            'DOMAIN': 'brand-b.eu.auth0.com',
+            'CLIENT_ID': '...',
+            'CLIENT_SECRET': '...',
+            'HOSTS': ['brand-b.example.com'],
+        },
+    }
+
+Each tenant builds its token verifier and HTTP client once, on first use.
+Tokens are routed to their tenant by their unverified ``iss`` and ``aud``
+claims, and requests by their host, each with a single dict lookup; anything
+unknown goes to the default tenant.
+
+Auth0 user IDs are only unique within a tenant, so other tenants' users are
+identified as ``<tenant name>:<sub>`` in profile caches, sessions and
+:class:`~django_auth0_toolkit.models.Auth0Identity`.
+
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http.request import split_domain_port
+from django.utils import six
+
+from django_auth0_toolkit.circuitbreaker import build_circuit_breaker
+from django_auth0_toolkit.http_client import build_http_client, get_http_client
+from django_auth0_toolkit.jwks import JSONWebKeySet
+from django_auth0_toolkit.tokens import (
+    RejectionCounter,
+    TokenVerifier,
+    get_token_verifier,
+    get_unverified_claims,
+)
+
+
+DEFAULT_TENANT = 'default'
+
+
+class Auth0Tenant(object):
+    """ An Auth0 tenant and the client application registered with it.
+
+    :param name: Name of the tenant, as in ``AUTH0_TENANTS``
+    :type name: str
+    :param domain: Auth0 domain, e.g. ``'example.eu.auth0.com'``
+    :type domain: str
+    :param issuer: Expected ``iss`` claim. Defaults to the domain's URL.
+    :type issuer: str
+    :param hosts: Hosts of this deployment that log users in with this
+        tenant.
+    :type hosts: list[str]
+    :param login_callback_url: Overrides ``AUTH0_LOGIN_CALLBACK_URL``.
+    :type login_callback_url: str
+    """
+
+    def __init__(
+        self, name, domain, client_id, client_secret, algorithms=('HS256',),
+        issuer=None, jwks_url=None, hosts=(), login_callback_url=None,
+    ):
+        self.name = name
+        self.domain = domain
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.algorithms = algorithms
+        self.issuer = issuer or 'https://{domain}/'.format(domain=domain)
+        self.jwks_url = jwks_url or (
+            'https://{domain}/.well-known/jwks.json'.format(domain=domain)
+        )
+        self.hosts = tuple(hosts)
+        self._login_callback_url = login_callback_url
+
+        self._verifier = None
+        self._http_client = None
+        self._http_client_pid = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Auth0Tenant {0}: {1}>'.format(self.name, self.domain)
+
+    @property
+    def login_callback_url(self):
+        return self._login_callback_url or settings.AUTH0_LOGIN_CALLBACK_URL
+
+    def get_user_id(self, sub):
+        """ Identifies this tenant's Auth0 user ``sub`` in this deployment.
+
+        :param sub: Auth0 user ID, i.e. an ID token's ``sub``
+        :type sub: str
+        :rtype: str
+        """
+        return '{0}:{1}'.format(self.name, sub)
+
+    @property
+    def verifier(self):
+        """ This tenant's :class:`~django_auth0_toolkit.tokens.TokenVerifier`.
+
+        """
+        if self._verifier is None:
+            with self._lock:
+                if self._verifier is None:
+                    self._verifier = self.build_verifier()
+        return self._verifier
+
+    def build_verifier(self):
+        return TokenVerifier(
+            self.client_secret,
+            self.client_id,
+            algorithms=self.algorithms,
+            key_set=JSONWebKeySet(
+                self.jwks_url,
+                min_refresh_interval=getattr(
+                    settings, 'AUTH0_JWKS_MIN_REFRESH_INTERVAL', 300
+                ),
+                get_client=lambda: self.http_client,
+            ),
+            issuer=self.issuer,
+            leeway=getattr(settings, 'AUTH0_JWT_LEEWAY', 0),
+            rejections=RejectionCounter(getattr(
+                settings, 'AUTH0_TOKEN_REJECTION_LOG_INTERVAL', 60
+            )),
+        )
+
+    @property
+    def http_client(self):
+        """ This process's HTTP client for this tenant, with its own
+        connection pool and circuit breaker.
+
+        :rtype: django_auth0_toolkit.http_client.Auth0HttpClient
+        """
+        pid = os.getpid()
+        if self._http_client is None or self._http_client_pid != pid:
+            with self._lock:
+                if self._http_client is None or self._http_client_pid != pid:
+                    self._http_client = build_http_client(
+                        breaker=build_circuit_breaker(),
+                    )
+                    self._http_client_pid = pid
+        return self._http_client
+
+
+class DefaultAuth0Tenant(Auth0Tenant):
+    """ The tenant configured by the ``AUTH0_*`` settings, which shares the
+    package-wide verifier and HTTP client.
+
+    """
+
+    def __init__(self):
+        super(DefaultAuth0Tenant, self).__init__(
+            DEFAULT_TENANT,
+            settings.AUTH0_DOMAIN,
+            settings.AUTH0_CLIENT_ID,
+            settings.AUTH0_CLIENT_SECRET,
+            algorithms=getattr(settings, 'AUTH0_JWT_ALGORITHMS', ('HS256',)),
+            issuer=getattr(settings, 'AUTH0_JWT_ISSUER', None),
+        )
+
+    def get_user_id(self, sub):
+        # Users of the default tenant predate tenants.
+        return sub
+
+    @property
+    def verifier(self):
+        return get_token_verifier()
+
+    @property
+    def http_client(self):
+        return get_http_client()
+
+
+class TenantRegistry(object):
+    """ Finds the tenant for a token, its claims, or a request.
+
+    :param default: Tenant for anything not matching another tenant
+    :type default: Auth0Tenant
+    :param tenants: Other tenants
+    :type tenants: list[Auth0Tenant]
+    :raises ImproperlyConfigured: Two tenants have the same name, or the
+        same issuer and client ID.
+    """
+
+    def __init__(self, default, tenants=()):
+        self.default = default
+        self.tenants = {}
+        self._by_token = {}
+        self._by_host = {}
+
+        for tenant in [default] + list(tenants):
+            key = (tenant.issuer, tenant.client_id)
+            if tenant.name in self.tenants or key in self._by_token:
+                raise ImproperlyConfigured(
+                    'Auth0 tenant {0} is configured twice.'.format(
+                        tenant.name
+                    )
+                )
+            self.tenants[tenant.name] = tenant
+            self._by_token[key] = tenant
+            for host in tenant.hosts:
+                self._by_host[host.lower()] = tenant
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def get(self, name):
+        """ :raises KeyError: There's no tenant with that name. """
+        return self.tenants[name]
+
+    def get_tenant_for_claims(self, claims):
+        """ Returns the tenant that issued a token with these claims.
+
+        :rtype: Auth0Tenant
+        """
+        audiences = claims.get('aud')
+        if isinstance(audiences, six.string_types):
+            audiences = [audiences]
+
+        for audience in audiences or ():
+            tenant = self._by_token.get((claims.get('iss'), audience))
+            if tenant is not None:
+                return tenant
+        return self.default
+
+    def get_tenant_for_token(self, token):
+        """ Returns the tenant whose verifier should check ``token``. Only
+        the default tenant's verifier will see tokens that aren't JWTs.
+
+        :rtype: Auth0Tenant
+        """
+        if len(self.tenants) == 1:
+            return self.default
+
+        try:
+            claims = get_unverified_claims(token)
+        except ValueError:
+            return self.default
+        return self.get_tenant_for_claims(claims)
+
+    def get_tenant_for_request(self, request):
+        """ Returns the tenant users of ``request``'s host log in with.
+
+        :rtype: Auth0Tenant
+        """
+        if not self._by_host:
+            return self.default
+
+        host, _ = split_domain_port(request.get_host())
+        return self._by_host.get(host, self.default)
+
+
+def build_tenant_registry():
+    """ Builds a :class:`TenantRegistry` of the default tenant and those in
+    ``AUTH0_TENANTS``.
+
+    :rtype: TenantRegistry
+    """
+    tenants = []
+    configs = getattr(settings, 'AUTH0_TENANTS', {})
+    for name, config in sorted(configs.items()):
+        tenants.append(Auth0Tenant(
+            name,
+            config['DOMAIN'],
+            config['CLIENT_ID'],
+            config['CLIENT_SECRET'],
+            algorithms=config.get(
+                'JWT_ALGORITHMS',
+                getattr(settings, 'AUTH0_JWT_ALGORITHMS', ('HS256',)),
+            ),
+            issuer=config.get('JWT_ISSUER'),
+            jwks_url=config.get('JWKS_URL'),
+            hosts=config.get('HOSTS', ()),
+            login_callback_url=config.get('LOGIN_CALLBACK_URL'),
+        ))
+    return TenantRegistry(DefaultAuth0Tenant(), tenants)
+
+
+_tenant_registry = None
+_tenant_registry_lock = threading.Lock()
+
+
+def get_tenant_registry():
+    """ Returns the shared :class:`TenantRegistry`, built from settings on
+    first use.
+
+    :rtype: TenantRegistry
+    """
+    global _tenant_registry
+    if _tenant_registry is None:
+        with _tenant_registry_lock:
+            if _tenant_registry is None:
+                _tenant_registry = build_tenant_registry()
+    return _tenant_registry
+
+
+def get_tenant_for_token(token):
+    return get_tenant_registry().get_tenant_for_token(token)
+
+
+def get_tenant_for_claims(claims):
+    return get_tenant_registry().get_tenant_for_claims(claims)
+
+
+def get_tenant_for_request(request):
+    return get_tenant_registry().get_tenant_for_request(request)
+
+
+def get_user_id(claims):
+    """ Identifies the user of verified ``claims`` in this deployment.
+
+    :rtype: str
+    """
+    registry = get_tenant_registry()
+    if len(registry) == 1:
+        return claims['sub']
+    return registry.get_tenant_for_claims(claims).get_user_id(claims['sub'])
@@ -0,0 +1,105 @@
+""" Per-stage timing of authentication work.
+
+With ``AUTH0_TIMING_ENABLED`` set, each stage (token verification, profile
+fetch, user lookup, login, ...) is timed and recorded on the request, the
+:data:`auth_stage_timed` signal is sent, and the middleware can report the
+timings in a ``Server-Timing`` response header.
+
+"""
+from timeit import default_timer
+
+from django.conf import settings
+from django.dispatch import Signal
+
+
+auth_stage_timed = Signal(providing_args=['request', 'stage', 'duration'])
+
+
+class NullTimer(object):
+    """ Does nothing, so disabled timing costs a settings lookup only. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class StageTimer(object):
+    def __init__(self, request, stage):
+        self.request = request
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = default_timer() - self.start
+
+        if self.request is not None:
+            timings = getattr(self.request, 'auth0_timings', None)
+            if timings is None:
+                timings = self.request.auth0_timings = []
+            timings.append((self.stage, duration))
+
+        if auth_stage_timed.has_listeners():
+            auth_stage_timed.send(
+                sender=StageTimer,
+                request=self.request,
+                stage=self.stage,
+                duration=duration,
+            )
+        return False
+
+
+def time_stage(request, stage):
+    """ Context manager timing one stage of authentication for ``request``.
+
+    :param request: Request being authenticated, or ``None``
+    :param stage: Name of the stage, e.g. ``'verify'``
+    :type stage: str
+    """
+    if not getattr(settings, 'AUTH0_TIMING_ENABLED', False):
+        return NULL_TIMER
+    return StageTimer(request, stage)
+
+
+def get_server_timing(request):
+    """ ``Server-Timing`` header value for the stages timed on ``request``,
+    or ``None`` if there are none.
+
+    :rtype: str | None
+    """
+    timings = getattr(request, 'auth0_timings', None)
+    if not timings:
+        return None
+
+    return ', '.join(
+        'auth0-{stage};dur={duration:.3f}'.format(
+            stage=stage, duration=duration * 1000,
+        )
+        for stage, duration in timings
+    )
+
+
+def add_server_timing_header(request, response):
+    """ Adds the request's stage timings to the response's ``Server-Timing``
+    header, if ``AUTH0_SERVER_TIMING_HEADER`` is enabled.
+
+    """
+    if not getattr(settings, 'AUTH0_SERVER_TIMING_HEADER', False):
+        return response
+
+    server_timing = get_server_timing(request)
+    if server_timing is not None:
+        if response.has_header('Server-Timing'):
+            server_timing = '{0}, {1}'.format(
+                response['Server-Timing'], server_timing
+            )
+        response['Server-Timing'] = server_timing
+    return response
@@ -4,9 +4,17 @@ https://jwt.io/
 
 """
 import base64
+import json
 import logging
+import threading
+import time
+from collections import Counter
 
 import jwt
+from django.conf import settings
+
+from django_auth0_toolkit.jwks import get_key_set
+from django_auth0_toolkit.ratelimit import TokenBucket
 
 
 logger = logging.getLogger(__name__)
@@ -16,34 +24,237 @@ def prepare_secret(secret):
     """ Converts an auth0 secret to its byte equivalent for JWT lib
 
     :param secret: Auth0 secret to convert, in base64 (as per Auth0 dashboard)
-    :type secret: bytes
+    :type secret: bytes | str
     :return: Decoded secret, compatible with :mod:`PyJWT`
     :rtype: bytes
 
     """
+    if not isinstance(secret, bytes):
+        secret = secret.encode('ascii')
     return base64.b64decode(secret.replace(b"_", b"/").replace(b"-", b"+"))
 
 
-def get_decoded_token(token, secret, client_id):
+def get_unverified_claims(token):
+    """ Reads a JWT's claims without verifying it, e.g. to pick the verifier
+    for it. Nothing read this way can be trusted.
+
+    :param token: JWT to read
+    :type token: str
+    :rtype: dict[str, object]
+    :raises ValueError: The token isn't a JWT.
+    """
+    try:
+        if not isinstance(token, bytes):
+            token = token.encode('ascii')
+        payload = token.split(b'.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(
+            payload + b'=' * (-len(payload) % 4)
+        ).decode('utf-8'))
+    except (IndexError, TypeError, UnicodeError, ValueError):
+        raise ValueError('Invalid Token')
+
+    if not isinstance(claims, dict):
+        raise ValueError('Invalid Token')
+    return claims
+
+
+class RejectionCounter(object):
+    """ Counts rejected tokens by reason. Rather than a traceback per token,
+    a summary of the rejections since the last one is logged at most once
+    per ``log_interval`` seconds.
+
+    :param log_interval: Minimum seconds between summaries.
+    :type log_interval: float
+    """
+
+    def __init__(self, log_interval=60, timer=time.time):
+        self.totals = Counter()
+        self._pending = Counter()
+        self._limiter = TokenBucket(
+            1.0 / log_interval, capacity=1, timer=timer
+        )
+        self._lock = threading.Lock()
+
+    def record(self, reason):
+        """ Counts a rejection, logging a summary if one is due.
+
+        :param reason: Why the token was rejected, e.g. ``'DecodeError'``
+        :type reason: str
+        """
+        with self._lock:
+            self.totals[reason] += 1
+            self._pending[reason] += 1
+            if not self._limiter.consume():
+                return
+            pending, self._pending = self._pending, Counter()
+
+        logger.warning(
+            'Rejected %d JWTs: %s',
+            sum(pending.values()),
+            ', '.join(
+                '{0}={1}'.format(reason, count)
+                for reason, count in sorted(pending.items())
+            ),
+        )
+
+    def stats(self):
+        """ Rejections by reason since the process started, e.g. for
+        metrics.
+
+        :rtype: dict[str, int]
+        """
+        with self._lock:
+            return dict(self.totals)
+
+
+_rejections = None
+_rejections_lock = threading.Lock()
+
+
+def get_rejection_counter():
+    """ Returns the shared :class:`RejectionCounter`, logging summaries at
+    most once per ``AUTH0_TOKEN_REJECTION_LOG_INTERVAL`` seconds.
+
+    :rtype: RejectionCounter
+    """
+    global _rejections
+    if _rejections is None:
+        with _rejections_lock:
+            if _rejections is None:
+                _rejections = RejectionCounter(getattr(
+                    settings, 'AUTH0_TOKEN_REJECTION_LOG_INTERVAL', 60
+                ))
+    return _rejections
+
+
+class TokenVerifier(object):
+    """ Verifies JWTs against key material prepared once, up front.
+
+    HS256 tokens are verified with ``secret``, RS256 tokens with the key named
+    by their ``kid`` header in ``key_set``.
+
+    :param secret: Secret used to sign HS256 JWTs, as per Auth0 dashboard
+    :type secret: str
+    :param client_id: Client application ID the JWT is for (``aud`` key).
+    :type client_id: str
+    :param algorithms: Signing algorithms to accept.
+    :type algorithms: tuple[str]
+    :param key_set: Public keys for RS256 tokens.
+    :type key_set: django_auth0_toolkit.jwks.JSONWebKeySet
+    :param issuer: Expected ``iss`` claim, or ``None`` to not check it.
+    :type issuer: str
+    :param leeway: Allowed clock skew, in seconds, for time-based claims.
+    :type leeway: int
+    :param rejections: Counter of rejected tokens.
+    :type rejections: RejectionCounter
+
+    """
+
+    def __init__(
+        self, secret, client_id, algorithms=('HS256',), key_set=None,
+        issuer=None, leeway=0, rejections=None,
+    ):
+        self.secret_key = prepare_secret(secret) if secret else None
+        self.client_id = client_id
+        self.algorithms = frozenset(algorithms)
+        self.key_set = key_set
+        self.issuer = issuer
+        self.leeway = leeway
+        self.rejections = rejections or RejectionCounter()
+
+    def verify(self, token):
+        """ Decodes and verifies a JWT
+
+        :param token: JWT to decode, such as an ``id_token``.
+        :type token: str
+        :return: Decoded JWT object
+        :rtype: dict[str, object]
+        :raises ValueError: The token was invalid.
+
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+            algorithm = header.get('alg')
+            if algorithm not in self.algorithms:
+                raise jwt.InvalidTokenError('Algorithm not allowed')
+
+            if algorithm == 'RS256':
+                if self.key_set is None:
+                    raise jwt.InvalidTokenError('Algorithm not allowed')
+                key = self.key_set.get_key(header.get('kid'))
+            else:
+                if self.secret_key is None:
+                    raise jwt.InvalidTokenError('Algorithm not allowed')
+                key = self.secret_key
+
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.client_id,
+                issuer=self.issuer,
+                leeway=self.leeway,
+            )
+        except (jwt.InvalidTokenError, ValueError) as exc:
+            reason = type(exc).__name__
+            logger.debug('JWT failed to decode: %s', reason)
+            self.rejections.record(reason)
+            raise ValueError('Invalid Token')
+
+
+def get_decoded_token(
+    token, secret, client_id, algorithms=('HS256',), key_set=None,
+):
     """ Decodes a JWT
 
+    Prefer a long-lived :class:`TokenVerifier`, e.g. from
+    :func:`get_token_verifier`, on hot paths.
+
     :param token: JWT to decode, such as an ``id_token``.
     :type token: str
     :param secret: Secret used to sign the JWT
     :type secret: str
     :param client_id: Client application ID the JWT is for (``aud`` key).
     :type client_id: str
+    :param algorithms: Signing algorithms to accept.
+    :type algorithms: tuple[str]
+    :param key_set: Public keys for RS256 tokens.
+    :type key_set: django_auth0_toolkit.jwks.JSONWebKeySet
     :return: Decoded JWT object
     :rtype: dict[str, object]
     :raises ValueError: The token, secret, or client ID was invalid.
 
     """
-    try:
-        return jwt.decode(
-            token,
-            prepare_secret(secret),
-            audience=client_id,
-        )
-    except jwt.InvalidTokenError:
-        logger.exception('JWT failed to decode')
-        raise ValueError('Invalid Token')
+    verifier = TokenVerifier(
+        secret, client_id, algorithms=algorithms, key_set=key_set,
+        rejections=get_rejection_counter(),
+    )
+    return verifier.verify(token)
+
+
+_token_verifier = None
+_token_verifier_lock = threading.Lock()
+
+
+def get_token_verifier():
+    """ Returns the shared :class:`TokenVerifier` for this project's Auth0
+    client, built from settings on first use.
+
+    :rtype: TokenVerifier
+    """
+    global _token_verifier
+    if _token_verifier is None:
+        with _token_verifier_lock:
+            if _token_verifier is None:
+                _token_verifier = TokenVerifier(
+                    settings.AUTH0_CLIENT_SECRET,
+                    settings.AUTH0_CLIENT_ID,
+                    algorithms=getattr(
+                        settings, 'AUTH0_JWT_ALGORITHMS', ('HS256',)
+                    ),
+                    key_set=get_key_set(),
+                    issuer=getattr(settings, 'AUTH0_JWT_ISSUER', None),
+                    leeway=getattr(settings, 'AUTH0_JWT_LEEWAY', 0),
+                    rejections=get_rejection_counter(),
+                )
+    return _token_verifier
@@ -0,0 +1,103 @@
+""" A user backed by the claims of a verified ID token.
+
+"""
+from django_auth0_toolkit.exceptions import Auth0Exception
+from django_auth0_toolkit.tenants import get_user_id
+
+try:
+    from django.utils.deprecation import CallableFalse, CallableTrue
+except ImportError:  # pragma: no cover
+    # Django 2.0+ only supports is_authenticated as an attribute.
+    CallableFalse, CallableTrue = False, True
+
+
+class ClaimsUser(object):
+    """ Lazy stand-in for the user of a verified ID token.
+
+    Authentication checks, the Auth0 user ID and the token's claims are
+    answered without the database. The user model instance is loaded, by
+    ``load_user``, the first time any other attribute is used, and from
+    then on the proxy behaves like it. If there is no user to load, other
+    attributes are missing, so ``getattr()`` and ``hasattr()`` work as for
+    a user without them. As it isn't a model instance, compare it with
+    ``user == instance`` rather than ``instance == user``.
+
+    :param claims: Verified ID token claims
+    :type claims: dict[str, object]
+    :param load_user: Returns the user model instance for the claims, or
+        ``None`` if there is none.
+    :type load_user: callable
+    """
+
+    is_authenticated = CallableTrue
+    is_anonymous = CallableFalse
+
+    def __init__(self, claims, load_user):
+        self.__dict__.update(
+            claims=claims,
+            sub=claims['sub'],
+            user_id=get_user_id(claims),
+            _load_user=load_user,
+            _user=None,
+        )
+
+    def get_claim(self, name, default=None):
+        """ Returns the claim ``name`` of the user's ID token, e.g. a custom
+        roles claim.
+
+        """
+        return self.claims.get(name, default)
+
+    def get_user(self):
+        """ Returns the user model instance, loading it on first use.
+
+        :rtype: django.contrib.auth.models.User
+        :raises Auth0Exception: There is no user for the claims.
+        """
+        if self._user is None:
+            user = self._load_user()
+            if user is None:
+                raise Auth0Exception('No user for Auth0 user {user_id}'.format(
+                    user_id=self.user_id,
+                ))
+            self.__dict__['_user'] = user
+        return self._user
+
+    @property
+    def is_loaded(self):
+        return self._user is not None
+
+    def __getattr__(self, name):
+        # Only reached for attributes the proxy doesn't answer itself.
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            user = self.get_user()
+        except Auth0Exception as exc:
+            raise AttributeError(
+                '{name} unavailable: {exc}'.format(name=name, exc=exc)
+            )
+        return getattr(user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get_user(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.get_user(), name)
+
+    def __eq__(self, other):
+        if isinstance(other, ClaimsUser):
+            return self.user_id == other.user_id
+        return self.get_user() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.get_user())
+
+    def __str__(self):
+        return str(self.get_user())
+
+    def __repr__(self):
+        return '<ClaimsUser: {sub}>'.format(sub=self.sub)
@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
 import logging
 
+from django.conf import settings
 from django.contrib import messages
 from django.http import HttpResponseRedirect
 from django.utils.translation import ugettext as _
 
 from django_auth0_toolkit.auth_api import (
     get_token_info_from_authorization_code,
-    get_user_info_with_id_token,
+    get_user_info,
 )
 from django_auth0_toolkit.django_auth import register_and_login_auth0_user
+from django_auth0_toolkit.tenants import get_tenant_for_request
+from django_auth0_toolkit.timing import time_stage
 
 
 logger = logging.getLogger(__name__)
@@ -38,9 +41,11 @@ def get_user_in_auth0_callback(request):
         )
         raise LoginError(error_description)
 
-    token_info = get_token_info_from_authorization_code(
-        code, request.build_absolute_uri()
-    )
+    tenant = get_tenant_for_request(request)
+    with time_stage(request, 'code_exchange'):
+        token_info = get_token_info_from_authorization_code(
+            code, request.build_absolute_uri(), tenant=tenant,
+        )
     if 'id_token' not in token_info:
         # Failed to log in.
         logger.debug("Token-Authorization Code swap didn't yield an ID token")
@@ -49,7 +54,18 @@ def get_user_in_auth0_callback(request):
         )
         raise LoginError(error_description)
 
-    user_info = get_user_info_with_id_token(token_info['id_token'])
+    id_token = token_info['id_token']
+
+    claims = None
+    if getattr(settings, 'AUTH0_USER_INFO_FROM_CLAIMS', False):
+        try:
+            with time_stage(request, 'verify'):
+                claims = tenant.verifier.verify(id_token)
+        except ValueError:
+            logger.debug('Could not verify ID token, fetching profile')
+
+    with time_stage(request, 'profile'):
+        user_info = get_user_info(id_token, claims=claims, tenant=tenant)
     return user_info
 
 
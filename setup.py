@@ -14,6 +14,11 @@ requirements = [
     'PyJWT>=1.4.2',
 ]
 
+extra_requirements = {
+    'rs256': ['cryptography'],
+    'asyncio': ['aiohttp>=3.3'],
+}
+
 test_requirements = [
     # TODO: put package test requirements here
 ]
@@ -28,11 +33,15 @@ setup(
     url='https://github.com/shauns/django_auth0_toolkit',
     packages=[
         'django_auth0_toolkit',
+        'django_auth0_toolkit.management',
+        'django_auth0_toolkit.management.commands',
+        'django_auth0_toolkit.migrations',
     ],
     package_dir={'django_auth0_toolkit':
                  'django_auth0_toolkit'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     zip_safe=False,
     keywords='django_auth0_toolkit',
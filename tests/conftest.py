@@ -1,8 +1,63 @@
 import os
+import sys
 
 import pytest
 
 
+# Manually created based on test client id and secret. Does not expire.
+TOKEN = (
+    "eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9."
+    "eyJpc3MiOiJodHRwczovL3Rlc3RpbmcuYXV0aDAuY29tLyIsInN1YiI6ImF1dGgwfHF"
+    "3ZXJ0eXVpb3AiLCJhdWQiOiJjbGllbnQtaWQtZnJvbS1hdXRoMCIsImlhdCI6MTIzND"
+    "U2Nzh9."
+    "hi4FG8pQ628E5u3z-jTKRb1eSfnOZi6uffB5fMbZv9Q"
+)
+
+
+class FakeTimer(object):
+    """ A clock for timer arguments, moved on by setting ``now``. """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_id_token(**claims):
+    """ Signs an ID token for the test client, with ``claims``. """
+    import jwt
+    from django.conf import settings
+    from django_auth0_toolkit.tokens import prepare_secret
+
+    payload = {
+        'iss': 'https://testing.auth0.com/',
+        'aud': settings.AUTH0_CLIENT_ID,
+        'iat': 12345678,
+    }
+    payload.update(claims)
+    return jwt.encode(
+        payload, prepare_secret(settings.AUTH0_CLIENT_SECRET)
+    ).decode('ascii')
+
+
+def make_request(rf, id_token, session=None):
+    """ A request with ``id_token`` as its bearer token, and a session. """
+    from django.contrib.sessions.middleware import SessionMiddleware
+
+    request = rf.get('/', HTTP_AUTHORIZATION='Bearer ' + id_token)
+    SessionMiddleware().process_request(request)
+    if session is not None:
+        request.session = session
+    return request
+
+
+# Asyncio support needs Python 3.5+ syntax.
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
+
+
 @pytest.fixture(autouse=True)
 def default_settings(monkeypatch):
     monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__)))
@@ -15,3 +70,42 @@ def default_settings(monkeypatch):
 def rf():
     from django.test import RequestFactory
     return RequestFactory()
+
+
+@pytest.fixture
+def db(request):
+    from django.core.management import call_command
+    from django.db import transaction
+
+    call_command('migrate', verbosity=0)
+
+    atomic = transaction.atomic()
+    atomic.__enter__()
+
+    def rollback():
+        transaction.set_rollback(True)
+        atomic.__exit__(None, None, None)
+
+    request.addfinalizer(rollback)
+
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    """ Records the tokens the shared verifier checks. """
+    from django_auth0_toolkit.tokens import get_token_verifier
+
+    calls = []
+    verifier = get_token_verifier()
+    verify = verifier.verify
+
+    def counting_verify(token):
+        calls.append(token)
+        return verify(token)
+
+    monkeypatch.setattr(verifier, 'verify', counting_verify)
+    return calls
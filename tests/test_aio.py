@@ -0,0 +1,283 @@
+import asyncio
+import json
+
+import pytest
+from django_auth0_toolkit import aio
+from django_auth0_toolkit.exceptions import InvalidTokenException
+from django_auth0_toolkit.tenants import Auth0Tenant
+
+
+class FakeAsyncHttpClient(object):
+    def __init__(self, status_code=200, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        await asyncio.sleep(0)
+        return aio.AsyncResponse(
+            url,
+            self.status_code,
+            self.headers,
+            json.dumps(self.body).encode('utf-8'),
+        )
+
+    async def get(self, url, params=None, **kwargs):
+        return await self.request('GET', url, params=params, **kwargs)
+
+    async def post(self, url, data=None, **kwargs):
+        return await self.request('POST', url, data=data, **kwargs)
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.fixture
+def http_client(monkeypatch):
+    client = FakeAsyncHttpClient()
+    monkeypatch.setattr(
+        aio, 'get_async_http_client', lambda tenant=None: client
+    )
+    return client
+
+
+def test_get_user_info_with_id_token(http_client):
+    http_client.body = {'user_id': 'auth0|123456789'}
+
+    res = run(aio.get_user_info_with_id_token('id-token-here'))
+
+    assert res == {'user_id': 'auth0|123456789'}
+    assert http_client.calls == [(
+        'GET',
+        'https://testing.auth0.com/tokeninfo',
+        {'params': {'id_token': 'id-token-here'}},
+    )]
+
+
+def test_get_user_info_with_id_token_fails(http_client):
+    http_client.status_code = 401
+
+    with pytest.raises(InvalidTokenException):
+        run(aio.get_user_info_with_id_token('id-token-here'))
+
+
+def test_get_token_info_from_authorization_code(http_client):
+    http_client.body = {'id_token': 'id-token-here'}
+
+    res = run(aio.get_token_info_from_authorization_code(
+        'auth-code', 'http://testserver/callback',
+    ))
+
+    assert res == {'id_token': 'id-token-here'}
+    method, url, kwargs = http_client.calls[0]
+    assert json.loads(kwargs['data'])['code'] == 'auth-code'
+
+
+def test_concurrent_user_info_fetches_are_coalesced(http_client):
+    http_client.body = {'user_id': 'auth0|123456789'}
+
+    results = run(asyncio.gather(*[
+        aio.get_user_info_with_id_token('id-token-here') for _ in range(5)
+    ]))
+
+    assert results == [{'user_id': 'auth0|123456789'}] * 5
+    assert len(http_client.calls) == 1
+    assert aio.flights.in_flight() == 0
+
+
+class BrokenResponse(object):
+    async def __aenter__(self):
+        import aiohttp
+
+        raise aiohttp.ClientPayloadError('Response payload is not completed')
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_async_client_failed_trial_call_reopens_breaker(timer):
+    from django_auth0_toolkit.circuitbreaker import CircuitBreaker
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+
+    breaker = CircuitBreaker(
+        minimum_calls=1, window_size=1, reset_timeout=30, timer=timer,
+    )
+
+    async def get_twice():
+        client = aio.AsyncAuth0HttpClient(breaker=breaker)
+        client.session.request = lambda method, url, **kwargs: (
+            BrokenResponse()
+        )
+        try:
+            for _ in range(2):
+                with pytest.raises(Auth0UnavailableException):
+                    await client.get('https://testing.auth0.com/tokeninfo')
+                assert breaker.stats()['state'] == 'open'
+                timer.now += 30
+        finally:
+            await client.close()
+
+    run(get_twice())
+
+    assert breaker.allow_request()
+
+
+def test_cache_calls_run_in_worker_threads(monkeypatch, http_client):
+    from django_auth0_toolkit import cache
+
+    called = []
+
+    async def run_sync(func, *args, **kwargs):
+        called.append(func)
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(aio, 'run_sync', run_sync)
+    http_client.body = {'user_id': 'auth0|123456789'}
+    claims = {'sub': 'auth0|123456789', 'iss': 'https://testing.auth0.com/'}
+
+    run(aio.get_user_info_with_id_token('id-token-here', claims=claims))
+
+    assert called == [cache.get_cached_user_info, cache.set_cached_user_info]
+
+
+def test_async_http_client_per_tenant():
+    brand_b = Auth0Tenant(
+        'brand-b', 'brand-b.auth0.com', 'brand-b-client', 'secret',
+    )
+
+    async def get_clients():
+        clients = [
+            aio.get_async_http_client(),
+            aio.get_async_http_client(brand_b),
+            aio.get_async_http_client(brand_b),
+        ]
+        for client in set(clients):
+            await client.close()
+        return clients
+
+    default_client, client, same_client = run(get_clients())
+
+    assert client is same_client
+    assert client is not default_client
+    assert client.breaker is brand_b.http_client.breaker
+    assert default_client.breaker is not client.breaker
+
+
+async def serve(handler):
+    """ Starts an aiohttp test server answering every request with
+    ``handler``.
+
+    """
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def answer(*statuses):
+    """ A handler answering with each of ``statuses`` in turn, recording
+    the requests it gets.
+
+    """
+    from aiohttp import web
+
+    requests = []
+
+    async def handler(request):
+        requests.append(request.method)
+        status = statuses[min(len(requests), len(statuses)) - 1]
+        return web.json_response({'status': status}, status=status)
+
+    handler.requests = requests
+    return handler
+
+
+def test_async_client_retries_gets():
+    handler = answer(503, 502, 200)
+
+    async def get():
+        server = await serve(handler)
+        client = aio.AsyncAuth0HttpClient(backoff_factor=0)
+        try:
+            return await client.get(str(server.make_url('/tokeninfo')))
+        finally:
+            await client.close()
+            await server.close()
+
+    res = run(get())
+
+    assert res.status_code == 200
+    assert res.json() == {'status': 200}
+    assert handler.requests == ['GET'] * 3
+
+
+def test_async_client_does_not_retry_posts():
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+
+    handler = answer(503, 200)
+
+    async def post():
+        server = await serve(handler)
+        client = aio.AsyncAuth0HttpClient(backoff_factor=0)
+        try:
+            await client.post(str(server.make_url('/oauth/token')), '{}')
+        finally:
+            await client.close()
+            await server.close()
+
+    with pytest.raises(Auth0UnavailableException):
+        run(post())
+    assert handler.requests == ['POST']
+
+
+def test_async_client_passes_client_errors_through():
+    handler = answer(401)
+
+    async def get():
+        server = await serve(handler)
+        client = aio.AsyncAuth0HttpClient(backoff_factor=0)
+        try:
+            return await client.get(str(server.make_url('/tokeninfo')))
+        finally:
+            await client.close()
+            await server.close()
+
+    res = run(get())
+
+    assert res.status_code == 401
+    assert handler.requests == ['GET']
+
+
+def test_async_client_breaker_opens_on_connection_errors(timer):
+    from django_auth0_toolkit.circuitbreaker import CircuitBreaker
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+
+    breaker = CircuitBreaker(minimum_calls=2, window_size=2, timer=timer)
+    handler = answer(200)
+
+    async def get_from_stopped_server():
+        server = await serve(handler)
+        url = str(server.make_url('/tokeninfo'))
+        await server.close()
+
+        client = aio.AsyncAuth0HttpClient(
+            max_retries=1, backoff_factor=0, breaker=breaker,
+        )
+        try:
+            for _ in range(3):
+                with pytest.raises(Auth0UnavailableException):
+                    await client.get(url)
+        finally:
+            await client.close()
+
+    run(get_from_stopped_server())
+
+    assert breaker.stats()['state'] == 'open'
+    assert handler.requests == []
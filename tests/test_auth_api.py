@@ -6,7 +6,8 @@ import pytest
 import responses
 
 from django_auth0_toolkit.auth_api import get_user_info_with_id_token, \
-    get_token_info_from_authorization_code
+    get_token_info_from_authorization_code, get_user_info, \
+    get_user_info_from_claims
 from django_auth0_toolkit.exceptions import InvalidTokenException
 
 
@@ -88,3 +89,100 @@ def test_get_token_info_from_authorization_code_fails():
         get_token_info_from_authorization_code(
             'auth-code', 'http://testserver/callback',
         )
+
+
+@responses.activate
+def test_get_user_info_with_id_token_is_cached():
+    from django.test import override_settings
+    from django_auth0_toolkit.cache import invalidate_user_info
+
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo?id_token=id-token-here',
+        status=200,
+        json={'user_id': 'auth0|123456789'},
+        match_querystring=True,
+    )
+    claims = {'sub': 'auth0|123456789'}
+
+    with override_settings(AUTH0_PROFILE_CACHE_ALIAS='default'):
+        invalidate_user_info('auth0|123456789')
+
+        first = get_user_info_with_id_token('id-token-here', claims=claims)
+        second = get_user_info_with_id_token('id-token-here', claims=claims)
+        assert len(responses.calls) == 1
+
+        invalidate_user_info('auth0|123456789')
+        third = get_user_info_with_id_token('id-token-here', claims=claims)
+        assert len(responses.calls) == 2
+
+    assert first == second == third == {'user_id': 'auth0|123456789'}
+
+
+@responses.activate
+def test_get_user_info_with_id_token_not_cached_past_expiry():
+    from django.test import override_settings
+    from django_auth0_toolkit.cache import invalidate_user_info
+
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo?id_token=id-token-here',
+        status=200,
+        json={'user_id': 'auth0|123456789'},
+        match_querystring=True,
+    )
+    claims = {'sub': 'auth0|123456789', 'exp': 12345679}
+
+    with override_settings(AUTH0_PROFILE_CACHE_ALIAS='default'):
+        invalidate_user_info('auth0|123456789')
+
+        get_user_info_with_id_token('id-token-here', claims=claims)
+        get_user_info_with_id_token('id-token-here', claims=claims)
+
+    assert len(responses.calls) == 2
+
+
+@pytest.mark.parametrize('claims,expected', [
+    (
+        {'sub': 'auth0|123', 'email': 'a@example.com', 'name': 'A B'},
+        {
+            'sub': 'auth0|123', 'email': 'a@example.com', 'name': 'A B',
+            'user_id': 'auth0|123',
+        },
+    ),
+    ({'sub': 'auth0|123', 'email': 'a@example.com'}, None),
+])
+def test_get_user_info_from_claims(claims, expected):
+    assert get_user_info_from_claims(claims) == expected
+
+
+@responses.activate
+def test_get_user_info_from_rich_claims():
+    from django.test import override_settings
+
+    claims = {'sub': 'auth0|123', 'email': 'a@example.com', 'name': 'A B'}
+
+    with override_settings(AUTH0_USER_INFO_FROM_CLAIMS=True):
+        res = get_user_info('id-token-here', claims=claims)
+
+    assert res['user_id'] == 'auth0|123'
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_get_user_info_falls_back_to_fetch():
+    from django.test import override_settings
+
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo?id_token=id-token-here',
+        status=200,
+        json={'user_id': 'auth0|123'},
+        match_querystring=True,
+    )
+
+    with override_settings(AUTH0_USER_INFO_FROM_CLAIMS=True):
+        res = get_user_info('id-token-here', claims={'sub': 'auth0|123'})
+
+    assert res == {'user_id': 'auth0|123'}
+    assert len(responses.calls) == 1
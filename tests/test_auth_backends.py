@@ -0,0 +1,194 @@
+import pytest
+
+
+USER_INFO = {
+    'user_id': 'auth0|123456789',
+    'email': 'jo@example.com',
+    'given_name': 'Jo',
+    'family_name': 'Bloggs',
+}
+
+
+def test_authenticate_new_user(db):
+    from django.contrib.auth.models import User
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    user = Auth0Backend().authenticate(user_info=USER_INFO)
+
+    assert user.is_new
+    assert user.was_saved
+    user = User.objects.get(pk=user.pk)
+    assert user.username == 'auth0|123456789'
+    assert user.email == 'jo@example.com'
+    assert user.first_name == 'Jo'
+    assert user.last_name == 'Bloggs'
+
+
+def test_authenticate_unchanged_user_skips_save(db):
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    Auth0Backend().authenticate(user_info=USER_INFO)
+
+    user = Auth0Backend().authenticate(user_info=USER_INFO)
+
+    assert not user.is_new
+    assert not user.was_saved
+
+
+def test_authenticate_saves_changed_fields_only(db, monkeypatch):
+    from django.contrib.auth.models import User
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    Auth0Backend().authenticate(user_info={'user_id': 'auth0|123456789'})
+
+    saves = []
+    save = User.save
+
+    def recording_save(self, *args, **kwargs):
+        saves.append(kwargs.get('update_fields'))
+        return save(self, *args, **kwargs)
+
+    monkeypatch.setattr(User, 'save', recording_save)
+
+    user = Auth0Backend().authenticate(
+        user_info={'user_id': 'auth0|123456789', 'name': 'Jo Bloggs'}
+    )
+
+    assert user.was_saved
+    assert saves == [['first_name', 'last_name']]
+
+
+def test_authenticate_changes_evict_profile_everywhere(db):
+    from django.test import override_settings
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+    from django_auth0_toolkit.cache import (
+        get_profile_cache_key,
+        get_user_info_cache,
+    )
+
+    Auth0Backend().authenticate(user_info={'user_id': 'auth0|evicted'})
+
+    with override_settings(AUTH0_PROFILE_CACHE_ALIAS='default'):
+        log = get_user_info_cache().invalidations
+        before = log.current()
+        Auth0Backend().authenticate(
+            user_info={'user_id': 'auth0|evicted', 'name': 'Jo Bloggs'}
+        )
+
+        assert log.read(before, log.current()) == [
+            get_profile_cache_key('auth0|evicted')
+        ]
+
+
+def test_get_user_is_cached_and_invalidated(db):
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    backend = Auth0Backend()
+    cache.clear()
+    with override_settings(AUTH0_USER_CACHE_ALIAS='default'):
+        pk = backend.authenticate(user_info=USER_INFO).pk
+
+        with CaptureQueriesContext(connection) as queries:
+            backend.get_user(pk)
+            user = backend.get_user(pk)
+        assert len(queries) == 1
+        assert user.email == 'jo@example.com'
+
+        User.objects.filter(pk=pk).get().save(update_fields=['email'])
+        with CaptureQueriesContext(connection) as queries:
+            backend.get_user(pk)
+        assert len(queries) == 1
+
+        User.objects.get(pk=pk).delete()
+        with pytest.raises(User.DoesNotExist):
+            backend.get_user(pk)
+    cache.clear()
+
+
+def test_authenticate_links_identity(db):
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+    from django_auth0_toolkit.models import Auth0Identity
+
+    user = Auth0Backend().authenticate(user_info=USER_INFO)
+
+    identity = Auth0Identity.objects.get(pk='auth0|123456789')
+    assert identity.user == user
+    assert not Auth0Backend().authenticate(user_info=USER_INFO).is_new
+
+
+def test_authenticate_distinguishes_long_user_ids(db):
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    suffix = '|' + '0' * 30
+    first = Auth0Backend().authenticate(
+        user_info={'user_id': 'google-oauth2' + suffix},
+    )
+    second = Auth0Backend().authenticate(
+        user_info={'user_id': 'facebook' + suffix},
+    )
+
+    assert first.pk != second.pk
+
+
+def test_authenticate_links_legacy_username(db):
+    from django.contrib.auth.models import User
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+    from django_auth0_toolkit.models import Auth0Identity
+
+    user_id = 'google-oauth2|' + '1' * 30
+    legacy = User.objects.create(username=user_id[-30:], password='auth0')
+
+    user = Auth0Backend().authenticate(user_info={'user_id': user_id})
+
+    assert user.pk == legacy.pk
+    assert not user.is_new
+    assert Auth0Identity.objects.get(pk=user_id).user == legacy
+
+    # Another ID with the same last 30 characters gets its own user.
+    other = Auth0Backend().authenticate(
+        user_info={'user_id': 'facebook|' + '1' * 30},
+    )
+    assert other.pk != legacy.pk
+
+
+def test_legacy_username_lookup_can_be_disabled(db):
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    legacy = User.objects.create(username='auth0|123456789', password='x')
+
+    with override_settings(AUTH0_LEGACY_USERNAME_LOOKUP=False):
+        backend = Auth0Backend()
+        assert backend.get_user_by_auth0_id('auth0|123456789') is None
+        assert backend.get_users_by_auth0_ids(['auth0|123456789']) == {}
+
+    assert Auth0Backend().get_user_by_auth0_id('auth0|123456789') == legacy
+
+
+def test_user_cache_follows_swapped_user_model():
+    from django.apps import apps
+    from django.contrib.auth.models import Group, User
+    from django.db.models.signals import post_delete, post_save
+    from django.test import override_settings
+
+    assert post_save.has_listeners(User)
+    assert not post_save.has_listeners(Group)
+
+    with override_settings(AUTH_USER_MODEL='auth.Group'):
+        apps.get_app_config('django_auth0_toolkit').ready()
+    try:
+        assert post_save.has_listeners(Group)
+        assert post_delete.has_listeners(Group)
+    finally:
+        for signal, name in ((post_save, 'post_save'),
+                             (post_delete, 'post_delete')):
+            signal.disconnect(
+                sender=Group,
+                dispatch_uid='django_auth0_toolkit.user_cache.' + name,
+            )
@@ -0,0 +1,222 @@
+import pytest
+
+from django_auth0_toolkit.cache import (
+    InvalidationLog,
+    LRUCache,
+    TieredCache,
+    get_token_cache,
+)
+from tests.conftest import TOKEN
+
+
+@pytest.fixture
+def token_cache():
+    cache = get_token_cache()
+    cache.clear()
+    return cache
+
+
+def test_lru_cache_get_and_set(timer):
+    cache = LRUCache(maxsize=2, timer=timer)
+    cache.set('a', 1, 2000)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2}
+
+
+def test_lru_cache_expiry(timer):
+    cache = LRUCache(maxsize=2, timer=timer)
+    cache.set('a', 1, 1010)
+    cache.set('b', 2, 900)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    timer.now = 1010
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_evicts_least_recently_used(timer):
+    cache = LRUCache(maxsize=2, timer=timer)
+    cache.set('a', 1, 2000)
+    cache.set('b', 2, 2000)
+    cache.get('a')
+    cache.set('c', 3, 2000)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_lru_cache_disabled(timer):
+    cache = LRUCache(maxsize=0, timer=timer)
+    cache.set('a', 1, 2000)
+
+    assert cache.get('a') is None
+
+
+def test_get_verified_claims_is_cached(verify_calls, token_cache):
+    from django_auth0_toolkit import middleware
+
+    first = middleware.get_verified_claims(TOKEN)
+    second = middleware.get_verified_claims(TOKEN)
+
+    assert first == second
+    assert first['sub'] == 'auth0|qwertyuiop'
+    assert len(verify_calls) == 1
+    assert token_cache.stats()['hits'] == 1
+
+
+def test_get_verified_claims_rejects_bad_token(token_cache):
+    from django_auth0_toolkit import middleware
+
+    with pytest.raises(ValueError):
+        middleware.get_verified_claims('what')
+
+    assert len(token_cache) == 0
+
+
+def test_get_verified_claims_remembers_rejection(verify_calls, token_cache):
+    from django_auth0_toolkit import middleware
+    from django_auth0_toolkit.cache import get_rejected_token_cache
+
+    get_rejected_token_cache().clear()
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            middleware.get_verified_claims('bad-token')
+
+    assert verify_calls == ['bad-token']
+    get_rejected_token_cache().clear()
+
+
+@pytest.fixture
+def file_cache(request, tmpdir):
+    from django.test import override_settings
+
+    overrides = override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmpdir),
+        },
+    })
+    overrides.enable()
+    request.addfinalizer(overrides.disable)
+    return 'shared'
+
+
+def make_process_caches(alias, timer):
+    """ Two tiered caches sharing an L2, as two processes would. """
+    return [
+        TieredCache(
+            alias, l1_maxsize=10, l1_timeout=60, sync_interval=1,
+            invalidations=InvalidationLog(alias), timer=timer,
+        )
+        for _ in range(2)
+    ]
+
+
+def test_tiered_cache_reads_through_to_l2(timer):
+    first, second = make_process_caches('default', timer)
+
+    first.set('tiered-read', {'a': 1}, timer.now + 600)
+
+    assert second.get('tiered-read') == {'a': 1}
+    assert second.stats()['misses'] == 1
+    # Now from L1, until it times out.
+    second.l2.delete('tiered-read')
+    assert second.get('tiered-read') == {'a': 1}
+    timer.now += 60
+    assert second.get('tiered-read') is None
+
+
+def test_tiered_cache_keeps_l2_expiry(timer):
+    first, second = make_process_caches('default', timer)
+
+    first.set('tiered-expiry', 'value', timer.now + 10)
+    second.get('tiered-expiry')
+    second.l2.delete('tiered-expiry')
+    timer.now += 10
+
+    assert second.get('tiered-expiry') is None
+
+
+def check_invalidation_reaches_other_processes(alias, timer):
+    first, second = make_process_caches(alias, timer)
+
+    first.set('tiered-evict', 'old', timer.now + 600)
+    assert second.get('tiered-evict') == 'old'
+
+    first.set('tiered-evict', 'new', timer.now + 600)
+    first.evict(['tiered-evict'])
+    # Until the next sync, the L1 copy is still served.
+    assert second.get('tiered-evict') == 'old'
+
+    timer.now += 1
+    assert second.get('tiered-evict') == 'new'
+    assert first.get('tiered-evict') == 'new'
+
+    first.delete('tiered-evict')
+    timer.now += 1
+    assert second.get('tiered-evict') is None
+
+
+def test_tiered_cache_invalidation_reaches_other_processes(timer):
+    check_invalidation_reaches_other_processes('default', timer)
+
+
+def test_tiered_cache_invalidation_with_file_cache(file_cache, timer):
+    check_invalidation_reaches_other_processes(file_cache, timer)
+
+
+def test_tiered_cache_clears_l1_when_behind(timer):
+    first, second = make_process_caches('default', timer)
+    second.invalidations.max_backlog = 2
+
+    first.set('tiered-behind', 'value', timer.now + 600)
+    second.get('tiered-behind')
+    for number in range(3):
+        first.evict(['tiered-other-{0}'.format(number)])
+    timer.now += 1
+    second.sync()
+
+    assert len(second) == 0
+
+
+def test_tiered_cache_clears_l1_on_sequence_collision(timer):
+    first, second = make_process_caches('default', timer)
+
+    for key in ('tiered-collision', 'tiered-theirs'):
+        first.set(key, 'value', timer.now + 600)
+        second.get(key)
+    # Another process drew the next number at the same time, and published
+    # its message first.
+    log = first.invalidations
+    log.cache.set(
+        log.get_message_key(log.current() + 1), ['tiered-theirs'], 60,
+    )
+    first.evict(['tiered-collision'])
+    timer.now += 1
+    second.sync()
+
+    assert len(second) == 0
+
+
+def test_get_verified_claims_shared_between_processes(verify_calls):
+    from django.test import override_settings
+    from django_auth0_toolkit import middleware
+
+    with override_settings(AUTH0_TOKEN_CACHE_ALIAS='default'):
+        get_token_cache().l2.clear()
+        middleware.get_verified_claims(TOKEN)
+        # As another process would, with an empty L1.
+        get_token_cache().clear()
+        claims = middleware.get_verified_claims(TOKEN)
+
+    assert claims['sub'] == 'auth0|qwertyuiop'
+    assert len(verify_calls) == 1
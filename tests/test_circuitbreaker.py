@@ -0,0 +1,88 @@
+from django_auth0_toolkit.circuitbreaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    circuit_state_changed,
+)
+
+
+def make_breaker(timer):
+    return CircuitBreaker(
+        failure_rate_threshold=0.5,
+        minimum_calls=4,
+        window_size=4,
+        reset_timeout=30,
+        timer=timer,
+    )
+
+
+def test_opens_on_failure_rate(timer):
+    breaker = make_breaker(timer)
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_needs_minimum_calls(timer):
+    breaker = make_breaker(timer)
+
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_trial_closes(timer):
+    breaker = make_breaker(timer)
+    for _ in range(4):
+        breaker.record_failure()
+
+    timer.now += 30
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time.
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()['calls'] == 0
+
+
+def test_half_open_trial_failure_reopens(timer):
+    breaker = make_breaker(timer)
+    for _ in range(4):
+        breaker.record_failure()
+
+    timer.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()['times_opened'] == 2
+
+
+def test_state_changes_are_signalled(timer):
+    breaker = make_breaker(timer)
+    received = []
+
+    def receiver(sender, breaker, old_state, new_state, **kwargs):
+        received.append((old_state, new_state))
+
+    circuit_state_changed.connect(receiver)
+    try:
+        for _ in range(4):
+            breaker.record_failure()
+    finally:
+        circuit_state_changed.disconnect(receiver)
+
+    assert received == [(CLOSED, OPEN)]
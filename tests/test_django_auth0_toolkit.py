@@ -7,6 +7,7 @@ test_django_auth0_toolkit
 
 Tests for `django_auth0_toolkit` module.
 """
+from django.test import override_settings
 from django.utils.six.moves.urllib import parse as urlparse
 import responses
 
@@ -86,3 +87,66 @@ def test_sso_with_intercept_is_anon(rf):
     assert res['Location'] == (
         '/accounts/login/?next=/restricted-page/'
     )
+    assert 'auth0_sso_anon' in res.cookies
+
+
+@responses.activate
+def test_sso_recently_anon_is_not_probed(rf):
+    request = rf.get('/restricted-page/')
+    anon = sso.redirect_login_required_to_login(request)
+    sso.remember_not_sso_authenticated(anon)
+    request.COOKIES['auth0_sso_anon'] = anon.cookies['auth0_sso_anon'].value
+
+    res = sso.sso_fallback(request, intercept_auth0_redirect=True)
+
+    assert len(responses.calls) == 0
+    assert res['Location'] == '/accounts/login/?next=/restricted-page/'
+
+
+@responses.activate
+def test_sso_probes_over_rate_limit_go_to_login(rf):
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/oauth/authorize',
+        status=302,
+        adding_headers={'Location': 'https://testing.auth0.com/login'},
+    )
+
+    with override_settings(
+        AUTH0_SSO_PROBE_RATE_LIMIT=1, AUTH0_SSO_NEGATIVE_CACHE_TTL=0,
+    ):
+        sso._probe_limiter = None
+        for _ in range(3):
+            res = sso.sso_fallback(
+                rf.get('/restricted-page/'),
+                intercept_auth0_redirect=True,
+            )
+            assert res['Location'] == (
+                '/accounts/login/?next=/restricted-page/'
+            )
+    sso._probe_limiter = None
+
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_sso_with_auth0_unavailable_goes_to_login(rf, monkeypatch):
+    from django_auth0_toolkit import tenants
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    client = Auth0HttpClient(max_retries=0)
+    monkeypatch.setattr(tenants, 'get_http_client', lambda: client)
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/oauth/authorize',
+        status=503,
+    )
+
+    res = sso.sso_fallback(
+        rf.get('/restricted-page/'),
+        intercept_auth0_redirect=True,
+    )
+
+    assert len(responses.calls) == 1
+    assert res['Location'] == '/accounts/login/?next=/restricted-page/'
+    assert 'auth0_sso_anon' not in res.cookies
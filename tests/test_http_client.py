@@ -0,0 +1,134 @@
+import threading
+
+import responses
+from django.utils.six.moves import BaseHTTPServer
+
+from django_auth0_toolkit.http_client import get_http_client
+
+
+def test_get_http_client_is_shared():
+    assert get_http_client() is get_http_client()
+
+
+def test_get_http_client_settings():
+    from django.test import override_settings
+    from django_auth0_toolkit import http_client
+
+    with override_settings(
+        AUTH0_HTTP_POOL_SIZE=3,
+        AUTH0_HTTP_MAX_RETRIES=5,
+        AUTH0_HTTP_TIMEOUT=(1, 2),
+    ):
+        http_client._http_client = None
+        client = get_http_client()
+
+    http_client._http_client = None
+
+    adapter = client.session.get_adapter('https://testing.auth0.com/')
+    assert adapter._pool_maxsize == 3
+    assert adapter.max_retries.total == 5
+    assert client.timeout == (1, 2)
+
+
+@responses.activate
+def test_http_client_get():
+    def request_callback(request):
+        return (200, {}, '{}')
+
+    responses.add_callback(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo',
+        callback=request_callback,
+    )
+
+    res = get_http_client().get('https://testing.auth0.com/tokeninfo')
+
+    assert res.status_code == 200
+
+
+@responses.activate
+def test_http_client_server_error_is_unavailable():
+    import pytest
+    from django_auth0_toolkit.circuitbreaker import CircuitBreaker
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    responses.add(
+        responses.GET, 'https://testing.auth0.com/tokeninfo', status=503,
+    )
+    client = Auth0HttpClient(
+        max_retries=0, breaker=CircuitBreaker(minimum_calls=2, window_size=2),
+    )
+
+    for _ in range(3):
+        with pytest.raises(Auth0UnavailableException):
+            client.get('https://testing.auth0.com/tokeninfo')
+
+    # The circuit opened after two failures, so the third call wasn't made.
+    assert len(responses.calls) == 2
+    assert client.breaker.stats()['state'] == 'open'
+
+
+@responses.activate
+def test_http_client_failed_trial_call_reopens_breaker(timer):
+    import pytest
+    import requests
+    from django_auth0_toolkit.circuitbreaker import CircuitBreaker
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo',
+        body=requests.exceptions.ChunkedEncodingError('Connection broken'),
+    )
+    breaker = CircuitBreaker(
+        minimum_calls=1, window_size=1, reset_timeout=30, timer=timer,
+    )
+    client = Auth0HttpClient(breaker=breaker)
+
+    with pytest.raises(Auth0UnavailableException):
+        client.get('https://testing.auth0.com/tokeninfo')
+    assert breaker.stats()['state'] == 'open'
+
+    # The half-open trial call fails the same way, and is recorded.
+    timer.now += 30
+    with pytest.raises(Auth0UnavailableException):
+        client.get('https://testing.auth0.com/tokeninfo')
+    assert breaker.stats()['state'] == 'open'
+
+    timer.now += 30
+    assert breaker.allow_request()
+
+
+def test_http_client_does_not_replay_cookies():
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    received = []
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_GET(self):
+            received.append(self.headers.get('Cookie'))
+            self.send_response(200)
+            self.send_header('Set-Cookie', 'did=first-user; Path=/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:{0}/authorize'.format(server.server_address[1])
+    try:
+        client = Auth0HttpClient()
+        client.get(url)
+        client.get(url)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert received == [None, None]
+    assert len(client.session.cookies) == 0
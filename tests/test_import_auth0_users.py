@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def import_users(filename, stderr=None, **options):
+    stdout = StringIO()
+    call_command(
+        'import_auth0_users',
+        os.path.join(FIXTURES, filename),
+        stdout=stdout,
+        stderr=stderr or StringIO(),
+        **options
+    )
+    return stdout.getvalue()
+
+
+@pytest.mark.parametrize('filename', [
+    'auth0_users.ndjson',
+    'auth0_users.csv',
+])
+def test_import_creates_users(db, filename):
+    from django.contrib.auth.models import User
+
+    output = import_users(filename, batch_size=2)
+
+    assert 'Processed 2 users (2 created, 0 updated, 0 skipped)' in output
+    assert User.objects.count() == 3
+
+    jo = User.objects.get(username='auth0|000000000000000000000001')
+    assert jo.email == 'jo@example.com'
+    assert (jo.first_name, jo.last_name) == ('Jo', 'Bloggs')
+
+    al = User.objects.get(username='auth0|000000000000000000000002')
+    assert (al.first_name, al.last_name) == ('Al', 'Other')
+
+    sam = User.objects.get(
+        auth0_identities__sub='google-oauth2|000000000000000000000003'
+    )
+    assert sam.username == 'google-oauth2|000000000000000000000003'
+    assert sam.email == 'sam@example.com'
+
+
+def test_import_updates_existing_users(db):
+    from django.contrib.auth.models import User
+    from django_auth0_toolkit.auth_backends import Auth0Backend
+
+    Auth0Backend().authenticate(
+        user_info={'user_id': 'auth0|000000000000000000000001'}
+    )
+
+    output = import_users('auth0_users.ndjson')
+
+    assert 'Processed 4 users (2 created, 1 updated, 0 skipped)' in output
+    jo = User.objects.get(username='auth0|000000000000000000000001')
+    assert jo.email == 'jo@example.com'
+
+    output = import_users('auth0_users.ndjson')
+
+    assert 'Processed 4 users (0 created, 0 updated, 0 skipped)' in output
+
+
+def test_import_skips_colliding_usernames(db, tmpdir):
+    import json
+    from django.contrib.auth.models import User
+
+    # Usernames keep the last 150 characters of the Auth0 user ID.
+    User.objects.create(username='y' * 150)
+    export = tmpdir.join('users.ndjson')
+    export.write('\n'.join(json.dumps({'user_id': user_id}) for user_id in [
+        'auth0|' + 'x' * 150,
+        'google-oauth2|' + 'x' * 150,
+        'auth0|' + 'y' * 150,
+    ]))
+    stderr = StringIO()
+
+    output = import_users(str(export), stderr=stderr)
+
+    assert 'Processed 3 users (1 created, 0 updated, 2 skipped)' in output
+    assert 'Skipped google-oauth2|' in stderr.getvalue()
+    assert 'Skipped auth0|' + 'y' * 150 in stderr.getvalue()
+    assert User.objects.get(username='x' * 150).auth0_identities.get().sub == (
+        'auth0|' + 'x' * 150
+    )
@@ -0,0 +1,182 @@
+import base64
+import binascii
+
+import jwt
+import pytest
+import responses
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from django_auth0_toolkit.jwks import JSONWebKeySet, base64url_to_int
+from django_auth0_toolkit.tokens import get_decoded_token
+
+
+JWKS_URL = 'https://testing.auth0.com/.well-known/jwks.json'
+
+
+def int_to_base64url(value):
+    hex_value = '{0:x}'.format(value)
+    hex_value = hex_value.zfill(len(hex_value) + len(hex_value) % 2)
+    data = binascii.unhexlify(hex_value)
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend(),
+    )
+
+
+def make_jwk(private_key, kid):
+    numbers = private_key.public_key().public_numbers()
+    return {
+        'kty': 'RSA',
+        'use': 'sig',
+        'kid': kid,
+        'n': int_to_base64url(numbers.n),
+        'e': int_to_base64url(numbers.e),
+    }
+
+
+def make_token(private_key, kid, **claims):
+    payload = {'sub': 'auth0|123', 'aud': 'client-id-from-auth0'}
+    payload.update(claims)
+    return jwt.encode(
+        payload, private_key, algorithm='RS256', headers={'kid': kid},
+    ).decode('ascii')
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('AQAB', 65537),
+    ('AQ', 1),
+])
+def test_base64url_to_int(value, expected):
+    assert base64url_to_int(value) == expected
+
+
+@responses.activate
+def test_get_decoded_token_rs256(private_key):
+    responses.add(
+        responses.GET, JWKS_URL, json={'keys': [make_jwk(private_key, 'k1')]},
+    )
+    key_set = JSONWebKeySet(JWKS_URL)
+
+    for _ in range(2):
+        res = get_decoded_token(
+            make_token(private_key, 'k1'),
+            None,
+            'client-id-from-auth0',
+            algorithms=('RS256',),
+            key_set=key_set,
+        )
+        assert res['sub'] == 'auth0|123'
+
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_get_decoded_token_rs256_not_allowed(private_key):
+    key_set = JSONWebKeySet(JWKS_URL)
+
+    with pytest.raises(ValueError):
+        get_decoded_token(
+            make_token(private_key, 'k1'),
+            'client-secret-from-auth0',
+            'client-id-from-auth0',
+            key_set=key_set,
+        )
+
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_key_set_refetches_unknown_kid_rate_limited(private_key, timer):
+    responses.add(
+        responses.GET, JWKS_URL, json={'keys': [make_jwk(private_key, 'k1')]},
+    )
+    key_set = JSONWebKeySet(JWKS_URL, min_refresh_interval=60, timer=timer)
+
+    assert key_set.get_key('k1') is not None
+
+    with pytest.raises(ValueError):
+        key_set.get_key('k2')
+    assert len(responses.calls) == 1
+
+    timer.now += 60
+    with pytest.raises(ValueError):
+        key_set.get_key('k2')
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_key_set_keeps_keys_while_auth0_unavailable(private_key, timer):
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    responses.add(
+        responses.GET, JWKS_URL, json={'keys': [make_jwk(private_key, 'k1')]},
+    )
+    client = Auth0HttpClient(max_retries=0)
+    key_set = JSONWebKeySet(
+        JWKS_URL, min_refresh_interval=60, timer=timer,
+        get_client=lambda: client,
+    )
+    key_set.get_key('k1')
+
+    responses.reset()
+    responses.add(responses.GET, JWKS_URL, status=503)
+    timer.now += 60
+    with pytest.raises(ValueError):
+        get_decoded_token(
+            make_token(private_key, 'k2'),
+            None,
+            'client-id-from-auth0',
+            algorithms=('RS256',),
+            key_set=key_set,
+        )
+
+    assert len(responses.calls) == 1
+    assert key_set.get_key('k1') is not None
+
+
+@responses.activate
+def test_key_set_retries_soon_while_no_keys(private_key, timer):
+    from django_auth0_toolkit.http_client import Auth0HttpClient
+
+    responses.add(responses.GET, JWKS_URL, status=503)
+    client = Auth0HttpClient(max_retries=0)
+    key_set = JSONWebKeySet(
+        JWKS_URL, min_refresh_interval=60, retry_interval=5, timer=timer,
+        get_client=lambda: client,
+    )
+
+    with pytest.raises(ValueError):
+        key_set.get_key('k1')
+    timer.now += 4
+    with pytest.raises(ValueError):
+        key_set.get_key('k1')
+    assert len(responses.calls) == 1
+
+    responses.reset()
+    responses.add(
+        responses.GET, JWKS_URL, json={'keys': [make_jwk(private_key, 'k1')]},
+    )
+    timer.now += 1
+
+    assert key_set.get_key('k1') is not None
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_key_set_skips_malformed_keys(private_key, timer):
+    responses.add(responses.GET, JWKS_URL, json={'keys': [
+        {'kty': 'RSA', 'kid': 'no-modulus', 'e': 'AQAB'},
+        {'kty': 'RSA', 'kid': 'not-base64', 'n': 'a', 'e': 'AQAB'},
+        {'kty': 'RSA', 'kid': 'not-a-string', 'n': 1, 'e': 'AQAB'},
+        make_jwk(private_key, 'k1'),
+    ]})
+    key_set = JSONWebKeySet(JWKS_URL, timer=timer)
+
+    assert key_set.get_key('k1') is not None
+    with pytest.raises(ValueError):
+        key_set.get_key('no-modulus')
@@ -0,0 +1,281 @@
+import pytest
+from django.test import override_settings
+
+from tests.conftest import make_id_token, make_request
+
+
+@pytest.fixture
+def id_token():
+    return make_id_token(
+        sub='auth0|123456789', email='jo@example.com', name='Jo Bloggs',
+    )
+
+
+@pytest.fixture
+def get_user_info_calls(monkeypatch):
+    from django_auth0_toolkit import auth_api, middleware
+
+    calls = []
+
+    def get_user_info(id_token, claims=None):
+        calls.append(id_token)
+        return auth_api.get_user_info_from_claims(claims)
+
+    monkeypatch.setattr(middleware, 'get_user_info', get_user_info)
+    return calls
+
+
+def test_bearer_token_logs_user_in(db, rf, id_token, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    request = make_request(rf, id_token)
+    user = get_user_from_request(request)
+
+    assert user.username == 'auth0|123456789'
+    assert user.email == 'jo@example.com'
+    assert request.session['_auth_user_id'] == str(user.pk)
+    assert get_user_info_calls == [id_token]
+
+
+def test_bad_bearer_token(db, rf, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    user = get_user_from_request(make_request(rf, 'what'))
+
+    assert not user.is_authenticated()
+    assert get_user_info_calls == []
+
+
+def test_bearer_token_without_subject(db, rf, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    user = get_user_from_request(make_request(rf, make_id_token(
+        email='jo@example.com',
+    )))
+
+    assert not user.is_authenticated()
+    assert get_user_info_calls == []
+
+
+def test_logged_in_user_is_reused(db, rf, id_token, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    first = make_request(rf, id_token)
+    get_user_from_request(first)
+
+    second = make_request(rf, id_token, session=first.session)
+    user = get_user_from_request(second)
+
+    assert user.username == 'auth0|123456789'
+    assert get_user_info_calls == [id_token]
+
+
+def test_logged_in_user_is_refreshed(db, rf, id_token, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    first = make_request(rf, id_token)
+    get_user_from_request(first)
+
+    second = make_request(rf, id_token, session=first.session)
+    with override_settings(AUTH0_PROFILE_REFRESH_INTERVAL=0):
+        get_user_from_request(second)
+
+    assert get_user_info_calls == [id_token, id_token]
+
+
+def test_other_logged_in_user_is_replaced(db, rf, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    first = make_request(rf, make_id_token(
+        sub='auth0|other', email='al@example.com', name='Al Other',
+    ))
+    get_user_from_request(first)
+
+    second = make_request(rf, make_id_token(
+        sub='auth0|123456789', email='jo@example.com', name='Jo Bloggs',
+    ), session=first.session)
+    user = get_user_from_request(second)
+
+    assert user.username == 'auth0|123456789'
+    assert len(get_user_info_calls) == 2
+
+
+def test_stateless_prefix_skips_login(db, rf, id_token, get_user_info_calls):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    request = make_request(rf, id_token)
+    request.path_info = '/api/things/'
+    with override_settings(AUTH0_STATELESS_URL_PREFIXES=['/api/']):
+        user = get_user_from_request(request)
+
+    assert user.username == 'auth0|123456789'
+    assert '_auth_user_id' not in request.session
+    assert not request.session.modified
+
+
+def test_stateless_view_skips_login(db, rf, id_token, get_user_info_calls):
+    from django_auth0_toolkit.middleware import (
+        Auth0AuthenticationMiddleware,
+        auth0_stateless,
+    )
+
+    @auth0_stateless
+    def view(request):
+        return request.user
+
+    request = make_request(rf, id_token)
+    middleware = Auth0AuthenticationMiddleware()
+    middleware.process_request(request)
+    middleware.process_view(request, view, (), {})
+    user = view(request)
+
+    assert user.username == 'auth0|123456789'
+    assert '_auth_user_id' not in request.session
+
+
+def test_middleware_reports_server_timing(
+    db, rf, id_token, get_user_info_calls
+):
+    from django.http import HttpResponse
+    from django_auth0_toolkit.middleware import Auth0AuthenticationMiddleware
+
+    request = make_request(rf, id_token)
+    middleware = Auth0AuthenticationMiddleware()
+    with override_settings(
+        AUTH0_TIMING_ENABLED=True, AUTH0_SERVER_TIMING_HEADER=True,
+    ):
+        middleware.process_request(request)
+        request.user.username
+        response = middleware.process_response(request, HttpResponse())
+
+    metrics = response['Server-Timing'].split(', ')
+    stages = [metric.split(';')[0] for metric in metrics]
+    assert stages == [
+        'auth0-verify', 'auth0-session', 'auth0-profile',
+        'auth0-authenticate', 'auth0-login',
+    ]
+
+
+def make_auth0_unavailable(monkeypatch):
+    from django_auth0_toolkit import middleware
+    from django_auth0_toolkit.exceptions import Auth0UnavailableException
+
+    def get_user_info(id_token, claims=None):
+        raise Auth0UnavailableException('Auth0 responded 503')
+
+    monkeypatch.setattr(middleware, 'get_user_info', get_user_info)
+
+
+@pytest.fixture
+def auth0_unavailable(monkeypatch):
+    make_auth0_unavailable(monkeypatch)
+
+
+def test_unavailable_auth0_uses_stale_profile(db, rf, id_token,
+                                              auth0_unavailable):
+    from django_auth0_toolkit.cache import set_cached_user_info
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    with override_settings(AUTH0_PROFILE_CACHE_ALIAS='default'):
+        set_cached_user_info('auth0|123456789', {
+            'user_id': 'auth0|123456789', 'email': 'jo@example.com',
+        })
+        request = make_request(rf, id_token)
+        user = get_user_from_request(request)
+
+    assert user.username == 'auth0|123456789'
+    assert user.email == 'jo@example.com'
+    # Not logged in, so the profile is refreshed once Auth0 is back.
+    assert '_auth_user_id' not in request.session
+
+
+def test_unavailable_auth0_keeps_logged_in_user(db, rf, id_token,
+                                                get_user_info_calls,
+                                                monkeypatch):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    first = make_request(rf, id_token)
+    get_user_from_request(first)
+
+    make_auth0_unavailable(monkeypatch)
+    second = make_request(rf, id_token, session=first.session)
+    with override_settings(AUTH0_PROFILE_REFRESH_INTERVAL=0):
+        user = get_user_from_request(second)
+
+    assert user.username == 'auth0|123456789'
+
+
+def test_unavailable_auth0_serves_linked_user_without_profile_cache(
+        db, rf, id_token, get_user_info_calls, monkeypatch):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    get_user_from_request(make_request(rf, id_token))
+
+    make_auth0_unavailable(monkeypatch)
+    request = make_request(rf, id_token)
+    request.path_info = '/api/things/'
+    with override_settings(AUTH0_STATELESS_URL_PREFIXES=['/api/']):
+        user = get_user_from_request(request)
+
+    assert user.username == 'auth0|123456789'
+
+
+def test_unavailable_auth0_unknown_user_is_anonymous(db, rf, id_token,
+                                                     auth0_unavailable):
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    user = get_user_from_request(make_request(rf, id_token))
+
+    assert not user.is_authenticated()
+
+
+def test_claims_user_defers_database(db, rf, id_token, get_user_info_calls):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    request = make_request(rf, id_token)
+    request.path_info = '/api/things/'
+    with override_settings(
+        AUTH0_STATELESS_URL_PREFIXES=['/api/'], AUTH0_CLAIMS_USER=True,
+    ):
+        with CaptureQueriesContext(connection) as queries:
+            user = get_user_from_request(request)
+
+            assert user.is_authenticated
+            assert not user.is_anonymous
+            assert user.sub == 'auth0|123456789'
+            assert user.get_claim('email') == 'jo@example.com'
+        assert len(queries) == 0
+        assert get_user_info_calls == []
+        assert not user.is_loaded
+
+        assert user.pk is not None
+        assert user.username == 'auth0|123456789'
+        assert user.is_loaded
+        assert get_user_info_calls == [id_token]
+        assert user == user.get_user()
+
+
+def test_claims_user_without_user_lacks_attributes():
+    from django_auth0_toolkit.exceptions import Auth0Exception
+    from django_auth0_toolkit.users import ClaimsUser
+
+    user = ClaimsUser({'sub': 'auth0|123456789'}, lambda: None)
+
+    assert user.is_authenticated
+    assert getattr(user, 'pk', None) is None
+    assert not hasattr(user, 'email')
+    with pytest.raises(Auth0Exception):
+        user.get_user()
+
+
+def test_claims_user_not_for_stateful_requests(db, rf, id_token,
+                                               get_user_info_calls):
+    from django.contrib.auth.models import User
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    with override_settings(AUTH0_CLAIMS_USER=True):
+        user = get_user_from_request(make_request(rf, id_token))
+
+    assert isinstance(user, User)
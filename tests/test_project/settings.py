@@ -18,4 +18,16 @@ INSTALLED_APPS = [
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
+    'django_auth0_toolkit',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+AUTHENTICATION_BACKENDS = [
+    'django_auth0_toolkit.auth_backends.Auth0Backend',
 ]
@@ -0,0 +1,21 @@
+from django_auth0_toolkit.ratelimit import TokenBucket
+
+
+def test_bucket_allows_bursts_up_to_capacity(timer):
+    bucket = TokenBucket(1, capacity=3, timer=timer)
+
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_refills_at_rate(timer):
+    bucket = TokenBucket(2, timer=timer)
+    assert bucket.consume(2)
+    assert not bucket.consume()
+
+    timer.now += 0.5
+    assert bucket.consume()
+    assert not bucket.consume()
+
+    timer.now += 60
+    assert bucket.consume(2)
+    assert not bucket.consume()
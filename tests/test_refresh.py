@@ -0,0 +1,110 @@
+import threading
+
+from django.test import override_settings
+
+from django_auth0_toolkit.refresh import ProfileRefresher
+from tests.conftest import make_id_token, make_request
+
+
+def test_refresher_deduplicates_and_bounds_queue():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def refresh(name):
+        calls.append(name)
+        started.set()
+        release.wait(5)
+
+    refresher = ProfileRefresher(refresh, max_workers=1, max_queue=1)
+
+    assert refresher.submit('auth0|1', 'first')
+    # Wait for the worker to take it, leaving the queue empty.
+    started.wait(5)
+    assert not refresher.submit('auth0|1', 'again')
+    assert refresher.submit('auth0|2', 'second')
+    assert not refresher.submit('auth0|3', 'queue full')
+    assert refresher.pending() == 2
+
+    release.set()
+    refresher.join()
+
+    assert calls == ['first', 'second']
+    assert refresher.pending() == 0
+    assert refresher.last_refreshed('auth0|1') is not None
+    assert refresher.last_refreshed('auth0|3') is None
+
+
+def test_refresher_survives_failures():
+    def refresh():
+        raise ValueError('Auth0 said no')
+
+    refresher = ProfileRefresher(refresh)
+    refresher.submit('auth0|1')
+    refresher.join()
+
+    assert refresher.last_refreshed('auth0|1') is None
+    assert refresher.pending() == 0
+
+
+def test_refresher_closes_old_connections_around_jobs(monkeypatch):
+    from django_auth0_toolkit import refresh
+
+    events = []
+    monkeypatch.setattr(
+        refresh, 'close_old_connections', lambda: events.append('close'),
+    )
+
+    refresher = ProfileRefresher(lambda: events.append('refresh'))
+    refresher.submit('auth0|1')
+    refresher.join()
+
+    assert events == ['close', 'refresh', 'close']
+
+
+def test_stale_profile_refreshed_in_background(db, rf, monkeypatch):
+    from django_auth0_toolkit import middleware, refresh
+    from django_auth0_toolkit.auth_api import get_user_info_from_claims
+
+    id_token = make_id_token(
+        sub='auth0|123456789', email='jo@example.com', name='Jo Bloggs',
+    )
+    fetches = []
+    refreshes = []
+    monkeypatch.setattr(
+        middleware, 'get_user_info',
+        lambda id_token, claims: fetches.append(id_token) or
+        get_user_info_from_claims(claims),
+    )
+    refresher = ProfileRefresher(lambda *args: refreshes.append(args))
+    monkeypatch.setattr(refresh, '_profile_refresher', refresher)
+    monkeypatch.setattr(refresh, '_profile_refresher_pid', refresh.os.getpid())
+
+    def get_user(**settings):
+        request = make_request(rf, id_token)
+        request.path_info = '/api/things/'
+        with override_settings(
+            AUTH0_STATELESS_URL_PREFIXES=['/api/'],
+            AUTH0_PROFILE_BACKGROUND_REFRESH=True,
+            **settings
+        ):
+            return middleware.get_user_from_request(request)
+
+    # First seen: fetched synchronously.
+    user = get_user()
+    assert fetches == [id_token]
+
+    # Fresh: served without fetching.
+    assert get_user() == user
+    assert fetches == [id_token]
+    assert refreshes == []
+
+    # Stale: served, and refreshed in the background.
+    assert get_user(AUTH0_PROFILE_REFRESH_INTERVAL=0) == user
+    refresher.join()
+    assert fetches == [id_token]
+    assert len(refreshes) == 1
+
+    # Past the hard TTL: fetched synchronously again.
+    get_user(AUTH0_PROFILE_HARD_TTL=0)
+    assert fetches == [id_token, id_token]
@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+
+import pytest
+
+from django_auth0_toolkit.cache import get_token_hash
+from tests.conftest import TOKEN
+
+pytest.importorskip('fcntl')
+
+
+@pytest.fixture
+def table_path(tmpdir):
+    return str(tmpdir.join('tokens'))
+
+
+def make_table(path, timer, **kwargs):
+    from django_auth0_toolkit.sharedmemory import SharedTokenTable
+
+    return SharedTokenTable(path, timer=timer, **kwargs)
+
+
+def make_key(number):
+    return get_token_hash('token-{0}'.format(number))
+
+
+def test_table_get_and_set(table_path, timer):
+    table = make_table(table_path, timer, slots=64)
+    key = make_key(1)
+
+    assert table.get(key) is None
+    table.set(key, table.VERIFIED, 'auth0|123', timer.now + 10)
+
+    assert table.get(key) == (table.VERIFIED, 'auth0|123', timer.now + 10)
+    timer.now += 10
+    assert table.get(key) is None
+
+
+def test_table_shared_between_processes(table_path, timer):
+    first = make_table(table_path, timer, slots=64)
+    second = make_table(table_path, timer, slots=64)
+
+    first.set(make_key(1), first.REJECTED, '', timer.now + 10)
+
+    assert second.get(make_key(1))[0] == second.REJECTED
+    assert os.stat(table_path).st_mode & 0o777 == 0o600
+
+
+def set_in_child(path, key, expires_at):
+    from django_auth0_toolkit.sharedmemory import SharedTokenTable
+
+    table = SharedTokenTable(path, slots=64)
+    table.set(key, table.VERIFIED, 'auth0|child', expires_at)
+
+
+def test_table_written_by_forked_process(table_path):
+    import time
+
+    table = make_table(table_path, time.time, slots=64)
+    child = multiprocessing.Process(
+        target=set_in_child,
+        args=(table_path, make_key(1), time.time() + 60),
+    )
+    child.start()
+    child.join()
+
+    assert table.get(make_key(1))[1] == 'auth0|child'
+
+
+def test_table_size_is_fixed(table_path, timer):
+    table = make_table(table_path, timer, slots=4, max_probes=2)
+    size = os.stat(table_path).st_size
+
+    for number in range(20):
+        table.set(
+            make_key(number), table.VERIFIED, 'auth0|x', timer.now + number,
+        )
+
+    assert os.stat(table_path).st_size == size
+    assert table.stats()['verified'] <= 4
+    # The latest entry always finds a slot.
+    assert table.get(make_key(19)) is not None
+
+
+def test_table_keeps_existing_slot_count(table_path, timer):
+    make_table(table_path, timer, slots=64)
+
+    assert make_table(table_path, timer, slots=128).slots == 64
+
+
+def test_table_skips_long_sub(table_path, timer):
+    table = make_table(table_path, timer, slots=64)
+
+    table.set(make_key(1), table.VERIFIED, 'x' * 200, timer.now + 10)
+
+    assert table.get(make_key(1)) is None
+
+
+def test_get_claims_reads_verified_token(table_path, timer):
+    table = make_table(table_path, timer, slots=64)
+    key = get_token_hash(TOKEN)
+
+    table.set_claims(key, {'sub': 'auth0|qwertyuiop'}, timer.now + 10)
+
+    assert table.get_claims(TOKEN, key)['iss'] == 'https://testing.auth0.com/'
+
+    table.set_rejected(key, timer.now + 10)
+    with pytest.raises(ValueError):
+        table.get_claims(TOKEN, key)
+
+
+def test_get_verified_claims_shared_between_workers(verify_calls, table_path):
+    from django.test import override_settings
+    from django_auth0_toolkit import middleware
+    from django_auth0_toolkit.cache import (
+        get_rejected_token_cache,
+        get_token_cache,
+    )
+
+    with override_settings(AUTH0_TOKEN_SHARED_MEMORY_PATH=table_path):
+        for token in (TOKEN, 'bad-token'):
+            for _ in range(2):
+                # As another worker would, with empty per-process caches.
+                get_token_cache().clear()
+                get_rejected_token_cache().clear()
+                try:
+                    middleware.get_verified_claims(token)
+                except ValueError:
+                    pass
+
+    assert verify_calls == [TOKEN, 'bad-token']
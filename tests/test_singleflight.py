@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from django_auth0_toolkit.singleflight import SingleFlight
+
+
+def run_concurrently(flights, key, func, count=5):
+    results = []
+    errors = []
+
+    def worker():
+        try:
+            results.append(flights.do(key, func))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_followers(threads):
+    # Followers block on the leader's call; give them a moment to join it.
+    for thread in threads:
+        thread.join(0.05)
+
+
+def test_concurrent_calls_are_coalesced():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    threads, results, errors = run_concurrently(flights, 'key', func)
+    wait_for_followers(threads)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 5
+    assert errors == []
+    assert flights.in_flight() == 0
+
+
+def test_exceptions_are_shared():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError('boom')
+
+    threads, results, errors = run_concurrently(flights, 'key', func)
+    wait_for_followers(threads)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == []
+    assert len(errors) == 5
+    assert all(isinstance(error, ValueError) for error in errors)
+
+
+def test_sequential_calls_are_not_coalesced():
+    flights = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        return len(calls)
+
+    assert flights.do('key', func) == 1
+    assert flights.do('key', func) == 2
+
+
+def test_failed_call_is_not_remembered():
+    flights = SingleFlight()
+
+    def func():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flights.do('key', func)
+
+    assert flights.do('key', lambda: 'ok') == 'ok'
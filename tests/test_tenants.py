@@ -0,0 +1,202 @@
+import jwt
+import pytest
+import responses
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from django_auth0_toolkit import tenants
+from django_auth0_toolkit.tokens import prepare_secret
+from tests.conftest import TOKEN, make_id_token, make_request
+
+
+BRAND_SECRET = 'YnJhbmQtc2VjcmV0'
+
+BRAND_TENANT = {
+    'DOMAIN': 'brand.auth0.com',
+    'CLIENT_ID': 'brand-client-id',
+    'CLIENT_SECRET': BRAND_SECRET,
+    'HOSTS': ['localhost'],
+}
+
+
+def make_brand_token(**claims):
+    payload = {
+        'iss': 'https://brand.auth0.com/',
+        'aud': 'brand-client-id',
+        'sub': 'auth0|brand-user',
+        'iat': 12345678,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, prepare_secret(BRAND_SECRET)).decode('ascii')
+
+
+@pytest.fixture
+def brand_tenant(request):
+    overrides = override_settings(AUTH0_TENANTS={'brand': BRAND_TENANT})
+    overrides.enable()
+    tenants._tenant_registry = None
+
+    def restore():
+        overrides.disable()
+        tenants._tenant_registry = None
+
+    request.addfinalizer(restore)
+    return tenants.get_tenant_registry().get('brand')
+
+
+def test_single_tenant_uses_shared_verifier():
+    from django_auth0_toolkit.tokens import get_token_verifier
+
+    tenant = tenants.get_tenant_for_token(TOKEN)
+
+    assert tenant.name == tenants.DEFAULT_TENANT
+    assert tenant.verifier is get_token_verifier()
+
+
+def test_tokens_routed_by_issuer_and_audience(brand_tenant):
+    brand_token = make_brand_token()
+
+    assert tenants.get_tenant_for_token(brand_token) is brand_tenant
+    assert tenants.get_tenant_for_token(TOKEN).name == 'default'
+    assert tenants.get_tenant_for_token('what').name == 'default'
+    assert brand_tenant.verifier.verify(brand_token)['sub'] == (
+        'auth0|brand-user'
+    )
+
+
+def test_tokens_routed_by_any_audience(brand_tenant):
+    claims = {
+        'iss': 'https://brand.auth0.com/',
+        'aud': ['https://api.example.com/', 'brand-client-id'],
+    }
+
+    assert tenants.get_tenant_for_claims(claims) is brand_tenant
+
+
+def test_tenants_keep_their_own_verifier_and_client(brand_tenant):
+    default = tenants.get_tenant_registry().default
+
+    assert brand_tenant.verifier is brand_tenant.verifier
+    assert brand_tenant.verifier is not default.verifier
+    assert brand_tenant.http_client is brand_tenant.http_client
+    assert brand_tenant.http_client is not default.http_client
+
+
+def test_brand_token_rejected_by_default_tenant(brand_tenant):
+    default = tenants.get_tenant_registry().default
+
+    with pytest.raises(ValueError):
+        default.verifier.verify(make_brand_token())
+
+
+def test_brand_token_verified_by_middleware(brand_tenant):
+    from django_auth0_toolkit.middleware import get_verified_claims
+
+    claims = get_verified_claims(make_brand_token(sub='auth0|middleware'))
+
+    assert claims['sub'] == 'auth0|middleware'
+
+
+def test_user_ids_qualified_by_tenant(brand_tenant):
+    claims = {
+        'iss': 'https://brand.auth0.com/',
+        'aud': 'brand-client-id',
+        'sub': 'auth0|same',
+    }
+    default_claims = dict(
+        claims, iss='https://testing.auth0.com/', aud='client-id-from-auth0',
+    )
+
+    assert tenants.get_user_id(claims) == 'brand:auth0|same'
+    assert tenants.get_user_id(default_claims) == 'auth0|same'
+
+
+@responses.activate
+def test_same_sub_in_two_tenants_is_two_users(db, rf, brand_tenant):
+    from django_auth0_toolkit.cache import invalidate_user_info
+    from django_auth0_toolkit.middleware import get_user_from_request
+
+    for domain in ('testing.auth0.com', 'brand.auth0.com'):
+        responses.add(
+            responses.GET,
+            'https://{0}/tokeninfo'.format(domain),
+            status=200,
+            json={'user_id': 'auth0|same'},
+        )
+
+    with override_settings(AUTH0_PROFILE_CACHE_ALIAS='default'):
+        invalidate_user_info('auth0|same')
+        invalidate_user_info('brand:auth0|same')
+
+        default_user = get_user_from_request(
+            make_request(rf, make_id_token(sub='auth0|same'))
+        )
+        brand_user = get_user_from_request(
+            make_request(rf, make_brand_token(sub='auth0|same'))
+        )
+        # From the profile cache, without mixing up the tenants.
+        again = get_user_from_request(
+            make_request(rf, make_brand_token(sub='auth0|same'))
+        )
+
+    assert default_user != brand_user
+    assert default_user.auth0_identities.get().sub == 'auth0|same'
+    assert brand_user.auth0_identities.get().sub == 'brand:auth0|same'
+    assert again == brand_user
+    assert len(responses.calls) == 2
+
+
+def test_requests_routed_by_host(rf, brand_tenant):
+    assert tenants.get_tenant_for_request(
+        rf.get('/', HTTP_HOST='localhost:8000')
+    ) is brand_tenant
+    assert tenants.get_tenant_for_request(rf.get('/')).name == 'default'
+
+
+def test_tenant_configured_twice():
+    default = tenants.DefaultAuth0Tenant()
+    copy = tenants.Auth0Tenant(
+        'copy', default.domain, default.client_id, default.client_secret,
+    )
+
+    with pytest.raises(ImproperlyConfigured):
+        tenants.TenantRegistry(default, [copy])
+
+
+@responses.activate
+def test_callback_uses_tenant_for_host(rf, brand_tenant):
+    from django_auth0_toolkit.views import get_user_in_auth0_callback
+
+    responses.add(
+        responses.POST,
+        'https://brand.auth0.com/oauth/token',
+        status=200,
+        json={'id_token': make_brand_token()},
+    )
+    responses.add(
+        responses.GET,
+        'https://brand.auth0.com/tokeninfo',
+        status=200,
+        json={'user_id': 'auth0|brand-user'},
+    )
+
+    user_info = get_user_in_auth0_callback(
+        rf.get('/callback?code=foo', HTTP_HOST='localhost')
+    )
+
+    assert user_info == {'user_id': 'brand:auth0|brand-user'}
+    assert len(responses.calls) == 2
+
+
+def test_sso_redirects_to_tenant_for_host(rf, brand_tenant):
+    from django_auth0_toolkit import sso
+
+    res = sso.sso_fallback(
+        rf.get('/restricted-page/', HTTP_HOST='localhost'),
+        intercept_auth0_redirect=False,
+    )
+
+    assert res['Location'].startswith(
+        'https://brand.auth0.com/oauth/authorize?'
+    )
+    assert 'client_id=brand-client-id' in res['Location']
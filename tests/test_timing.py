@@ -0,0 +1,70 @@
+from django.http import HttpResponse
+from django.test import override_settings
+
+from django_auth0_toolkit.timing import (
+    NULL_TIMER,
+    add_server_timing_header,
+    auth_stage_timed,
+    time_stage,
+)
+
+
+class FakeRequest(object):
+    pass
+
+
+def test_time_stage_disabled():
+    request = FakeRequest()
+
+    with time_stage(request, 'verify') as timer:
+        pass
+
+    assert timer is NULL_TIMER
+    assert not hasattr(request, 'auth0_timings')
+
+
+def test_time_stage_records_and_signals():
+    request = FakeRequest()
+    received = []
+
+    def receiver(sender, request, stage, duration, **kwargs):
+        received.append((stage, duration))
+
+    auth_stage_timed.connect(receiver)
+    try:
+        with override_settings(AUTH0_TIMING_ENABLED=True):
+            with time_stage(request, 'verify'):
+                pass
+            with time_stage(request, 'profile'):
+                pass
+    finally:
+        auth_stage_timed.disconnect(receiver)
+
+    assert [stage for stage, _ in request.auth0_timings] == [
+        'verify', 'profile',
+    ]
+    assert received == request.auth0_timings
+
+
+def test_add_server_timing_header():
+    request = FakeRequest()
+    request.auth0_timings = [('verify', 0.0012), ('profile', 0.25)]
+    response = HttpResponse()
+    response['Server-Timing'] = 'db;dur=3'
+
+    with override_settings(AUTH0_SERVER_TIMING_HEADER=True):
+        add_server_timing_header(request, response)
+
+    assert response['Server-Timing'] == (
+        'db;dur=3, auth0-verify;dur=1.200, auth0-profile;dur=250.000'
+    )
+
+
+def test_add_server_timing_header_disabled():
+    request = FakeRequest()
+    request.auth0_timings = [('verify', 0.0012)]
+    response = HttpResponse()
+
+    add_server_timing_header(request, response)
+
+    assert not response.has_header('Server-Timing')
@@ -1,16 +1,8 @@
 import pytest
 
-from django_auth0_toolkit.tokens import prepare_secret, get_decoded_token
-
-
-# Manually created based on test client id and secret. Does not expire.
-TOKEN = (
-    "eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9."
-    "eyJpc3MiOiJodHRwczovL3Rlc3RpbmcuYXV0aDAuY29tLyIsInN1YiI6ImF1dGgwfHF"
-    "3ZXJ0eXVpb3AiLCJhdWQiOiJjbGllbnQtaWQtZnJvbS1hdXRoMCIsImlhdCI6MTIzND"
-    "U2Nzh9."
-    "hi4FG8pQ628E5u3z-jTKRb1eSfnOZi6uffB5fMbZv9Q"
-)
+from django_auth0_toolkit.tokens import prepare_secret, get_decoded_token, \
+    get_token_verifier, get_unverified_claims, TokenVerifier
+from tests.conftest import TOKEN
 
 
 @pytest.mark.parametrize("secret,expected", [
@@ -65,3 +57,110 @@ def test_get_decoded_token_bad_secret(token):
             settings.AUTH0_CLIENT_SECRET,
             settings.AUTH0_CLIENT_ID,
         )
+
+
+def test_token_verifier():
+    from django.conf import settings
+    verifier = TokenVerifier(
+        settings.AUTH0_CLIENT_SECRET,
+        settings.AUTH0_CLIENT_ID,
+        issuer='https://testing.auth0.com/',
+    )
+
+    assert verifier.verify(TOKEN)['sub'] == 'auth0|qwertyuiop'
+
+
+def test_token_verifier_issuer_mismatch():
+    from django.conf import settings
+    verifier = TokenVerifier(
+        settings.AUTH0_CLIENT_SECRET,
+        settings.AUTH0_CLIENT_ID,
+        issuer='https://other.auth0.com/',
+    )
+
+    with pytest.raises(ValueError):
+        verifier.verify(TOKEN)
+
+
+def test_token_verifier_without_secret_rejects_hs256():
+    from django.conf import settings
+    verifier = TokenVerifier(
+        None, settings.AUTH0_CLIENT_ID, algorithms=('HS256', 'RS256'),
+    )
+
+    with pytest.raises(ValueError):
+        verifier.verify(TOKEN)
+    assert verifier.rejections.stats() == {'InvalidTokenError': 1}
+
+
+def test_get_token_verifier_is_shared():
+    assert get_token_verifier() is get_token_verifier()
+
+
+def test_rejections_are_counted_and_logged_in_summary(monkeypatch, timer):
+    from django.conf import settings
+    from django_auth0_toolkit import tokens
+
+    logged = []
+    monkeypatch.setattr(
+        tokens.logger, 'warning', lambda *args: logged.append(args),
+    )
+    verifier = TokenVerifier(
+        settings.AUTH0_CLIENT_SECRET,
+        settings.AUTH0_CLIENT_ID,
+        rejections=tokens.RejectionCounter(log_interval=60, timer=timer),
+    )
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            verifier.verify('what')
+    assert len(logged) == 1
+
+    timer.now += 60
+    with pytest.raises(ValueError):
+        verifier.verify('still not a jwt')
+
+    assert len(logged) == 2
+    assert logged[1][1] == 3
+    assert logged[1][2] == 'DecodeError=3'
+    assert verifier.rejections.stats() == {'DecodeError': 4}
+
+
+def test_get_decoded_token_rejections_share_summary(monkeypatch, timer):
+    from django.conf import settings
+    from django_auth0_toolkit import tokens
+
+    logged = []
+    monkeypatch.setattr(
+        tokens.logger, 'warning', lambda *args: logged.append(args),
+    )
+    monkeypatch.setattr(
+        tokens, '_rejections',
+        tokens.RejectionCounter(log_interval=60, timer=timer),
+    )
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            get_decoded_token(
+                'what',
+                settings.AUTH0_CLIENT_SECRET,
+                settings.AUTH0_CLIENT_ID,
+            )
+
+    assert len(logged) == 1
+    assert tokens.get_rejection_counter().stats() == {'DecodeError': 3}
+
+
+def test_get_unverified_claims():
+    assert get_unverified_claims(TOKEN[:-1]) == {
+        'aud': 'client-id-from-auth0',
+        'iat': 12345678,
+        'iss': 'https://testing.auth0.com/',
+        'sub': 'auth0|qwertyuiop',
+    }
+
+
+@pytest.mark.parametrize('token', ['what', 'a.!!!.b', 'a.bnVsbA.b'])
+def test_get_unverified_claims_not_a_jwt(token):
+    with pytest.raises(ValueError):
+        get_unverified_claims(token)
@@ -0,0 +1,46 @@
+import responses
+from django.test import override_settings
+
+from django_auth0_toolkit.views import get_user_in_auth0_callback
+from tests.conftest import make_id_token
+
+
+def add_token_exchange(id_token):
+    responses.add(
+        responses.POST,
+        'https://testing.auth0.com/oauth/token',
+        status=200,
+        json={'id_token': id_token},
+    )
+
+
+@responses.activate
+def test_callback_builds_user_info_from_claims(rf):
+    add_token_exchange(make_id_token(
+        sub='auth0|123', email='a@example.com', name='A B',
+    ))
+
+    with override_settings(AUTH0_USER_INFO_FROM_CLAIMS=True):
+        user_info = get_user_in_auth0_callback(rf.get('/callback?code=foo'))
+
+    assert user_info['user_id'] == 'auth0|123'
+    assert user_info['email'] == 'a@example.com'
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_callback_fetches_user_info_without_claims(rf):
+    id_token = make_id_token(sub='auth0|123')
+    add_token_exchange(id_token)
+    responses.add(
+        responses.GET,
+        'https://testing.auth0.com/tokeninfo',
+        status=200,
+        json={'user_id': 'auth0|123', 'email': 'a@example.com'},
+    )
+
+    with override_settings(AUTH0_USER_INFO_FROM_CLAIMS=True):
+        user_info = get_user_in_auth0_callback(rf.get('/callback?code=foo'))
+
+    assert user_info == {'user_id': 'auth0|123', 'email': 'a@example.com'}
+    assert len(responses.calls) == 2